@@ -0,0 +1,35 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from .tokens import VERSION_CLAIM, has_user_claims, token_versions, user_from_claims
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that takes the user's lock state, plan and expiry from
+    the access token instead of the users table. The token is accepted only
+    while its version matches the user's current one, so changing any of
+    those fields on the user revokes it. Tokens minted without the claims
+    fall back to loading the user.
+
+    Each process caches token versions for TOKEN_VERSION_TTL seconds. A
+    revocation (password change, recovery, lock, plan change, account
+    deletion) rejects old tokens at once in the process that made it, but
+    other worker processes keep accepting them until their cached version
+    expires, i.e. for at most TOKEN_VERSION_TTL seconds.
+    """
+
+    def get_user(self, validated_token):
+        if not has_user_claims(validated_token):
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise AuthenticationFailed("Token contained no recognizable user identification", code="token_not_valid")
+
+        current_version = token_versions.get(user_id)
+        if current_version is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if validated_token[VERSION_CLAIM] != current_version:
+            raise AuthenticationFailed("Token has been revoked", code="token_not_valid")
+        return user_from_claims(validated_token)
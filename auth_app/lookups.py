@@ -0,0 +1,215 @@
+import hashlib
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from axiomcore.response_cache import is_shared_cache
+
+
+class BloomFilter:
+    """
+    Set membership with occasional false positives and no false negatives.
+    About 1% false positives at 10 bits per item.
+    """
+
+    def __init__(self, capacity, bits_per_item=10):
+        self.size = max(capacity * bits_per_item, 1024)
+        self.hash_count = max(1, round(bits_per_item * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * step) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class SaltLookup:
+    """
+    Serves the unauthenticated get-salt and get-recovery-salt lookups from
+    memory: a Bloom filter of usernames answers most misses and a bounded LRU
+    holds recently requested salts.
+
+    Processes share what changed through the default cache. Each registration
+    takes the next users generation and records its username under it, so a
+    process whose filter is behind adds the usernames it missed instead of
+    rescanning the users table, and only rebuilds the filter when some of
+    them are gone from the cache. Registrations and salt changes also set a
+    stamp for the username: a cached salt is served only while the stamp it
+    was loaded under is current, and a stamped username is never answered
+    from the filter. With a process-local cache no process would see the
+    others' changes, so every lookup goes to the database instead.
+    """
+
+    GENERATION_KEY = 'auth_app:salt_lookup:users'
+    # Registrations are kept this long (seconds) for other processes to catch up on.
+    ADDED_TIMEOUT = 24 * 60 * 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._filter_generation = None
+        self._rebuilding = False
+        self._salts = OrderedDict()
+
+    def get(self, username):
+        """
+        Returns {'username', 'salt', 'recovery_salt'} for `username`, or None if there is no such user.
+        """
+        if not username:
+            return None
+        if not is_shared_cache(caches['default']):
+            return self._load(username)
+        now = time.monotonic()
+        stamp_key = self._stamp_key(username)
+        values = cache.get_many([self.GENERATION_KEY, stamp_key])
+        generation = values.get(self.GENERATION_KEY) or self._start_generation()
+        stamp = values.get(stamp_key)
+
+        if stamp is None:
+            bloom, filter_generation = self._current_filter(generation)
+            if bloom is not None and username not in bloom and filter_generation == generation:
+                return None
+        else:
+            with self._lock:
+                entry = self._salts.get(username)
+                if entry is not None and entry[1] == stamp and entry[2] > now:
+                    self._salts.move_to_end(username)
+                    return entry[0]
+
+        row = self._load(username)
+        if row is None:
+            return None
+        if stamp is None:
+            # Cached only if nothing stamped the user since the stamp was read,
+            # so the row can't predate a change; later changes replace the stamp.
+            stamp = uuid.uuid4().hex
+            if not cache.add(stamp_key, stamp, timeout=None):
+                return row
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(username)
+            self._salts[username] = (row, stamp, now + getattr(settings, 'SALT_CACHE_TTL', 300))
+            self._salts.move_to_end(username)
+            while len(self._salts) > getattr(settings, 'SALT_CACHE_SIZE', 10000):
+                self._salts.popitem(last=False)
+        return row
+
+    @staticmethod
+    def _load(username):
+        from .models import User
+
+        return User.objects.filter(username=username).values('username', 'salt', 'recovery_salt').first()
+
+    @staticmethod
+    def _stamp_key(username):
+        return f'auth_app:salt_lookup:stamp:{hashlib.blake2b(username.encode(), digest_size=16).hexdigest()}'
+
+    @staticmethod
+    def _added_key(generation):
+        return f'auth_app:salt_lookup:added:{generation}'
+
+    def _current_filter(self, generation):
+        """
+        The filter and the generation it is current for, caught up with the
+        registrations since it was built or rebuilt when that isn't possible.
+        """
+        with self._lock:
+            bloom, built = self._filter, self._filter_generation
+        if bloom is not None and built == generation:
+            return bloom, built
+
+        if bloom is not None and 0 < generation - built <= getattr(settings, 'SALT_FILTER_CATCH_UP', 1000):
+            added = cache.get_many([self._added_key(g) for g in range(built + 1, generation + 1)])
+            if len(added) == generation - built:
+                with self._lock:
+                    if self._filter is bloom and self._filter_generation == built:
+                        for username in added.values():
+                            bloom.add(username)
+                        self._filter_generation = generation
+                return bloom, generation
+
+        with self._lock:
+            if self._rebuilding:
+                # Another thread is scanning; misses go to the database meanwhile.
+                return bloom, built
+            self._rebuilding = True
+        try:
+            return self._rebuild_filter(generation), generation
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def _rebuild_filter(self, generation):
+        """
+        Builds a filter of every username, current as of `generation` (read
+        before the scan, so a registration during it makes it stale).
+        """
+        from .models import User
+
+        usernames = list(User.objects.values_list('username', flat=True))
+        bloom = BloomFilter(len(usernames) * 2, getattr(settings, 'SALT_FILTER_BITS_PER_USER', 10))
+        for username in usernames:
+            bloom.add(username)
+        with self._lock:
+            self._filter = bloom
+            self._filter_generation = generation
+        return bloom
+
+    def _start_generation(self):
+        # Starts from the clock so a generation lost to eviction can't come
+        # back to a value some process built its filter under.
+        cache.add(self.GENERATION_KEY, int(time.time() * 1000), timeout=None)
+        return cache.get(self.GENERATION_KEY)
+
+    def _next_generation(self):
+        try:
+            return cache.incr(self.GENERATION_KEY)
+        except ValueError:
+            self._start_generation()
+            return cache.incr(self.GENERATION_KEY)
+
+    def user_added(self, username):
+        """
+        Records the registration for every process once it commits.
+        """
+        def publish():
+            cache.set(self._stamp_key(username), uuid.uuid4().hex, timeout=None)
+            # incr isn't atomic on every backend; add() makes sure no two
+            # registrations share a generation.
+            while not cache.add(self._added_key(self._next_generation()), username, timeout=self.ADDED_TIMEOUT):
+                pass
+            with self._lock:
+                if self._filter is not None:
+                    self._filter.add(username)
+        transaction.on_commit(publish)
+
+    def salts_changed(self, username):
+        """
+        Invalidates every process's cached salts of `username` once the change commits.
+        """
+        def publish():
+            cache.set(self._stamp_key(username), uuid.uuid4().hex, timeout=None)
+            with self._lock:
+                self._salts.pop(username, None)
+        transaction.on_commit(publish)
+
+    def clear(self):
+        with self._lock:
+            self._filter = None
+            self._filter_generation = None
+            self._salts.clear()
+
+
+salt_lookup = SaltLookup()
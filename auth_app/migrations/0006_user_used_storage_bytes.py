@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0005_user_subscription_expiry_user_upload_limit_mb'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='used_storage_bytes',
+            field=models.BigIntegerField(default=0, help_text="Total size of the user's files in bytes"),
+        ),
+    ]
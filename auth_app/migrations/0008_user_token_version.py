@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0007_accountpurgejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text="Bumped to revoke the user's tokens"),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:50
+
+from django.db import migrations, models
+
+
+def retry_failed_jobs(apps, schema_editor):
+    """
+    Failed purges used to stay failed with the account half deleted; they
+    are retried now.
+    """
+    AccountPurgeJob = apps.get_model('auth_app', 'AccountPurgeJob')
+    AccountPurgeJob.objects.filter(status='FAILED').update(status='PENDING')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0008_user_token_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accountpurgejob',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='accountpurgejob',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(retry_failed_jobs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='accountpurgejob',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done')], default='PENDING', max_length=10),
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 import uuid
 from django.utils import timezone
@@ -36,6 +37,24 @@ class UserManager(BaseUserManager):
         user.save(using=self._db)
         return user
 
+    def adjust_used_storage(self, user_id, delta):
+        """
+        Atomically adds `delta` bytes (may be negative) to a user's storage counter.
+        """
+        if delta:
+            self.filter(pk=user_id).update(used_storage_bytes=F('used_storage_bytes') + delta)
+
+    def revoke_tokens(self, user_id, **fields):
+        """
+        Updates `fields` on the user and bumps their token version, revoking
+        every token minted before. For security-relevant changes made with
+        queryset updates, which bypass User.save.
+        """
+        from .tokens import token_versions
+
+        self.filter(pk=user_id).update(token_version=F('token_version') + 1, **fields)
+        transaction.on_commit(lambda: token_versions.invalidate(user_id))
+
 class SubscriptionPlan(models.TextChoices):
     FREE = "FREE", "Free Tier"
     STANDARD = "STANDARD", "Standard Tier"
@@ -78,40 +97,120 @@ class User(AbstractBaseUser, PermissionsMixin):
     )
     subscription_expiry = models.DateTimeField(null=True, blank=True)    
     upload_limit_mb = models.IntegerField(default=500, help_text="Max upload size in MB")    
+    used_storage_bytes = models.BigIntegerField(default=0, help_text="Total size of the user's files in bytes")
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     is_locked = models.BooleanField(default=False, help_text='If true, the user is locked out.')
     failed_login_attempts = models.IntegerField(default=0)
     lockout_until = models.DateTimeField(null=True, blank=True)
+    token_version = models.PositiveIntegerField(default=0, editable=False, help_text="Bumped to revoke the user's tokens")
     objects = UserManager()
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = []
 
+    # Fields carried in access token claims, the credentials (changed by a
+    # password change or recovery) and the ones that disable the account;
+    # changing any of them revokes the user's tokens.
+    SECURITY_FIELDS = (
+        'is_active', 'is_locked', 'is_staff', 'is_superuser', 'subscription_plan', 'subscription_expiry',
+        'salt', 'key_hash', 'encrypted_dek',
+    )
+
     def __str__(self):
         return self.username
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_values()
+        return instance
+
+    def _remember_loaded_values(self, field_names=None):
+        loaded = getattr(self, '_loaded_values', {})
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__ and (field_names is None or field.name in field_names):
+                loaded[field.attname] = self.__dict__[field.attname]
+        self._loaded_values = loaded
+
+    def get_dirty_fields(self):
+        """
+        Names of the fields changed since the user was loaded, or None when it
+        wasn't loaded from the database.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return {
+            field.name for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+            and (field.attname not in loaded or self.__dict__[field.attname] != loaded[field.attname])
+        }
+
     def save(self, *args, **kwargs):
+        if getattr(self, '_from_claims', False):
+            raise ValueError("Users built from token claims can't be saved; load the user instead.")
+
         plan_enum = SubscriptionPlan(self.subscription_plan)
         self.upload_limit_mb = plan_enum.get_upload_limit()
-        should_recalculate_expiry = False
-        
+        dirty = None if self._state.adding else self.get_dirty_fields()
+
         if self._state.adding:
             should_recalculate_expiry = True
+        elif dirty is not None:
+            should_recalculate_expiry = 'subscription_plan' in dirty
         else:
-            try:
-                old_user = User.objects.get(pk=self.pk)
-                if old_user.subscription_plan != self.subscription_plan:
-                    should_recalculate_expiry = True
-            except User.DoesNotExist:
-                should_recalculate_expiry = True
+            # Built by hand rather than loaded: compare with the stored plan.
+            stored_plan = User.objects.filter(pk=self.pk).values_list('subscription_plan', flat=True).first()
+            should_recalculate_expiry = stored_plan != self.subscription_plan
 
         if should_recalculate_expiry:
             duration = plan_enum.get_duration()
             if duration:
                 self.subscription_expiry = timezone.now() + timedelta(days=duration)
 
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'subscription_plan' in update_fields:
+                update_fields |= {'upload_limit_mb', 'subscription_expiry'}
+        if dirty is not None:
+            dirty = self.get_dirty_fields()
+            if update_fields is not None:
+                dirty &= update_fields
+            elif not kwargs.get('force_insert'):
+                # Write only what changed, so a stale instance can't overwrite
+                # counters such as used_storage_bytes that are updated in place.
+                update_fields = dirty
+                if not update_fields:
+                    return
+
+        revoke = dirty is not None and not dirty.isdisjoint(self.SECURITY_FIELDS)
+        if revoke:
+            self.token_version += 1
+        if update_fields is not None:
+            if revoke:
+                update_fields.add('token_version')
+            kwargs['update_fields'] = update_fields
+        adding = self._state.adding
+        loaded_username = getattr(self, '_loaded_values', {}).get('username', self.username)
+        salts_changed = dirty is None or not dirty.isdisjoint(('username', 'salt', 'recovery_salt'))
+
         super().save(*args, **kwargs)
+
+        from .lookups import salt_lookup
+
+        if adding:
+            salt_lookup.user_added(self.username)
+        elif salts_changed:
+            salt_lookup.salts_changed(loaded_username)
+            if loaded_username != self.username:
+                salt_lookup.user_added(self.username)
+        if revoke:
+            from .tokens import token_versions
+
+            transaction.on_commit(lambda: token_versions.invalidate(self.pk))
+        self._remember_loaded_values(update_fields)
         
     @property
     def is_subscription_active(self):
@@ -128,4 +227,46 @@ class User(AbstractBaseUser, PermissionsMixin):
         if remaining.total_seconds() < 0:
             return 0
             
-        return remaining.days
\ No newline at end of file
+        return remaining.days
+
+class AccountPurgeJob(models.Model):
+    """
+    Tracks the background deletion of a user account and everything it owns.
+    Keeps the user's id rather than a foreign key so progress survives the
+    final delete of the user row.
+
+    A worker runs the job while it holds the lease (`lease_until`); `attempts`
+    counts the claims and tells a worker whose lease was taken over to stop.
+    Failed attempts go back to PENDING, retried once `lease_until` passes.
+    """
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Pending"
+        RUNNING = "RUNNING", "Running"
+        DONE = "DONE", "Done"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user_id = models.UUIDField(db_index=True)
+    username = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    total_files = models.IntegerField(default=0)
+    purged_files = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    attempts = models.IntegerField(default=0)
+    lease_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"Purge of {self.username}: {self.status} ({self.purged_files}/{self.total_files})"
+
+    @property
+    def progress(self):
+        if self.status == self.Status.DONE:
+            return 100.0
+        if not self.total_files:
+            return 0.0
+        return round(self.purged_files / self.total_files * 100, 2)
@@ -1,15 +1,17 @@
 from rest_framework import serializers
-from django.apps import apps
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
 from datetime import timedelta
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
-from .models import User
+from .models import User, AccountPurgeJob
+from .tokens import VERSION_CLAIM, add_user_claims, token_versions
 
 class AccountDashboardSerializer(serializers.ModelSerializer):
     plan_display = serializers.CharField(source='get_subscription_plan_display', read_only=True)
-    used_storage_bytes = serializers.SerializerMethodField()
+    used_storage_bytes = serializers.IntegerField(read_only=True)
     used_storage_mb = serializers.SerializerMethodField()
     remaining_storage_mb = serializers.SerializerMethodField()
     storage_usage_percentage = serializers.SerializerMethodField()
@@ -29,13 +31,8 @@ class AccountDashboardSerializer(serializers.ModelSerializer):
             'days_left'
         ]
 
-    def get_used_storage_bytes(self, obj):
-        FileMetadata = apps.get_model('encryptor', 'FileMetadata')
-        total_bytes = FileMetadata.objects.filter(owner=obj).aggregate(total=Sum('file_size'))['total']
-        return total_bytes or 0
-
     def get_used_storage_mb(self, obj):
-        bytes_used = self.get_used_storage_bytes(obj)
+        bytes_used = obj.used_storage_bytes
         return round(bytes_used / (1024 * 1024), 2)
 
     def get_remaining_storage_mb(self, obj):
@@ -101,6 +98,10 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     MAX_FAILED_ATTEMPTS = 3
     LOCKOUT_DURATION = 15
 
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
     def validate(self, attrs):
         username = attrs.get('username')
         key_hash = attrs.get('password')
@@ -110,6 +111,9 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         except User.DoesNotExist:
             raise AuthenticationFailed("Invalid credentials.")
 
+        if not user.is_active:
+            raise AuthenticationFailed("Invalid credentials.")
+
         if user.is_locked and not user.lockout_until:
              raise PermissionDenied("Account is locked. Please contact support.")
 
@@ -119,25 +123,20 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
             minutes_left = (time_left.total_seconds() + 59) // 60
             raise PermissionDenied(f"Account is locked. Try again in {int(minutes_left)} minutes.")
         elif user.is_locked and user.lockout_until and now >= user.lockout_until:
+            User.objects.filter(pk=user.pk, is_locked=True, lockout_until__lte=now).update(
+                is_locked=False, lockout_until=None, failed_login_attempts=0
+            )
             user.is_locked = False
             user.lockout_until = None
             user.failed_login_attempts = 0
-            user.save()
 
         if user.key_hash != key_hash:
-            user.failed_login_attempts += 1
-            if user.failed_login_attempts >= self.MAX_FAILED_ATTEMPTS:
-                user.is_locked = True
-                user.lockout_until = timezone.now() + timedelta(minutes=self.LOCKOUT_DURATION)
-                user.save()
+            if self._record_failed_attempt(user, now):
                 raise AuthenticationFailed(f"Account locked due to failed attempts.")
-            user.save()
             raise AuthenticationFailed("Invalid username or password.")
 
         if user.failed_login_attempts > 0 or user.lockout_until is not None:
-            user.failed_login_attempts = 0
-            user.lockout_until = None
-            user.save()
+            User.objects.filter(pk=user.pk).update(failed_login_attempts=0, lockout_until=None)
 
         if not (user.is_staff or user.is_superuser):
             if not user.is_subscription_active:
@@ -156,6 +155,47 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 
         return response_data
 
+    def _record_failed_attempt(self, user, now):
+        """
+        Counts a failed login in the database rather than on `user`, so
+        concurrent attempts can't lose increments, and locks the account on
+        the last allowed attempt. Returns True when the account is locked.
+        """
+        unlocked = User.objects.filter(pk=user.pk, is_locked=False)
+        while True:
+            if unlocked.filter(failed_login_attempts__gte=self.MAX_FAILED_ATTEMPTS - 1).update(
+                failed_login_attempts=F('failed_login_attempts') + 1,
+                is_locked=True,
+                lockout_until=now + timedelta(minutes=self.LOCKOUT_DURATION),
+                token_version=F('token_version') + 1,
+            ):
+                transaction.on_commit(lambda: token_versions.invalidate(user.pk))
+                return True
+            if unlocked.filter(failed_login_attempts__lt=self.MAX_FAILED_ATTEMPTS - 1).update(
+                failed_login_attempts=F('failed_login_attempts') + 1
+            ):
+                return False
+            if not unlocked.exists():
+                return True
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Mints the new tokens from the current user row, so refreshed tokens carry
+    up-to-date claims, and rejects refresh tokens whose version was revoked.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(pk=refresh.payload.get(api_settings.USER_ID_CLAIM)).first()
+        if user is None or not user.is_active or refresh.payload.get(VERSION_CLAIM, user.token_version) != user.token_version:
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        new_refresh = CustomTokenObtainPairSerializer.get_token(user)
+        data = {'access': str(new_refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            data['refresh'] = str(new_refresh)
+        return data
+
 class InitiateRecoverySerializer(serializers.Serializer):
     username = serializers.CharField(write_only=True)
     recovery_key_hash = serializers.CharField(write_only=True)
@@ -202,4 +242,14 @@ class PasswordChangeSerializer(serializers.Serializer):
         instance.key_hash = validated_data['new_key_hash']
         instance.encrypted_dek = validated_data['new_encrypted_dek']
         instance.save(update_fields=['salt', 'key_hash', 'encrypted_dek'])
-        return instance
\ No newline at end of file
+        return instance
+
+class AccountPurgeJobSerializer(serializers.ModelSerializer):
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = AccountPurgeJob
+        fields = [
+            'id', 'status', 'total_files', 'purged_files', 'progress',
+            'created_at', 'updated_at', 'finished_at'
+        ]
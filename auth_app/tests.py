@@ -1,3 +1,366 @@
-from django.test import TestCase
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from encryptor.models import Category, FileMetadata
+from encryptor.purge import _purge_batch, process_account_purges, run_account_purge
+from .models import AccountPurgeJob, SubscriptionPlan, User
+from .lookups import SaltLookup, salt_lookup
+from .serializers import CustomTokenObtainPairSerializer, PasswordChangeSerializer
+from .tokens import token_versions
 
-# Create your tests here.
+
+class TokenClaimsTests(TestCase):
+    """
+    Access tokens carry the user's authorization state, so the encryptor
+    endpoints can skip the users table until that state changes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('claims', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+
+    def setUp(self):
+        token_versions.clear()
+        self.refresh = CustomTokenObtainPairSerializer.get_token(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+
+    def test_claims_requests_skip_users_table(self):
+        self.assertEqual(self.client.get('/api/categories/').status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/categories/').status_code, 200)
+        self.assertFalse(any('auth_app_user' in query['sql'] for query in queries.captured_queries))
+
+    def test_claims_user_scopes_search(self):
+        # The claims user's pk must be a UUID like a loaded user's; search scopes by owner.hex.
+        category = Category.objects.create(category='Docs', owner=self.user)
+        FileMetadata.objects.create(owner=self.user, category=category, file_name='report.pdf', file_type='pdf', file_size=1)
+        response = self.client.get('/api/files/?search=report')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+
+    def test_security_change_revokes_tokens(self):
+        self.assertEqual(self.client.get('/api/categories/').status_code, 200)
+        user = User.objects.get(pk=self.user.pk)
+        user.is_locked = True
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertEqual(self.client.get('/api/categories/').status_code, 401)
+        response = self.client.post('/api/token/refresh/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_revocation_by_another_process_applies_after_ttl(self):
+        self.assertEqual(self.client.get('/api/categories/').status_code, 200)
+        # Another worker bumps the version; this process's cached copy is not invalidated.
+        User.objects.filter(pk=self.user.pk).update(token_version=F('token_version') + 1)
+        self.assertEqual(self.client.get('/api/categories/').status_code, 200)
+
+        expired = time.monotonic() + settings.TOKEN_VERSION_TTL + 1
+        with mock.patch('auth_app.tokens.time.monotonic', return_value=expired):
+            self.assertEqual(self.client.get('/api/categories/').status_code, 401)
+
+    def test_password_change_revokes_tokens(self):
+        self.assertEqual(self.client.get('/api/categories/').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/auth/accounts/change-password/',
+                {'new_salt': 'salt2', 'new_key_hash': 'hash2', 'new_encrypted_dek': 'dek2'}, format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/categories/').status_code, 401)
+        response = self.client.post('/api/token/refresh/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_recovery_in_another_process_revokes_tokens_after_ttl(self):
+        self.assertEqual(self.client.get('/api/categories/').status_code, 200)
+        # The commit callbacks don't run, so this process's cached version is
+        # not invalidated, as when another worker finalizes the recovery.
+        response = APIClient().post(
+            '/auth/accounts/finalize-recovery/',
+            {'username': 'claims', 'new_salt': 'salt2', 'new_key_hash': 'hash2', 'new_encrypted_dek': 'dek2'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/categories/').status_code, 200)
+
+        expired = time.monotonic() + settings.TOKEN_VERSION_TTL + 1
+        with mock.patch('auth_app.tokens.time.monotonic', return_value=expired):
+            self.assertEqual(self.client.get('/api/categories/').status_code, 401)
+        response = self.client.post('/api/token/refresh/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_unrelated_change_keeps_tokens(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.failed_login_attempts = 1
+        user.save()
+        self.assertEqual(User.objects.get(pk=self.user.pk).token_version, self.user.token_version)
+        self.assertEqual(self.client.get('/api/categories/').status_code, 200)
+
+    def test_refresh_mints_current_claims(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        response = self.client.post('/api/token/refresh/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(self.client.get('/api/categories/').status_code, 200)
+        self.assertIn('refresh', response.data)
+
+
+class LoginAttemptTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('login', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+
+    def login(self, key_hash):
+        return APIClient().post('/api/token/', {'username': 'login', 'password': key_hash}, format='json')
+
+    def test_failed_attempts_lock_then_reset(self):
+        self.assertEqual(self.login('wrong').status_code, 401)
+        self.assertEqual(User.objects.get(pk=self.user.pk).failed_login_attempts, 1)
+        self.assertEqual(self.login('hash').status_code, 200)
+        self.assertEqual(User.objects.get(pk=self.user.pk).failed_login_attempts, 0)
+
+        for _ in range(CustomTokenObtainPairSerializer.MAX_FAILED_ATTEMPTS):
+            self.login('wrong')
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.is_locked)
+        self.assertEqual(user.token_version, self.user.token_version + 1)
+        self.assertEqual(self.login('hash').status_code, 403)
+
+    def test_save_writes_only_changed_fields(self):
+        user = User.objects.get(pk=self.user.pk)
+        User.objects.adjust_used_storage(user.pk, 100)
+        user.subscription_plan = SubscriptionPlan.PRO
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertEqual(len(queries.captured_queries), 1)
+        stored = User.objects.get(pk=user.pk)
+        self.assertEqual(stored.used_storage_bytes, 100)
+        self.assertEqual(stored.upload_limit_mb, SubscriptionPlan.PRO.get_upload_limit())
+        self.assertEqual(stored.subscription_expiry, user.subscription_expiry)
+
+
+class SaltLookupTests(TestCase):
+    """
+    Salt lookups are answered from memory only with a cache shared between
+    processes; each SaltLookup instance stands in for one process.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('salty', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        shared_cache = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': self.cache_dir.name,
+        }})
+        shared_cache.enable()
+        self.addCleanup(shared_cache.disable)
+        salt_lookup.clear()
+        self.client = APIClient()
+
+    def get_salt(self, username):
+        return self.client.get('/auth/accounts/get-salt/', {'username': username})
+
+    def change_salt(self, new_salt):
+        serializer = PasswordChangeSerializer(
+            User.objects.get(pk=self.user.pk),
+            data={'new_salt': new_salt, 'new_key_hash': 'hash2', 'new_encrypted_dek': 'dek2'},
+        )
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer.save()
+
+    def test_lookups_served_from_memory(self):
+        self.assertEqual(self.get_salt('salty').data['salt'], 'salt')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_salt('salty').data['salt'], 'salt')
+            self.assertEqual(self.get_salt('nobody').status_code, 404)
+
+    def test_registration_and_password_change_are_seen(self):
+        self.assertEqual(self.get_salt('newcomer').status_code, 404)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user('newcomer', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        self.assertEqual(self.get_salt('newcomer').status_code, 200)
+
+        self.get_salt('salty')
+        self.change_salt('salt2')
+        self.assertEqual(self.get_salt('salty').data['salt'], 'salt2')
+
+    def test_registration_in_another_process_is_seen(self):
+        other = SaltLookup()
+        self.assertIsNone(other.get('newcomer'))
+        with mock.patch('auth_app.lookups.salt_lookup', SaltLookup()):
+            with self.captureOnCommitCallbacks(execute=True):
+                User.objects.create_user('newcomer', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        self.assertEqual(other.get('newcomer')['salt'], 'salt')
+
+    def test_unknown_users_answered_from_memory_after_a_registration(self):
+        other = SaltLookup()
+        self.assertIsNone(other.get('nobody'))
+        with mock.patch('auth_app.lookups.salt_lookup', SaltLookup()):
+            with self.captureOnCommitCallbacks(execute=True):
+                User.objects.create_user('newcomer', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        # The other process adds the registration to its filter without rescanning.
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                self.assertIsNone(other.get('nobody'))
+        with self.assertNumQueries(1):
+            self.assertEqual(other.get('newcomer')['salt'], 'salt')
+
+    def test_filter_rebuilt_when_registrations_are_gone(self):
+        other = SaltLookup()
+        self.assertIsNone(other.get('nobody'))
+        with mock.patch('auth_app.lookups.salt_lookup', SaltLookup()):
+            with self.captureOnCommitCallbacks(execute=True):
+                User.objects.create_user('newcomer', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        # The registration record was evicted from the cache.
+        cache.delete(other._added_key(cache.get(SaltLookup.GENERATION_KEY)))
+        with self.assertNumQueries(1):
+            self.assertIsNone(other.get('nobody'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(other.get('nobody'))
+
+    def test_password_change_in_another_process_is_seen(self):
+        other = SaltLookup()
+        self.assertEqual(other.get('salty')['salt'], 'salt')
+        with mock.patch('auth_app.lookups.salt_lookup', SaltLookup()):
+            self.change_salt('salt2')
+        self.assertEqual(other.get('salty')['salt'], 'salt2')
+
+    def test_process_local_cache_always_queries(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual(salt_lookup.get('salty')['salt'], 'salt')
+            with self.assertNumQueries(2):
+                self.assertEqual(salt_lookup.get('salty')['salt'], 'salt')
+                self.assertIsNone(salt_lookup.get('nobody'))
+
+
+class AccountPurgeTests(TestCase):
+    """
+    Deleting an account answers 202 and purges it in batches in the
+    background, recording progress so an interrupted purge can resume.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('leaving', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        category = Category.objects.create(category='Docs', owner=cls.user)
+        FileMetadata.objects.bulk_create([
+            FileMetadata(owner=cls.user, category=category, file_name=f'{n}.txt', file_type='txt', file_size=1)
+            for n in range(5)
+        ])
+
+    def setUp(self):
+        self.storage_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.storage_dir.cleanup)
+        storage_settings = override_settings(
+            CONTENT_STORAGE_BACKEND='encryptor.storage.FileSystemContentStorage',
+            CONTENT_STORAGE_OPTIONS={'location': self.storage_dir.name},
+        )
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+
+    def schedule(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.delete(f'/auth/accounts/{self.user.pk}/')
+        self.assertEqual(response.status_code, 202)
+        return AccountPurgeJob.objects.get(pk=response.data['id'])
+
+    def test_delete_accepted_and_status_reported(self):
+        job = self.schedule()
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_active)
+
+        client = APIClient()
+        response = client.get(f'/auth/accounts/purge-status/{job.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['status'], response.data['total_files']), ('PENDING', 5))
+        self.assertNotIn('username', response.data)
+
+        self.assertEqual(process_account_purges(batch_size=2), 1)
+        response = client.get(f'/auth/accounts/purge-status/{job.pk}/')
+        self.assertEqual((response.data['status'], response.data['purged_files'], response.data['progress']), ('DONE', 5, 100.0))
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(FileMetadata.all_objects.filter(owner_id=self.user.pk).exists())
+        self.assertEqual(client.get(f'/auth/accounts/purge-status/{uuid.uuid4()}/').status_code, 404)
+
+    def test_progress_recorded_after_each_batch(self):
+        job = self.schedule()
+        progress = []
+
+        def purge_batch(ids):
+            progress.append(AccountPurgeJob.objects.get(pk=job.pk).purged_files)
+            _purge_batch(ids)
+
+        with mock.patch('encryptor.purge._purge_batch', purge_batch):
+            run_account_purge(job, batch_size=2)
+        self.assertEqual(progress, [0, 2, 4])
+        self.assertEqual(AccountPurgeJob.objects.get(pk=job.pk).purged_files, 5)
+
+    def test_interrupted_purge_resumes(self):
+        job = self.schedule()
+        batches = []
+
+        def dying_purge_batch(ids):
+            if batches:
+                # The process is killed during its second batch.
+                raise KeyboardInterrupt
+            batches.append(ids)
+            _purge_batch(ids)
+
+        with mock.patch('encryptor.purge._purge_batch', dying_purge_batch), self.assertRaises(KeyboardInterrupt):
+            run_account_purge(job, batch_size=2)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.purged_files), (AccountPurgeJob.Status.RUNNING, 2))
+
+        # Nobody else takes it over while the dead worker's lease lasts...
+        self.assertEqual(process_account_purges(batch_size=2), 0)
+        # ...and the next sweep after it expires finishes it.
+        AccountPurgeJob.objects.filter(pk=job.pk).update(lease_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(process_account_purges(batch_size=2), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.purged_files), (AccountPurgeJob.Status.DONE, 5))
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+
+    def test_only_one_worker_claims_a_job(self):
+        job = self.schedule()
+        other_worker = []
+
+        def purge_batch(ids):
+            # A second worker sweeps while the first one holds the job.
+            other_worker.append((run_account_purge(AccountPurgeJob.objects.get(pk=job.pk)), run_account_purge(job)))
+            _purge_batch(ids)
+
+        with mock.patch('encryptor.purge._purge_batch', purge_batch):
+            self.assertTrue(run_account_purge(job, batch_size=2))
+        self.assertEqual(other_worker, [(False, False)] * 3)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.purged_files, job.attempts), (AccountPurgeJob.Status.DONE, 5, 1))
+
+    def test_failed_purge_is_retried_with_backoff(self):
+        job = self.schedule()
+        with mock.patch('encryptor.purge._purge_batch', side_effect=DatabaseError('locked')), \
+                self.assertLogs('encryptor.purge', 'ERROR'):
+            self.assertEqual(process_account_purges(batch_size=2), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (AccountPurgeJob.Status.PENDING, 'locked'))
+        self.assertGreater(job.lease_until, timezone.now())
+        self.assertEqual(process_account_purges(batch_size=2), 0)
+
+        AccountPurgeJob.objects.filter(pk=job.pk).update(lease_until=timezone.now())
+        self.assertEqual(process_account_purges(batch_size=2), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.purged_files, job.attempts), (AccountPurgeJob.Status.DONE, 5, 2))
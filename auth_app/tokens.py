@@ -0,0 +1,97 @@
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from rest_framework_simplejwt.settings import api_settings
+
+# Claims describing the user's authorization state. Tokens carrying them let
+# permission checks run without loading the user row.
+VERSION_CLAIM = 'tv'
+LOCKED_CLAIM = 'locked'
+PLAN_CLAIM = 'plan'
+EXPIRY_CLAIM = 'sub_exp'
+STAFF_CLAIM = 'staff'
+SUPERUSER_CLAIM = 'su'
+
+
+def add_user_claims(token, user):
+    """
+    Adds the user's token version, lock state, plan and subscription expiry to `token`.
+    """
+    token[VERSION_CLAIM] = user.token_version
+    token[LOCKED_CLAIM] = user.is_locked
+    token[PLAN_CLAIM] = user.subscription_plan
+    token[EXPIRY_CLAIM] = int(user.subscription_expiry.timestamp()) if user.subscription_expiry else None
+    token[STAFF_CLAIM] = user.is_staff
+    token[SUPERUSER_CLAIM] = user.is_superuser
+    return token
+
+
+def has_user_claims(token):
+    return VERSION_CLAIM in token
+
+
+def user_from_claims(token):
+    """
+    Builds an unsaved User carrying only the id and authorization fields in
+    `token`. It can't be saved; load the row when anything else is needed.
+    """
+    from .models import SubscriptionPlan, User
+
+    expiry = token.get(EXPIRY_CLAIM)
+    plan = SubscriptionPlan(token[PLAN_CLAIM])
+    user = User(
+        id=User._meta.pk.to_python(token[api_settings.USER_ID_CLAIM]),
+        token_version=token[VERSION_CLAIM],
+        is_locked=token[LOCKED_CLAIM],
+        subscription_plan=plan,
+        subscription_expiry=datetime.fromtimestamp(expiry, tz=dt_timezone.utc) if expiry is not None else None,
+        upload_limit_mb=plan.get_upload_limit(),
+        is_staff=token[STAFF_CLAIM],
+        is_superuser=token[SUPERUSER_CLAIM],
+    )
+    user._state.adding = False
+    user._from_claims = True
+    return user
+
+
+class TokenVersionTable:
+    """
+    Process-local cache of each user's current token version. Entries are
+    dropped here when the version changes in this process and expire after
+    TOKEN_VERSION_TTL seconds, which bounds how long another process can keep
+    accepting a revoked token.
+    """
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """
+        Returns the user's current token version, or None if the user is gone or inactive.
+        """
+        key = str(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._versions.get(key)
+        if entry is not None and entry[1] > now:
+            return entry[0]
+
+        from .models import User
+
+        version = User.objects.filter(pk=user_id, is_active=True).values_list('token_version', flat=True).first()
+        with self._lock:
+            self._versions[key] = (version, now + getattr(settings, 'TOKEN_VERSION_TTL', 60))
+        return version
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._versions.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._versions.clear()
+
+
+token_versions = TokenVersionTable()
@@ -6,9 +6,10 @@ from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.exceptions import PermissionDenied
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.conf import settings
-from .models import User,SubscriptionPlan
+from django.core.exceptions import ValidationError as DjangoValidationError
+from .models import User,SubscriptionPlan, AccountPurgeJob
 from .serializers import (
     UserRegistrationSerializer,
     InitiateRecoverySerializer,
@@ -16,10 +17,15 @@ from .serializers import (
     UserDetailSerializer,
     PasswordChangeSerializer,
     CustomTokenObtainPairSerializer,
+    ClaimsTokenRefreshSerializer,
     AccountDashboardSerializer,
-    CoreUserSerializer
+    CoreUserSerializer,
+    AccountPurgeJobSerializer
 )
 from .permissions import IsSelfOrAdmin, IsSubscriptionActive
+from .lookups import salt_lookup
+from axiomcore.instrumentation import SerializationTimingMixin
+from axiomcore.response_cache import cache_response, response_cache_stats
 
 class SubscriptionInfoView(APIView):
     """
@@ -28,6 +34,7 @@ class SubscriptionInfoView(APIView):
     """
     permission_classes = [AllowAny]
 
+    @cache_response('subscription-plans', per_user=False)
     def get(self, request):
         plans_data = []
 
@@ -43,6 +50,7 @@ class SubscriptionInfoView(APIView):
         return Response(plans_data)
 
 class UserAccountViewSet(
+    SerializationTimingMixin,
     mixins.CreateModelMixin,
     mixins.RetrieveModelMixin,
     mixins.UpdateModelMixin,
@@ -72,7 +80,7 @@ class UserAccountViewSet(
         return User.objects.filter(pk=user.pk)
 
     def get_permissions(self):
-        if self.action in ['create', 'get_salt', 'get_recovery_salt', 'initiate_recovery', 'finalize_recovery']:
+        if self.action in ['create', 'get_salt', 'get_recovery_salt', 'initiate_recovery', 'finalize_recovery', 'purge_status']:
             self.permission_classes = [AllowAny]
         elif self.action == 'list':
             self.permission_classes = [IsAdminUser]
@@ -94,6 +102,33 @@ class UserAccountViewSet(
 
         serializer.save()
 
+    def destroy(self, request, *args, **kwargs):
+        """
+        Deactivates the account right away and deletes its files, categories and
+        the user row in bounded batches in the background. Poll `purge-status`
+        with the returned job id for progress.
+        """
+        from encryptor.purge import schedule_account_purge
+
+        instance = self.get_object()
+        job = schedule_account_purge(instance)
+        return Response(AccountPurgeJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'purge-status/(?P<job_id>[0-9a-f-]+)')
+    def purge_status(self, request, job_id=None):
+        """
+        Progress of an account purge. Open to anyone holding the job id: the
+        account is deactivated and its tokens revoked when the purge starts,
+        so its owner can no longer authenticate. The id is a random UUID only
+        returned to the owner by the delete request, and the response carries
+        no username or user id.
+        """
+        try:
+            job = AccountPurgeJob.objects.get(pk=job_id)
+        except (AccountPurgeJob.DoesNotExist, DjangoValidationError):
+            return Response({'error': 'Purge job not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(AccountPurgeJobSerializer(job).data)
+
     @action(detail=False, methods=['get'])
     def me(self, request):
         user = request.user
@@ -101,6 +136,7 @@ class UserAccountViewSet(
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'], url_path='account-dashboard')
+    @cache_response('account-dashboard')
     def account_dashboard(self, request):
         """
         Returns subscription, storage, and usage data for the authenticated user's dashboard.
@@ -114,22 +150,20 @@ class UserAccountViewSet(
         username = request.query_params.get('username')
         if not username:
             return Response({'error': 'Username query parameter is required.'}, status=status.HTTP_400_BAD_REQUEST)
-        try:
-            user = User.objects.get(username=username)
-            return Response({'salt': user.salt, 'username': user.username})
-        except User.DoesNotExist:
+        user = salt_lookup.get(username)
+        if user is None:
             return Response({'error': 'User not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'salt': user['salt'], 'username': user['username']})
 
     @action(detail=False, methods=['get'], url_path='get-recovery-salt')
     def get_recovery_salt(self, request):
         username = request.query_params.get('username')
         if not username:
             return Response({'error': 'Username query parameter is required.'}, status=status.HTTP_400_BAD_REQUEST)
-        try:
-            user = User.objects.get(username=username)
-            return Response({'recovery_salt': user.recovery_salt})
-        except User.DoesNotExist:
+        user = salt_lookup.get(username)
+        if user is None:
             return Response({'error': 'User not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'recovery_salt': user['recovery_salt']})
 
     @action(detail=False, methods=['post'], url_path='initiate-recovery')
     def initiate_recovery(self, request):
@@ -151,6 +185,11 @@ class UserAccountViewSet(
 
     @action(detail=False, methods=['post'], url_path='change-password')
     def change_password(self, request):
+        """
+        Replaces the login key material and revokes the user's tokens. Other
+        server processes may accept the old tokens for up to TOKEN_VERSION_TTL
+        seconds (see ClaimsJWTAuthentication).
+        """
         user = request.user
         serializer = self.get_serializer(user, data=request.data)
         if serializer.is_valid():
@@ -182,9 +221,23 @@ class ValidateTokenView(APIView):
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
+class ClaimsTokenRefreshView(TokenRefreshView):
+    serializer_class = ClaimsTokenRefreshSerializer
+
 class AppInfoView(APIView):
     authentication_classes=[]
     permission_classes = [AllowAny]
+
+    @cache_response('app-info', per_user=False)
     def get(self, request, format=None):
         min_version = getattr(settings, 'MINIMUM_APP_VERSION', None)
-        return Response({"minimum_required_version": min_version})
\ No newline at end of file
+        return Response({"minimum_required_version": min_version})
+
+class ResponseCacheStatsView(APIView):
+    """
+    Response cache hits and misses per endpoint since this process started.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(response_cache_stats())
@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+The /api/events/ change stream is only served under ASGI, for example
+`gunicorn axiomcore.asgi:application -k uvicorn.workers.UvicornWorker`.
 """
 
 import os
@@ -14,3 +17,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'axiomcore.settings')
 
 application = get_asgi_application()
+
+# Resume purges interrupted by the previous shutdown of this server process.
+from encryptor.purge import purge_worker  # noqa: E402
+
+purge_worker.start()
@@ -0,0 +1,217 @@
+import contextvars
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('axiomcore.requests')
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Where one request spent its time: database queries, serialization
+    (serializers turning objects into response data), rendering (encoding
+    that data as JSON or bytes) and content storage I/O.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view = None
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.render_seconds = 0.0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._render_started = None
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - started
+
+    def render_started(self):
+        self._render_started = time.perf_counter()
+
+    def render_finished(self, response):
+        if self._render_started is not None:
+            self.render_seconds += time.perf_counter() - self._render_started
+            self._render_started = None
+
+    def as_dict(self, request, response, total_seconds):
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': self.view,
+            'status': response.status_code,
+            'total_ms': round(total_seconds * 1000, 2),
+            'db_queries': self.queries,
+            'db_ms': round(self.db_seconds * 1000, 2),
+            'serialize_ms': round(self.serialize_seconds * 1000, 2),
+            'render_ms': round(self.render_seconds * 1000, 2),
+            'storage_read_bytes': self.bytes_read,
+            'storage_written_bytes': self.bytes_written,
+        }
+
+
+def record_storage_read(nbytes):
+    """
+    Counts `nbytes` of file content read for the current request, if any.
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.bytes_read += nbytes
+
+
+def record_storage_written(nbytes):
+    """
+    Counts `nbytes` of file content written for the current request, if any.
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.bytes_written += nbytes
+
+
+@contextmanager
+def measure_serialization():
+    """
+    Counts the time spent in the block as serialization for the current request, if any.
+    """
+    metrics = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            metrics.serialize_seconds += time.perf_counter() - started
+
+
+class SerializationTimingMixin:
+    """
+    For DRF views: counts the time the serializers from get_serializer spend
+    building their output (`serializer.data`) as serialization. Views that
+    build response data otherwise wrap it in measure_serialization.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        to_representation = serializer.to_representation
+
+        def timed_to_representation(instance):
+            with measure_serialization():
+                return to_representation(instance)
+
+        # Only the top-level call is wrapped; nested serializers run inside it.
+        serializer.to_representation = timed_to_representation
+        return serializer
+
+
+def count_written(chunks):
+    """
+    Passes byte chunks through, counting them as written for the current request.
+    """
+    for chunk in chunks:
+        record_storage_written(len(chunk))
+        yield chunk
+
+
+def view_name(request, view_func):
+    """
+    'FileViewSet.list' for DRF views, the function's name otherwise.
+    """
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return getattr(view_func, '__qualname__', repr(view_func))
+    method = request.method.lower()
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(method, method)}'
+
+
+def server_timing(values):
+    return ', '.join([
+        f"total;dur={values['total_ms']}",
+        f"db;dur={values['db_ms']};desc=\"{values['db_queries']} queries\"",
+        f"serialize;dur={values['serialize_ms']}",
+        f"render;dur={values['render_ms']}",
+        f"storage-read;desc=\"{values['storage_read_bytes']} bytes\"",
+        f"storage-write;desc=\"{values['storage_written_bytes']} bytes\"",
+        f"view;desc=\"{values['view'] or ''}\"",
+    ])
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Measures each request and reports it in a `Server-Timing` header and, for
+    a REQUEST_LOG_SAMPLE_RATE fraction of requests plus every one slower than
+    REQUEST_LOG_SLOW_MS, a JSON log line on the `axiomcore.requests` logger.
+
+    Should come first in MIDDLEWARE so the total covers the other middleware.
+    Async requests and the bodies of streaming responses are timed without
+    their queries, which run on other threads or after the response is returned.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.execute))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view = view_name(request, view_func)
+
+    def process_template_response(self, request, response):
+        # Runs last of the template response hooks, just before rendering.
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.render_started()
+            response.add_post_render_callback(metrics.render_finished)
+        return response
+
+    def finish(self, request, response, metrics):
+        total_seconds = time.perf_counter() - metrics.started
+        values = metrics.as_dict(request, response, total_seconds)
+        if getattr(settings, 'SERVER_TIMING_HEADER', True):
+            response['Server-Timing'] = server_timing(values)
+
+        slow_ms = getattr(settings, 'REQUEST_LOG_SLOW_MS', 1000)
+        if slow_ms is not None and values['total_ms'] >= slow_ms:
+            logger.warning(json.dumps(values, sort_keys=True))
+        elif random.random() < getattr(settings, 'REQUEST_LOG_SAMPLE_RATE', 0):
+            logger.info(json.dumps(values, sort_keys=True))
+        return response
@@ -0,0 +1,137 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.response import Response
+
+# Scope of responses that are the same for every user.
+GLOBAL = 'global'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def is_shared_cache(cache):
+    """
+    Whether every process sees `cache`; local memory and dummy caches are per process.
+    """
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+def _generation_key(scope):
+    return f'response-cache:generation:{scope}'
+
+
+def get_generation(scope):
+    """
+    Current generation of `scope` (a user id or GLOBAL). Starts from the clock
+    so a generation lost to eviction can't come back with stale entries.
+    """
+    cache = _cache()
+    key = _generation_key(scope)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(scope):
+    """
+    Invalidates every cached response of `scope`.
+    """
+    cache = _cache()
+    key = _generation_key(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+
+
+def invalidate_user(user_id):
+    """
+    Drops the user's cached responses once the current transaction commits, so
+    a response computed from uncommitted data never outlives the change.
+    """
+    transaction.on_commit(lambda: bump_generation(str(user_id)))
+
+
+def _record(endpoint, outcome):
+    with _stats_lock:
+        _stats[(endpoint, outcome)] += 1
+
+
+def response_cache_stats():
+    """
+    Hits and misses of this process per endpoint.
+    """
+    with _stats_lock:
+        items = list(_stats.items())
+    stats = {}
+    for (endpoint, outcome), count in items:
+        stats.setdefault(endpoint, {'hits': 0, 'misses': 0})[outcome] += count
+    return stats
+
+
+def reset_response_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def cache_response(endpoint, per_user=True, condition=None):
+    """
+    Caches the data of successful GET responses of a view method, keyed by
+    user (unless `per_user` is false), endpoint and full request URL. Cached
+    responses of a user are dropped together by bumping the user's generation
+    (see invalidate_user); shared ones expire after RESPONSE_CACHE_TIMEOUT.
+    `condition(request)` can restrict which requests are cached.
+
+    Per-user responses are only cached when the cache is shared between
+    processes: a generation bumped in a process-local cache would leave every
+    other worker serving the old data.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapped(self, request, *args, **kwargs):
+            if request.method != 'GET' or (condition is not None and not condition(request)):
+                return view_method(self, request, *args, **kwargs)
+            cache = _cache()
+            if per_user:
+                if not request.user or not request.user.is_authenticated or not is_shared_cache(cache):
+                    return view_method(self, request, *args, **kwargs)
+                scope = str(request.user.pk)
+            else:
+                scope = GLOBAL
+
+            url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+            key = f'response-cache:{scope}:{get_generation(scope)}:{endpoint}:{url}'
+            data = cache.get(key)
+            if data is not None:
+                _record(endpoint, 'hits')
+                return Response(data)
+
+            _record(endpoint, 'misses')
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK and getattr(response, 'data', None) is not None:
+                cache.set(key, response.data, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+            return response
+        return wrapped
+    return decorator
+
+
+@receiver(setting_changed)
+def reset_global_responses(setting, **kwargs):
+    bump_generation(GLOBAL)
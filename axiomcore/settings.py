@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'axiomcore.instrumentation.RequestInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -50,6 +51,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'encryptor.events.device_origin_middleware',
 ]
 
 ROOT_URLCONF = 'axiomcore.urls'
@@ -99,6 +101,70 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "ROTATE_REFRESH_TOKENS": True,
 }
+# The default cache holds cached API responses and the generation counters
+# that invalidate them and the salt lookups, so it must be shared between the
+# server processes. It is file-based in CACHE_DIR, which every process on the
+# host sees; point CACHES at memcached or Redis when serving from several
+# hosts. CACHE_DIR= (empty) uses a process-local cache, which turns off
+# per-user response caching and in-memory salt lookups.
+CACHE_DIR = os.environ.get('CACHE_DIR', str(BASE_DIR / 'cache'))
+if CACHE_DIR:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_DIR,
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'axiom',
+        }
+    }
+
+# Cached responses of the dashboard, category summary, first files page and
+# app/plan info. Per-user entries are dropped as soon as the user's data
+# changes, which other processes only see through a shared cache, so they are
+# not cached at all with a process-local one. The app/plan info is cached
+# either way and expires after RESPONSE_CACHE_TIMEOUT seconds.
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Seconds a process trusts its cached copy of a user's token version. Tokens
+# revoked by another process are accepted for at most this long.
+TOKEN_VERSION_TTL = 60
+
+# In-memory answers for the unauthenticated get-salt lookups: a Bloom filter of
+# usernames for misses and an LRU of salts, kept current through the shared
+# default cache (with a process-local one every lookup queries the database).
+# A filter more than SALT_FILTER_CATCH_UP registrations behind is rebuilt
+# rather than caught up; cached salts are also dropped after SALT_CACHE_TTL
+# seconds.
+SALT_FILTER_CATCH_UP = 1000
+SALT_FILTER_BITS_PER_USER = 10
+SALT_CACHE_SIZE = 10000
+SALT_CACHE_TTL = 300
+
+# Per-request instrumentation: every response carries a Server-Timing header
+# with its total, database and render time and content storage bytes, and a
+# REQUEST_LOG_SAMPLE_RATE fraction of requests, plus every request slower than
+# REQUEST_LOG_SLOW_MS, is logged as JSON on the 'axiomcore.requests' logger.
+SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', 'True') == 'True'
+REQUEST_LOG_SAMPLE_RATE = float(os.environ.get('REQUEST_LOG_SAMPLE_RATE', '0'))
+REQUEST_LOG_SLOW_MS = 1000
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'axiomcore.requests': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
 
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'Asia/Kolkata'
@@ -111,4 +177,56 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-MINIMUM_APP_VERSION = '1.0.0'
\ No newline at end of file
+MINIMUM_APP_VERSION = '1.0.0'
+# Size of each chunk when streaming encrypted content to clients.
+CONTENT_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Resumable upload sessions.
+UPLOAD_SESSION_CHUNK_SIZE = 4 * 1024 * 1024
+UPLOAD_SESSION_MAX_CHUNK_SIZE = 16 * 1024 * 1024
+UPLOAD_SESSION_TTL = timedelta(hours=24)
+
+# Full-text search returns at most this many best-ranked matches per query.
+SEARCH_MAX_RESULTS = 1000
+
+# Maximum number of items accepted by the files bulk-create endpoint.
+BULK_CREATE_MAX_ITEMS = 1000
+
+# Bulk delete and background purge of soft-deleted files.
+BULK_DELETE_MAX_ITEMS = 5000
+PURGE_WORKER_ENABLED = True
+PURGE_BATCH_SIZE = 500
+PURGE_INTERVAL = 60
+# Seconds a worker holds an account purge between batches before another
+# worker may take it over, and the backoff (doubling up to the maximum)
+# before a failed purge is retried.
+PURGE_LEASE = 300
+PURGE_RETRY_DELAY = 60
+PURGE_RETRY_MAX_DELAY = 3600
+
+# Change feed batch sizes for /api/changes/.
+CHANGE_FEED_PAGE_SIZE = 500
+CHANGE_FEED_MAX_PAGE_SIZE = 1000
+
+# Push notifications for /api/events/ (ASGI only). The in-process broker only
+# reaches streams served by the same process; point EVENT_BROKER_BACKEND at a
+# shared EventBroker when running several.
+EVENT_BROKER_BACKEND = 'encryptor.events.InProcessBroker'
+EVENT_BROKER_OPTIONS = {}
+EVENT_STREAM_KEEPALIVE = 25
+
+# Where encrypted file content is stored:
+# - 'encryptor.storage.FileSystemContentStorage': one file per blob in a flat directory.
+# - 'encryptor.storage.ShardedFileSystemContentStorage': one file per blob in ab/cd/ sub-directories.
+# - 'encryptor.storage.PackContentStorage': small blobs appended to shared pack files.
+# - 'encryptor.storage.S3ContentStorage': an S3-compatible bucket, configured from the environment.
+CONTENT_STORAGE_BACKEND = os.environ.get('CONTENT_STORAGE_BACKEND', 'encryptor.storage.FileSystemContentStorage')
+CONTENT_STORAGE_OPTIONS = {}
+if CONTENT_STORAGE_BACKEND.endswith('S3ContentStorage'):
+    CONTENT_STORAGE_OPTIONS = {
+        'endpoint_url': os.environ.get('CONTENT_S3_ENDPOINT_URL', 'https://s3.amazonaws.com'),
+        'bucket': os.environ.get('CONTENT_S3_BUCKET'),
+        'access_key': os.environ.get('CONTENT_S3_ACCESS_KEY'),
+        'secret_key': os.environ.get('CONTENT_S3_SECRET_KEY'),
+        'region': os.environ.get('CONTENT_S3_REGION', 'us-east-1'),
+    }
@@ -1,15 +1,16 @@
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
+from rest_framework_simplejwt.views import TokenVerifyView
 from auth_app.views import *
 from django.conf import settings
 from django.conf.urls.static import static
 
 urlpatterns = [
     path('api/token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/refresh/', ClaimsTokenRefreshView.as_view(), name='token_refresh'),
     path('api/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
     path('verify-auth/', ValidateTokenView.as_view(), name='validate-token'),
+    path('cache-stats/', ResponseCacheStatsView.as_view(), name='cache-stats'),
     path('auth/', include('auth_app.urls')),
     path('axiom-admin/', admin.site.urls),
     path('api/', include('encryptor.urls')),
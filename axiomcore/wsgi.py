@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'axiomcore.settings')
 
 application = get_wsgi_application()
+
+# Resume purges interrupted by the previous shutdown of this server process.
+from encryptor.purge import purge_worker  # noqa: E402
+
+purge_worker.start()
@@ -0,0 +1,218 @@
+"""
+HTTP load generator behind the benchmark_http command: concurrent clients
+replaying a weighted mix of requests against a running server, with the
+latency of every request summarised per operation.
+"""
+import http.client
+import json
+import math
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+OPERATIONS = ('token-obtain', 'files-list', 'files-search', 'content-get', 'content-put', 'account-dashboard')
+DEFAULT_MIX = 'token-obtain=5,files-list=35,files-search=15,content-get=25,content-put=10,account-dashboard=10'
+SEARCH_TERMS = ['report', 'invoice', 'photo', 'scan', 'notes', 'backup', 'contract', 'receipt', 'draft', 'statement']
+# Files per client that get content during setup, for content-get to read.
+CONTENT_FILES = 5
+
+
+def parse_mix(value):
+    """
+    Parses 'operation=weight,...' into {operation: weight}.
+    """
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r}; expected one of {', '.join(OPERATIONS)}.")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an ascending list, or None if it is empty.
+    """
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+class BenchmarkClient:
+    """
+    One simulated user on a persistent connection. Records (operation,
+    started, seconds, status) for every measured request; status 0 means the
+    connection failed.
+    """
+
+    def __init__(self, base_url, username, key_hash, mix, rng, content_size):
+        url = urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.username = username
+        self.key_hash = key_hash
+        self.operations, self.weights = list(mix), list(mix.values())
+        self.rng = rng
+        self.content = rng.randbytes(content_size)
+        self.connection = None
+        self.token = None
+        self.pages = 1
+        self.content_files = []
+        self.samples = []
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            if self.connection is not None:
+                self.connection.close()
+            self.connection = None
+            return 0, b''
+
+    def measure(self, operation, method, path, body=None, headers=None):
+        started = time.monotonic()
+        status, data = self.request(method, path, body, headers)
+        self.samples.append((operation, started, time.monotonic() - started, status))
+        return status, data
+
+    def json_body(self, data):
+        return json.dumps(data).encode(), {'Content-Type': 'application/json'}
+
+    def login(self, operation=None):
+        self.token = None
+        body, headers = self.json_body({'username': self.username, 'password': self.key_hash})
+        if operation:
+            status, data = self.measure(operation, 'POST', '/api/token/', body, headers)
+        else:
+            status, data = self.request('POST', '/api/token/', body, headers)
+        if status == 200:
+            self.token = json.loads(data)['access']
+        return status
+
+    def setup(self):
+        """
+        Logs in, counts the user's pages and stores content for a few files. Not measured.
+        """
+        if self.login() != 200:
+            raise RuntimeError(f"Login as {self.username} failed.")
+        status, data = self.request('GET', '/api/files/')
+        page = json.loads(data) if status == 200 else {}
+        rows = page.get('results', [])
+        if rows:
+            self.pages = math.ceil(page['count'] / len(rows))
+        for row in rows[:CONTENT_FILES]:
+            if self.put_content(row['id']) == 204:
+                self.content_files.append(row['id'])
+
+    def put_content(self, file_id, operation=None):
+        headers = {'Content-Type': 'application/octet-stream'}
+        path = f'/api/files/{file_id}/content/'
+        if operation:
+            return self.measure(operation, 'PUT', path, self.content, headers)[0]
+        return self.request('PUT', path, self.content, headers)[0]
+
+    def step(self):
+        operation = self.rng.choices(self.operations, self.weights)[0]
+        if operation == 'token-obtain':
+            self.login(operation)
+            return
+        if operation == 'files-list':
+            status = self.measure(operation, 'GET', f'/api/files/?page={self.rng.randint(1, self.pages)}')[0]
+        elif operation == 'files-search':
+            status = self.measure(operation, 'GET', f'/api/files/?search={self.rng.choice(SEARCH_TERMS)}')[0]
+        elif operation == 'content-get':
+            if not self.content_files:
+                return
+            status = self.measure(operation, 'GET', f'/api/files/{self.rng.choice(self.content_files)}/content/',
+                                  headers={'Accept': 'application/octet-stream'})[0]
+        elif operation == 'content-put':
+            if not self.content_files:
+                return
+            status = self.put_content(self.rng.choice(self.content_files), operation)
+        else:
+            status = self.measure(operation, 'GET', '/auth/accounts/account-dashboard/')[0]
+        if status == 401:
+            self.login()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+def summarize(samples, seconds):
+    """
+    Throughput, error rate and latency percentiles (in milliseconds) per
+    operation and overall. Responses with status 0 or >= 400 count as errors.
+    """
+    def stats(rows):
+        latencies = sorted(duration * 1000 for duration in (row[2] for row in rows))
+        statuses = {}
+        for row in rows:
+            statuses[str(row[3])] = statuses.get(str(row[3]), 0) + 1
+        errors = sum(1 for row in rows if row[3] == 0 or row[3] >= 400)
+        return {
+            'requests': len(rows),
+            'errors': errors,
+            'error_rate': round(errors / len(rows), 4) if rows else 0,
+            'throughput_rps': round(len(rows) / seconds, 2) if seconds else 0,
+            'p50_ms': _rounded(percentile(latencies, 0.50)),
+            'p95_ms': _rounded(percentile(latencies, 0.95)),
+            'p99_ms': _rounded(percentile(latencies, 0.99)),
+            'max_ms': _rounded(latencies[-1] if latencies else None),
+            'statuses': statuses,
+        }
+
+    by_operation = {}
+    for row in samples:
+        by_operation.setdefault(row[0], []).append(row)
+    return {
+        'total': stats(samples),
+        'operations': {operation: stats(rows) for operation, rows in sorted(by_operation.items())},
+    }
+
+
+def _rounded(value):
+    return round(value, 2) if value is not None else None
+
+
+def run_benchmark(base_url, usernames, key_hash, concurrency, duration, warmup=0, mix=DEFAULT_MIX,
+                  content_size=64 * 1024, seed=0):
+    """
+    Runs `concurrency` clients, each logged in as one of `usernames` in turn,
+    for `warmup` + `duration` seconds. Requests started during the warm-up
+    are not reported.
+    """
+    mix = parse_mix(mix) if isinstance(mix, str) else mix
+    clients = [
+        BenchmarkClient(base_url, usernames[n % len(usernames)], key_hash, mix, random.Random(seed + n), content_size)
+        for n in range(concurrency)
+    ]
+    for client in clients:
+        client.setup()
+
+    start = time.monotonic()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+
+    def drive(client):
+        while time.monotonic() < deadline:
+            client.step()
+        client.close()
+
+    threads = [threading.Thread(target=drive, args=(client,), daemon=True) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    samples = [sample for client in clients for sample in client.samples if sample[1] >= measure_from]
+    return summarize(samples, duration)
@@ -0,0 +1,42 @@
+from django.db import transaction
+from .events import current_device, publish_change
+from .models import ChangeLogEntry
+
+FILE = ChangeLogEntry.Kind.FILE
+CATEGORY = ChangeLogEntry.Kind.CATEGORY
+UPSERT = ChangeLogEntry.Action.UPSERT
+DELETE = ChangeLogEntry.Action.DELETE
+
+
+def record_changes(owner_id, kind, action, object_ids):
+    """
+    Appends one entry per object and drops the entries they supersede.
+    Runs in the caller's transaction, so the change is only visible, and
+    connected devices are only notified, once the write that caused it commits.
+    """
+    object_ids = [str(object_id) for object_id in object_ids]
+    if not object_ids:
+        return
+    with transaction.atomic():
+        ChangeLogEntry.objects.filter(owner_id=owner_id, kind=kind, object_id__in=object_ids).delete()
+        entries = ChangeLogEntry.objects.bulk_create([
+            ChangeLogEntry(owner_id=owner_id, kind=kind, object_id=object_id, action=action)
+            for object_id in object_ids
+        ])
+        event = {
+            'seq': max((entry.seq for entry in entries if entry.seq), default=None),
+            'kind': str(kind),
+            'action': str(action),
+            'count': len(object_ids),
+            'origin': current_device.get(),
+        }
+        transaction.on_commit(lambda: publish_change(owner_id, event))
+
+
+def changes_since(owner, since, limit):
+    """
+    Returns up to `limit` entries after `since`, oldest first, and whether more remain.
+    """
+    entries = list(ChangeLogEntry.objects.filter(owner=owner, seq__gt=since).order_by('seq')[:limit + 1])
+    return entries[:limit], len(entries) > limit
+
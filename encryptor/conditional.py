@@ -0,0 +1,81 @@
+import hashlib
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The resource has changed since it was fetched.'
+    default_code = 'precondition_failed'
+
+
+def data_etag(data):
+    """
+    Strong ETag of a serialized representation, computed from its JSON rendering.
+    """
+    return quote_etag(hashlib.md5(JSONRenderer().render(data)).hexdigest())
+
+
+def content_etag(digest, binary):
+    """
+    Strong ETag of a file's content derived from its stored digest alone, so
+    conditional requests never touch the blob. The JSON (base64) and binary
+    representations differ, so each gets its own tag.
+    """
+    return quote_etag(digest if binary else f'{digest}.json')
+
+
+def _matches(header, etags, weak):
+    tags = parse_etags(header)
+    if '*' in tags:
+        return bool(etags)
+    if weak:
+        tags = [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+    return any(tag in etags for tag in tags)
+
+
+def evaluate_preconditions(request, etags):
+    """
+    Applies If-Match and If-None-Match against the current `etags` of the
+    resource (empty when it does not exist). Returns a 304 or 412 response
+    when the request must not proceed, otherwise None.
+    """
+    if_match = request.META.get('HTTP_IF_MATCH')
+    if if_match and not _matches(if_match, etags, weak=False):
+        return HttpResponse(status=status.HTTP_412_PRECONDITION_FAILED)
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and _matches(if_none_match, etags, weak=True):
+        if request.method in ('GET', 'HEAD'):
+            response = HttpResponseNotModified()
+            response['ETag'] = etags[0]
+            return response
+        return HttpResponse(status=status.HTTP_412_PRECONDITION_FAILED)
+    return None
+
+
+def check_write_preconditions(request, etags):
+    """
+    Raises PreconditionFailed when an If-Match / If-None-Match header on a
+    write does not hold for the resource's current `etags`.
+    """
+    if evaluate_preconditions(request, etags) is not None:
+        raise PreconditionFailed()
+
+
+def conditional_data_response(request, response):
+    """
+    Tags a 200 response carrying serialized data and answers 304 when the
+    client already has that representation.
+    """
+    if response.status_code != status.HTTP_200_OK:
+        return response
+    etag = data_etag(response.data)
+    not_modified = evaluate_preconditions(request, [etag])
+    if not_modified is not None:
+        return not_modified
+    response['ETag'] = etag
+    return response
@@ -0,0 +1,123 @@
+import base64
+import binascii
+import hashlib
+from django.db import transaction
+from django.utils import timezone
+from axiomcore.instrumentation import record_storage_read, record_storage_written
+from .models import FileMetadata
+from .signals import file_content_changed
+from .storage import get_content_storage
+from .streaming import get_chunk_size
+
+RAW = FileMetadata.ContentFormat.RAW
+BASE64 = FileMetadata.ContentFormat.BASE64
+TEXT = FileMetadata.ContentFormat.TEXT
+
+
+def decode_base64(text):
+    """
+    Returns the bytes encoded by `text`, or None unless `text` is canonical
+    base64, i.e. re-encoding the bytes gives back exactly the same string.
+    Anything else cannot be stored raw without changing what clients read back.
+    """
+    if isinstance(text, str):
+        try:
+            text = text.encode('ascii')
+        except UnicodeEncodeError:
+            return None
+    try:
+        data = base64.b64decode(text, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    if base64.b64encode(data) != text:
+        return None
+    return data
+
+
+def convert_legacy_blob(file_id, storage=None):
+    """
+    Rewrites a file's legacy base64 blob as raw bytes. Returns the file's
+    content format afterwards: TEXT when the stored text does not round-trip,
+    in which case it is kept and served exactly as stored.
+    """
+    storage = storage or get_content_storage()
+    with transaction.atomic():
+        # Claiming the row first serialises concurrent conversions of one file.
+        claimed = FileMetadata.all_objects.filter(pk=file_id, content_format=BASE64).update(content_format=RAW)
+        if not claimed:
+            return FileMetadata.all_objects.filter(pk=file_id).values_list('content_format', flat=True).first()
+        try:
+            text = storage.read(file_id)
+            record_storage_read(len(text))
+        except FileNotFoundError:
+            # Nothing stored yet, so whatever is written next is raw.
+            return RAW
+        data = decode_base64(text)
+        if data is None:
+            FileMetadata.all_objects.filter(pk=file_id).update(content_format=TEXT)
+            return TEXT
+        if storage.read(file_id) != text:
+            # Rewritten while we decoded; the writer records the new format.
+            transaction.set_rollback(True)
+            return BASE64
+        storage.save(file_id, data)
+        record_storage_written(len(data))
+        FileMetadata.all_objects.filter(pk=file_id).update(content_digest=hashlib.sha256(data).hexdigest())
+    return RAW
+
+
+def ensure_raw(metadata, storage=None):
+    """
+    Converts the file's blob to raw bytes on first access. Returns its content format.
+    """
+    if metadata.content_format == BASE64:
+        metadata.content_format = convert_legacy_blob(metadata.id, storage)
+        metadata.content_digest = ''
+    return metadata.content_format
+
+
+def ensure_digest(metadata, storage=None):
+    """
+    Returns the SHA-256 of the file's blob, hashing and recording it the first
+    time. Raises FileNotFoundError when no content has been stored.
+    """
+    if not metadata.content_digest:
+        storage = storage or get_content_storage()
+        digest = hashlib.sha256()
+        for chunk in storage.iter_range(metadata.id, 0, storage.stat(metadata.id).size, get_chunk_size()):
+            digest.update(chunk)
+            record_storage_read(len(chunk))
+        metadata.content_digest = digest.hexdigest()
+        FileMetadata.all_objects.filter(pk=metadata.pk, content_digest='').update(content_digest=metadata.content_digest)
+    return metadata.content_digest
+
+
+def _hashed(chunks, digest):
+    for chunk in chunks:
+        digest.update(chunk)
+        record_storage_written(len(chunk))
+        yield chunk
+
+
+def write_content(metadata, chunks, content_format=RAW, storage=None):
+    """
+    Stores the file's blob from an iterable of byte chunks and records its
+    format and digest.
+    """
+    storage = storage or get_content_storage()
+    digest = hashlib.sha256()
+    storage.save_stream(metadata.id, _hashed(chunks, digest))
+    record_content(metadata, content_format, digest.hexdigest())
+
+
+def record_content(metadata, content_format, digest=''):
+    """
+    Records that the file's content was replaced. An empty digest is computed on next use.
+    """
+    metadata.content_format = content_format
+    metadata.content_digest = digest
+    metadata.updated_at = timezone.now()
+    FileMetadata.all_objects.filter(pk=metadata.pk).update(
+        content_format=content_format, content_digest=digest, updated_at=metadata.updated_at
+    )
+    file_content_changed.send(sender=FileMetadata, instance=metadata)
@@ -0,0 +1,200 @@
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.module_loading import import_string
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from auth_app.authentication import ClaimsJWTAuthentication
+
+logger = logging.getLogger(__name__)
+
+DEVICE_HEADER = 'HTTP_X_DEVICE_ID'
+
+# Device that made the current request, attached to the events it causes so
+# the device's own event stream can skip them.
+current_device = contextvars.ContextVar('current_device', default=None)
+
+
+class EventBroker:
+    """
+    Fans change events out to the event streams of the user they belong to.
+    `publish` is called from request threads; `subscribe` runs on the ASGI
+    event loop. A shared broker lets every server process see every event.
+    """
+
+    def publish(self, user_id, event):
+        raise NotImplementedError
+
+    def subscribe(self, user_id):
+        """
+        Async context manager yielding an asyncio.Queue of the user's events.
+        """
+        raise NotImplementedError
+
+
+class InProcessBroker(EventBroker):
+    """
+    Delivers events to streams served by this process only. Enough for a
+    single ASGI process; multiple processes need a shared broker behind the
+    same interface.
+
+    Queues are small and events that do not fit are dropped: every event only
+    tells the client to pull the change feed, and an undelivered event still
+    queued ahead of it already makes the client do that.
+    """
+
+    def __init__(self, queue_size=16):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(str(user_id), ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._offer, queue, event)
+
+    @staticmethod
+    def _offer(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.queue_size))
+        key = str(user_id)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(key)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._subscribers[key]
+
+    def subscriber_count(self, user_id):
+        with self._lock:
+            return len(self._subscribers.get(str(user_id), ()))
+
+
+@lru_cache(maxsize=None)
+def get_event_broker():
+    backend = getattr(settings, 'EVENT_BROKER_BACKEND', 'encryptor.events.InProcessBroker')
+    options = getattr(settings, 'EVENT_BROKER_OPTIONS', {})
+    return import_string(backend)(**options)
+
+
+@receiver(setting_changed)
+def reset_event_broker(setting, **kwargs):
+    if setting in ('EVENT_BROKER_BACKEND', 'EVENT_BROKER_OPTIONS'):
+        get_event_broker.cache_clear()
+
+
+def publish_change(user_id, event):
+    """
+    Publishes a change event. Failures are logged; clients still catch up
+    through the change feed.
+    """
+    try:
+        get_event_broker().publish(user_id, event)
+    except Exception:
+        logger.exception("Error publishing change event for %s.", user_id)
+
+
+@sync_and_async_middleware
+def device_origin_middleware(get_response):
+    """
+    Records the `X-Device-Id` request header in `current_device`.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = current_device.set(request.META.get(DEVICE_HEADER))
+            try:
+                return await get_response(request)
+            finally:
+                current_device.reset(token)
+        markcoroutinefunction(middleware)
+    else:
+        def middleware(request):
+            token = current_device.set(request.META.get(DEVICE_HEADER))
+            try:
+                return get_response(request)
+            finally:
+                current_device.reset(token)
+    return middleware
+
+
+def _authenticate(request):
+    """
+    Resolves the user from `Authorization: Bearer <access token>`, or from
+    `?token=` since browser EventSource cannot set headers.
+    """
+    authenticator = ClaimsJWTAuthentication()
+    header = authenticator.get_header(request)
+    raw_token = authenticator.get_raw_token(header) if header else request.GET.get('token', '').encode()
+    if not raw_token:
+        return None
+    try:
+        user = authenticator.get_user(authenticator.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    if user.is_locked or not (user.is_staff or user.is_superuser or user.is_subscription_active):
+        return None
+    return user
+
+
+def _format_event(event):
+    return f"event: change\nid: {event.get('seq') or ''}\ndata: {json.dumps(event)}\n\n"
+
+
+async def change_events(request):
+    """
+    Server-sent event stream of the user's file and category changes, for
+    ASGI deployments. Each `change` event carries the change feed cursor;
+    clients pull /api/changes/ when one arrives instead of polling. Pass
+    `?device=<id>` (the X-Device-Id the device writes with) to skip the
+    device's own changes.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "Event streams are only served under ASGI."}, status=501)
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided or are invalid."}, status=401)
+
+    device = request.GET.get('device')
+    broker = get_event_broker()
+    keepalive = getattr(settings, 'EVENT_STREAM_KEEPALIVE', 25)
+
+    async def stream():
+        async with broker.subscribe(user.pk) as events:
+            yield "retry: 5000\n: connected\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if device and event.get('origin') == device:
+                    continue
+                yield _format_event(event)
+
+    return StreamingHttpResponse(
+        stream(),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
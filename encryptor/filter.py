@@ -1,9 +1,22 @@
 import django_filters
-from datetime import timedelta
-from django.utils.timezone import now
+from datetime import datetime, time, timedelta
+from django.utils import timezone
 from .models import FileMetadata
 class FileFilter(django_filters.FilterSet):
     category = django_filters.CharFilter(field_name = 'category__category', lookup_expr = 'exact')
     file_name = django_filters.CharFilter(field_name='file_name',lookup_expr = 'icontains')
-    file_type = django_filters.CharFilter(field_name='file_type',lookup_expr = 'icontains')
-    created_at = django_filters.DateFilter(field_name='created_at__date',lookup_expr = 'exact')
\ No newline at end of file
+    file_type = django_filters.CharFilter(field_name='file_type',lookup_expr = 'exact')
+    created_at = django_filters.DateFilter(method='filter_created_on')
+    # Plain range predicates on the raw columns so the (owner, ...) indexes stay usable.
+    created_after = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='gte')
+    created_before = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='lt')
+    min_size = django_filters.NumberFilter(field_name='file_size', lookup_expr='gte')
+    max_size = django_filters.NumberFilter(field_name='file_size', lookup_expr='lte')
+
+    def filter_created_on(self, queryset, name, value):
+        """
+        Matches a calendar day in the current time zone as a half-open
+        `created_at` range instead of wrapping the column in a date function.
+        """
+        start = timezone.make_aware(datetime.combine(value, time.min))
+        return queryset.filter(created_at__gte=start, created_at__lt=start + timedelta(days=1))
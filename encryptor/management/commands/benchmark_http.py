@@ -0,0 +1,134 @@
+import importlib.util
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from auth_app.models import User
+from encryptor.benchmark import DEFAULT_MIX, parse_mix, run_benchmark
+
+APPLICATIONS = {
+    'wsgi': ['axiomcore.wsgi:application'],
+    'asgi': ['axiomcore.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'],
+}
+# Packages each server needs, all listed in requirements.txt.
+SERVER_PACKAGES = {
+    'wsgi': ['gunicorn'],
+    'asgi': ['gunicorn', 'uvicorn'],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests the API with concurrent clients replaying a mix of logins, listings, searches, "
+        "content downloads and uploads and dashboard calls, and prints throughput, error rate and "
+        "p50/p95/p99 latency per operation as JSON. Logs in as users created by seed_axiom."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="Benchmark a server already running here instead of starting one.")
+        parser.add_argument('--server', choices=sorted(APPLICATIONS), default='wsgi',
+                            help="Serve the WSGI or ASGI application with gunicorn (ASGI also needs uvicorn).")
+        parser.add_argument('--workers', type=int, default=4, help="gunicorn worker processes.")
+        parser.add_argument('--threads', type=int, default=1, help="Threads per gunicorn worker (WSGI only).")
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--concurrency', type=int, default=16, help="Concurrent clients.")
+        parser.add_argument('--duration', type=float, default=30, help="Measured seconds.")
+        parser.add_argument('--warmup', type=float, default=5, help="Seconds of load before measuring.")
+        parser.add_argument('--mix', default=DEFAULT_MIX, help="Operation weights.")
+        parser.add_argument('--prefix', default='seed', help="Username prefix given to seed_axiom.")
+        parser.add_argument('--key-hash', default='seed', help="Key hash given to seed_axiom.")
+        parser.add_argument('--users', type=int, help="Seeded users to log in as; defaults to one per client.")
+        parser.add_argument('--content-size', type=int, default=64 * 1024, help="Bytes per content upload.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the report here instead of to stdout.")
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        usernames = list(
+            User.objects.filter(username__startswith=f"{options['prefix']}-", is_active=True)
+            .order_by('username').values_list('username', flat=True)[:options['users'] or options['concurrency']]
+        )
+        if not usernames:
+            raise CommandError(f"No users named {options['prefix']}-<n>; seed the database with seed_axiom first.")
+
+        started_at = timezone.now()
+        server = None
+        url = options['url']
+        if url is None:
+            url = f"http://127.0.0.1:{options['port']}"
+            server = self.start_server(options, url)
+        try:
+            results = run_benchmark(
+                url, usernames, options['key_hash'], options['concurrency'], options['duration'],
+                warmup=options['warmup'], mix=mix, content_size=options['content_size'], seed=options['seed'],
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+        report = {
+            'commit': self.commit(),
+            'started_at': started_at.isoformat(),
+            'config': {
+                'url': options['url'], 'server': None if options['url'] else options['server'],
+                'workers': options['workers'], 'threads': options['threads'],
+                'concurrency': options['concurrency'], 'duration': options['duration'],
+                'warmup': options['warmup'], 'mix': mix, 'users': len(usernames),
+                'content_size': options['content_size'], 'seed': options['seed'],
+            },
+            **results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def start_server(self, options, url):
+        missing = [name for name in SERVER_PACKAGES[options['server']] if importlib.util.find_spec(name) is None]
+        if missing:
+            raise CommandError(
+                f"--server {options['server']} needs {', '.join(missing)}; "
+                f"install it with `pip install {' '.join(missing)}` (see requirements.txt)."
+            )
+        command = [
+            sys.executable, '-m', 'gunicorn', *APPLICATIONS[options['server']],
+            '--bind', url.removeprefix('http://'), '--workers', str(options['workers']),
+            '--threads', str(options['threads']),
+        ]
+        log = tempfile.TemporaryFile()
+        server = subprocess.Popen(command, cwd=settings.BASE_DIR, stdout=log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline and server.poll() is None:
+            try:
+                with urllib.request.urlopen(f'{url}/', timeout=1):
+                    return server
+            except urllib.error.HTTPError:
+                return server
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.2)
+        server.kill()
+        server.wait()
+        log.seek(0)
+        raise CommandError(f"The server did not start:\n{log.read().decode(errors='replace')[-2000:]}")
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from encryptor.storage import get_content_storage
+
+
+class Command(BaseCommand):
+    help = "Reclaims space held by deleted blobs in content pack files."
+
+    def handle(self, *args, **options):
+        storage = get_content_storage()
+        if not hasattr(storage, 'compact'):
+            self.stdout.write("The configured content storage does not use pack files.")
+            return
+        reclaimed = storage.compact()
+        self.stdout.write(self.style.SUCCESS(f"Reclaimed {reclaimed} bytes."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from encryptor.content import BASE64, RAW, TEXT, convert_legacy_blob
+from encryptor.models import FileMetadata
+from encryptor.storage import get_content_storage
+
+
+class Command(BaseCommand):
+    help = "Rewrites legacy base64 content blobs as raw bytes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        storage = get_content_storage()
+        counts = {RAW: 0, TEXT: 0, BASE64: 0}
+        last_id = None
+        while True:
+            batch = FileMetadata.all_objects.filter(content_format=BASE64).order_by('id')
+            if last_id is not None:
+                batch = batch.filter(id__gt=last_id)
+            ids = list(batch.values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            for file_id in ids:
+                counts[convert_legacy_blob(file_id, storage) or RAW] += 1
+            last_id = ids[-1]
+
+        self.stdout.write(f"Kept {counts[TEXT]} blobs that are not canonical base64 as text.")
+        if counts[BASE64]:
+            self.stdout.write(f"Skipped {counts[BASE64]} blobs rewritten during conversion.")
+        self.stdout.write(self.style.SUCCESS(f"Converted {counts[RAW]} blobs to raw bytes."))
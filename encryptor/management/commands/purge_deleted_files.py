@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from encryptor.purge import process_account_purges, purge_deleted_files
+
+
+class Command(BaseCommand):
+    help = "Runs pending account purges and removes soft-deleted files in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        jobs = process_account_purges(batch_size=options['batch_size'])
+        purged = purge_deleted_files(batch_size=options['batch_size'])
+        self.stdout.write(f"Ran {jobs} account purges.")
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} files."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from encryptor.models import Category, FileMetadata
+
+
+class Command(BaseCommand):
+    help = "Recomputes Category.files_count and total_bytes from FileMetadata and fixes any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without writing.")
+
+    def handle(self, *args, **options):
+        totals = {
+            row['category']: (row['count'], row['total'] or 0)
+            for row in FileMetadata.objects.values('category').annotate(count=Count('id'), total=Sum('file_size'))
+        }
+        fixed = 0
+        for category_id, files_count, total_bytes in Category.objects.values_list('pk', 'files_count', 'total_bytes').iterator():
+            actual = totals.get(category_id, (0, 0))
+            if (files_count, total_bytes) == actual:
+                continue
+            fixed += 1
+            self.stdout.write(
+                f"{category_id}: counters {files_count} files / {total_bytes} bytes, "
+                f"actual {actual[0]} files / {actual[1]} bytes"
+            )
+            if not options['dry_run']:
+                Category.objects.filter(pk=category_id).update(files_count=actual[0], total_bytes=actual[1])
+
+        verb = "Found" if options['dry_run'] else "Fixed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {fixed} drifted category totals."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from encryptor import search
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index over file names, types and categories."
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stdout.write("Full-text index is only used on SQLite; nothing to do.")
+            return
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} files."))
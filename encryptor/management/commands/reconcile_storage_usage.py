@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from auth_app.models import User
+from encryptor.models import FileMetadata
+
+
+class Command(BaseCommand):
+    help = "Recomputes User.used_storage_bytes from FileMetadata and fixes any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without writing.")
+
+    def handle(self, *args, **options):
+        totals = dict(
+            FileMetadata.objects.values_list('owner').annotate(total=Sum('file_size')).values_list('owner', 'total')
+        )
+        fixed = 0
+        for user_id, stored in User.objects.values_list('pk', 'used_storage_bytes').iterator():
+            actual = totals.get(user_id) or 0
+            if stored == actual:
+                continue
+            fixed += 1
+            self.stdout.write(f"{user_id}: counter {stored} bytes, actual {actual} bytes")
+            if not options['dry_run']:
+                User.objects.filter(pk=user_id).update(used_storage_bytes=actual)
+
+        verb = "Found" if options['dry_run'] else "Fixed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {fixed} drifted storage counters."))
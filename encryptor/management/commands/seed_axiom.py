@@ -0,0 +1,186 @@
+import hashlib
+import math
+import random
+import time
+import uuid
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from auth_app.models import SubscriptionPlan, User
+from encryptor import search
+from encryptor.models import Category, ChangeLogEntry, FileMetadata
+from encryptor.storage import get_content_storage
+
+CATEGORY_NAMES = [
+    'Documents', 'Photos', 'Work', 'Personal', 'Finance', 'Travel', 'Music', 'Videos', 'Archive', 'Projects',
+    'Receipts', 'Medical', 'School', 'Taxes', 'Family', 'Scans', 'Backups', 'Contracts', 'Drafts', 'Misc',
+]
+FILE_WORDS = ['report', 'invoice', 'photo', 'scan', 'notes', 'backup', 'contract', 'receipt', 'draft', 'statement']
+# Extension and relative frequency.
+FILE_TYPES = [('pdf', 30), ('jpg', 25), ('png', 10), ('docx', 10), ('txt', 8), ('xlsx', 7), ('zip', 5), ('mp4', 5)]
+BLOB_BLOCK_SIZE = 64 * 1024
+
+
+def _parse_plans(value):
+    plans, weights = [], []
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        try:
+            plans.append(SubscriptionPlan(name.strip().upper()))
+            weights.append(float(weight or 1))
+        except ValueError:
+            raise CommandError(f"Invalid plan weight {part!r}; expected e.g. FREE=70,STANDARD=25,PRO=5.")
+    return plans, weights
+
+
+def _files_per_user(total, users, skew):
+    """
+    Splits `total` files over `users` with Zipf weights 1/rank**skew; 0 spreads them evenly.
+    """
+    weights = [1 / (rank ** skew) for rank in range(1, users + 1)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for n in range(total - sum(counts)):
+        counts[n % users] += 1
+    return counts
+
+
+def _blob_chunks(file_id, size):
+    """
+    Incompressible bytes standing in for encrypted content, the same for the same file id.
+    """
+    block = random.Random(file_id.int).randbytes(min(size, BLOB_BLOCK_SIZE))
+    for start in range(0, size, len(block) or 1):
+        yield block[:size - start]
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the database with synthetic users, categories and files for load and scale testing. "
+        "The same --seed on an empty database gives the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--files', type=int, default=1000, help="Total files, spread over the users.")
+        parser.add_argument('--categories', type=int, default=5, help="Categories per user.")
+        parser.add_argument('--skew', type=float, default=1.0,
+                            help="Zipf exponent of files per user; 0 gives every user the same number.")
+        parser.add_argument('--median-size', type=int, default=256 * 1024, help="Median file size in bytes.")
+        parser.add_argument('--size-sigma', type=float, default=1.5, help="Spread of the log-normal file sizes.")
+        parser.add_argument('--max-size', type=int, default=100 * 1024 * 1024, help="Largest file size in bytes.")
+        parser.add_argument('--plans', default='FREE=70,STANDARD=25,PRO=5', help="Subscription plan weights.")
+        parser.add_argument('--prefix', default='seed', help="Usernames are <prefix>-<n>.")
+        parser.add_argument('--key-hash', default='seed', help="Login key hash of every seeded user.")
+        parser.add_argument('--recovery-key-hash', default='seed-recovery', help="Recovery key hash of every seeded user.")
+        parser.add_argument('--blobs', action='store_true', help="Also write content blobs of the files' sizes.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=f"{options['prefix']}-").exists():
+            raise CommandError(f"Users named {options['prefix']}-<n> already exist; pick another --prefix.")
+        if options['users'] < 1 or options['categories'] < 1 or options['batch_size'] < 1:
+            raise CommandError("--users, --categories and --batch-size must be at least 1.")
+
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.plans, self.plan_weights = _parse_plans(options['plans'])
+        self.storage = get_content_storage() if options['blobs'] else None
+        self.now = timezone.now()
+        self.users, self.categories, self.files = [], [], []
+        self.totals = {'users': 0, 'categories': 0, 'files': 0, 'bytes': 0}
+        started = time.monotonic()
+
+        counts = _files_per_user(options['files'], options['users'], options['skew'])
+        for n, file_count in enumerate(counts):
+            self.add_user(n, file_count)
+        self.flush()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {self.totals['users']} users, {self.totals['categories']} categories and "
+            f"{self.totals['files']} files ({self.totals['bytes']} bytes) in {time.monotonic() - started:.1f}s."
+        ))
+
+    def uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def token(self):
+        return '%032x' % self.rng.getrandbits(128)
+
+    def file_size(self):
+        size = self.rng.lognormvariate(math.log(self.options['median_size']), self.options['size_sigma'])
+        return max(1, min(int(size), self.options['max_size']))
+
+    def add_user(self, n, file_count):
+        rng = self.rng
+        plan = rng.choices(self.plans, self.plan_weights)[0]
+        user = User(
+            id=self.uuid(), username=f"{self.options['prefix']}-{n}", salt=self.token(),
+            key_hash=self.options['key_hash'], encrypted_dek=self.token(), recovery_encrypted_dek=self.token(),
+            recovery_key_hash=self.options['recovery_key_hash'], recovery_salt=self.token(), subscription_plan=plan,
+            subscription_expiry=self.now + timedelta(days=plan.get_duration()),
+            upload_limit_mb=plan.get_upload_limit(),
+        )
+        names = rng.sample(CATEGORY_NAMES, min(self.options['categories'], len(CATEGORY_NAMES)))
+        names += [f'Category {k}' for k in range(len(names), self.options['categories'])]
+        categories = [Category(category=name, owner=user) for name in names]
+
+        # Sizes and categories are drawn up front so the counters can be
+        # written with the rows instead of updated afterwards.
+        placements = [(rng.randrange(len(categories)), self.file_size()) for _ in range(file_count)]
+        for index, size in placements:
+            categories[index].files_count += 1
+            categories[index].total_bytes += size
+            user.used_storage_bytes += size
+        self.users.append(user)
+        self.categories.extend(categories)
+
+        for index, size in placements:
+            ext = rng.choices(FILE_TYPES, [weight for _, weight in FILE_TYPES])[0][0]
+            self.files.append(FileMetadata(
+                id=self.uuid(), owner=user, category=categories[index], file_type=ext, file_size=size,
+                file_name=f'{rng.choice(FILE_WORDS)}-{self.totals["files"] + len(self.files)}.{ext}',
+            ))
+            if len(self.files) >= self.options['batch_size']:
+                self.flush()
+        if len(self.users) >= self.options['batch_size']:
+            self.flush()
+
+    def write_blob(self, metadata):
+        digest = hashlib.sha256()
+        chunks = _blob_chunks(metadata.id, metadata.file_size)
+        self.storage.save_stream(metadata.id, (digest.update(chunk) or chunk for chunk in chunks))
+        metadata.content_digest = digest.hexdigest()
+
+    def flush(self):
+        """
+        Inserts everything pending, with the search index and change log
+        entries the signals would have written.
+        """
+        batch_size = self.options['batch_size']
+        with transaction.atomic():
+            User.objects.bulk_create(self.users, batch_size=batch_size)
+            Category.objects.bulk_create(self.categories, batch_size=batch_size)
+            if self.storage is not None:
+                for metadata in self.files:
+                    self.write_blob(metadata)
+            FileMetadata.objects.bulk_create(self.files, batch_size=batch_size)
+            search.index_files(self.files, {f.category_id: f.category.category for f in self.files})
+            ChangeLogEntry.objects.bulk_create(
+                [ChangeLogEntry(owner_id=c.owner_id, kind=ChangeLogEntry.Kind.CATEGORY, object_id=str(c.pk),
+                                action=ChangeLogEntry.Action.UPSERT) for c in self.categories]
+                + [ChangeLogEntry(owner_id=f.owner_id, kind=ChangeLogEntry.Kind.FILE, object_id=str(f.id),
+                                  action=ChangeLogEntry.Action.UPSERT) for f in self.files],
+                batch_size=batch_size,
+            )
+
+        self.totals['users'] += len(self.users)
+        self.totals['categories'] += len(self.categories)
+        self.totals['files'] += len(self.files)
+        self.totals['bytes'] += sum(f.file_size for f in self.files)
+        if self.options['verbosity'] > 1:
+            self.stdout.write(f"{self.totals['users']} users, {self.totals['files']} files")
+        # Users and categories stay referenced by pending files until those are flushed.
+        self.users, self.categories, self.files = [], [], []
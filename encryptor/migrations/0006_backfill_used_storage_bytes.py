@@ -0,0 +1,22 @@
+from django.db import migrations
+from django.db.models import Sum
+
+
+def backfill_used_storage(apps, schema_editor):
+    User = apps.get_model('auth_app', 'User')
+    FileMetadata = apps.get_model('encryptor', 'FileMetadata')
+    totals = FileMetadata.objects.values('owner').annotate(total=Sum('file_size'))
+    for row in totals:
+        User.objects.filter(pk=row['owner']).update(used_storage_bytes=row['total'] or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encryptor', '0005_uploadsession_uploadchunk'),
+        ('auth_app', '0006_user_used_storage_bytes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_used_storage, migrations.RunPython.noop),
+    ]
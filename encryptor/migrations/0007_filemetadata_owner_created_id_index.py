@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encryptor', '0006_backfill_used_storage_bytes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='filemetadata',
+            index=models.Index(fields=['owner', 'created_at', 'id'], name='file_owner_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encryptor', '0007_filemetadata_owner_created_id_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='filemetadata',
+            index=models.Index(fields=['owner', 'file_type', 'created_at'], name='file_owner_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='filemetadata',
+            index=models.Index(fields=['owner', 'category', 'created_at'], name='file_owner_category_idx'),
+        ),
+    ]
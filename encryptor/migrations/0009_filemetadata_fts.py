@@ -0,0 +1,45 @@
+from django.db import migrations
+
+FTS_TABLE = 'encryptor_filemetadata_fts'
+
+
+def fts_rowid(file_id):
+    value = file_id.int >> 64
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def create_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    FileMetadata = apps.get_model('encryptor', 'FileMetadata')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "file_id UNINDEXED, owner, file_name, file_type, category, "
+            "tokenize = 'unicode61', prefix = '2 3')"
+        )
+        rows = FileMetadata.objects.values_list('id', 'owner_id', 'file_name', 'file_type', 'category__category')
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, file_id, owner, file_name, file_type, category) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            [[fts_rowid(file_id), file_id.hex, owner_id.hex, name, file_type, category]
+             for file_id, owner_id, name, file_type, category in rows.iterator()],
+        )
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encryptor', '0008_filemetadata_owner_type_category_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
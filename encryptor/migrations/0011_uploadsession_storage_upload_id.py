@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:43
+
+from django.db import migrations, models
+
+
+def adopt_upload_temp_files(apps, schema_editor):
+    # Open sessions wrote to `.uploads/<session id>.part`, which is where the
+    # file system storage keeps the multipart upload with that id.
+    UploadSession = apps.get_model('encryptor', 'UploadSession')
+    for session in UploadSession.objects.filter(storage_upload_id=''):
+        UploadSession.objects.filter(pk=session.pk).update(storage_upload_id=str(session.pk))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encryptor', '0010_filemetadata_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadchunk',
+            name='etag',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='uploadsession',
+            name='storage_upload_id',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(adopt_upload_temp_files, migrations.RunPython.noop),
+    ]
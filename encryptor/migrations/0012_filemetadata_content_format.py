@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encryptor', '0011_uploadsession_storage_upload_id'),
+    ]
+
+    operations = [
+        # Every blob written so far is base64 text; new ones are raw bytes.
+        migrations.AddField(
+            model_name='filemetadata',
+            name='content_format',
+            field=models.CharField(choices=[('raw', 'Raw bytes'), ('base64', 'Legacy base64 text, not yet converted'), ('text', 'Text that is not canonical base64')], default='base64', editable=False, help_text='How the stored content blob is encoded', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='filemetadata',
+            name='content_format',
+            field=models.CharField(choices=[('raw', 'Raw bytes'), ('base64', 'Legacy base64 text, not yet converted'), ('text', 'Text that is not canonical base64')], default='raw', editable=False, help_text='How the stored content blob is encoded', max_length=10),
+        ),
+    ]
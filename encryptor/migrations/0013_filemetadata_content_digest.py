@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encryptor', '0012_filemetadata_content_format'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='filemetadata',
+            name='content_digest',
+            field=models.CharField(blank=True, default='', editable=False, help_text='SHA-256 of the stored content blob, empty until first computed', max_length=64),
+        ),
+    ]
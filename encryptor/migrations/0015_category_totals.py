@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:57
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_category_totals(apps, schema_editor):
+    Category = apps.get_model('encryptor', 'Category')
+    FileMetadata = apps.get_model('encryptor', 'FileMetadata')
+    totals = FileMetadata.objects.filter(deleted_at__isnull=True).values('category')\
+        .annotate(count=Count('id'), total=Sum('file_size'))
+    for row in totals:
+        Category.objects.filter(pk=row['category']).update(files_count=row['count'], total_bytes=row['total'] or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encryptor', '0014_changelogentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='files_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Number of live files in the category'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='total_bytes',
+            field=models.BigIntegerField(default=0, editable=False, help_text="Total size of the category's live files in bytes"),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['owner', '-files_count'], name='category_owner_count_idx'),
+        ),
+        migrations.RunPython(backfill_category_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+import uuid
+from django.db import migrations
+
+FTS_TABLE = 'encryptor_filemetadata_fts'
+FTS_IDS_TABLE = 'encryptor_filemetadata_fts_ids'
+
+
+def create_fts_ids(apps, schema_editor):
+    """
+    Index rows used to be keyed by the upper 64 bits of the file id, so a
+    collision could replace another file's row. Re-index every live file
+    under a rowid of its own.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    FileMetadata = apps.get_model('encryptor', 'FileMetadata')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {FTS_IDS_TABLE} ("
+            "rowid INTEGER PRIMARY KEY, file_id TEXT NOT NULL UNIQUE)"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_IDS_TABLE}_ad AFTER DELETE ON {FTS_IDS_TABLE} "
+            f"BEGIN DELETE FROM {FTS_TABLE} WHERE rowid = old.rowid; END"
+        )
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        rows = FileMetadata.objects.filter(deleted_at__isnull=True)\
+            .values_list('id', 'owner_id', 'file_name', 'file_type', 'category__category')
+        for file_id, owner_id, name, file_type, category in rows.iterator():
+            cursor.execute(f"INSERT OR IGNORE INTO {FTS_IDS_TABLE} (file_id) VALUES (%s)", [file_id.hex])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, file_id, owner, file_name, file_type, category) "
+                f"SELECT rowid, file_id, %s, %s, %s, %s FROM {FTS_IDS_TABLE} WHERE file_id = %s",
+                [owner_id.hex, name, file_type, category, file_id.hex],
+            )
+
+
+def legacy_rowid(file_id):
+    value = file_id.int >> 64
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def drop_fts_ids(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_IDS_TABLE}")
+        rows = cursor.execute(f"SELECT file_id, owner, file_name, file_type, category FROM {FTS_TABLE}").fetchall()
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.executemany(
+            f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, file_id, owner, file_name, file_type, category) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            [[legacy_rowid(uuid.UUID(row[0])), *row] for row in rows],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encryptor', '0015_category_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_ids, drop_fts_ids),
+    ]
@@ -1,19 +1,75 @@
 from django.db import models
+from django.db.models import Case, F, Value, When
 from django.conf import settings
 from auth_app.models import User
 import uuid
+class CategoryManager(models.Manager):
+    def adjust_totals(self, category_id, files_delta, bytes_delta):
+        """
+        Atomically adds the deltas (may be negative) to a category's file count and size.
+        """
+        if files_delta or bytes_delta:
+            self.filter(pk=category_id).update(
+                files_count=F('files_count') + files_delta, total_bytes=F('total_bytes') + bytes_delta
+            )
+
+    def adjust_many_totals(self, deltas):
+        """
+        Applies {category_id: (files_delta, bytes_delta)} to many categories in one UPDATE.
+        """
+        if not deltas:
+            return
+        self.filter(pk__in=deltas).update(
+            files_count=F('files_count') + Case(
+                *[When(pk=pk, then=Value(files)) for pk, (files, _) in deltas.items()], output_field=models.IntegerField()
+            ),
+            total_bytes=F('total_bytes') + Case(
+                *[When(pk=pk, then=Value(size)) for pk, (_, size) in deltas.items()], output_field=models.BigIntegerField()
+            ),
+        )
+
 class Category(models.Model):
     category= models.CharField(max_length=20)
     owner = models.ForeignKey(User, on_delete= models.CASCADE, related_name='categories')
+    files_count = models.IntegerField(default=0, editable=False, help_text="Number of live files in the category")
+    total_bytes = models.BigIntegerField(default=0, editable=False, help_text="Total size of the category's live files in bytes")
+
+    objects = CategoryManager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['category', 'owner'], name = 'unique_category_per_owner')
         ]
+        indexes = [
+            models.Index(fields=['owner', '-files_count'], name='category_owner_count_idx'),
+        ]
         
     def __str__(self):
             return f"{self.category}, owned by {self.owner}"
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # The totals are only changed by in-place updates; don't write back
+            # values that may be stale by now.
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('files_count', 'total_bytes')
+            ]
+        super().save(*args, **kwargs)
+
+class LiveFileManager(models.Manager):
+    """
+    Hides soft-deleted files; they stay in the table until the purge worker removes them.
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 class FileMetadata(models.Model):
+    class ContentFormat(models.TextChoices):
+        RAW = 'raw', 'Raw bytes'
+        BASE64 = 'base64', 'Legacy base64 text, not yet converted'
+        TEXT = 'text', 'Text that is not canonical base64'
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='files')
     category = models.ForeignKey(Category, on_delete= models.CASCADE, related_name='files')
@@ -22,8 +78,114 @@ class FileMetadata(models.Model):
     file_size = models.BigIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    content_format = models.CharField(
+        max_length=10, choices=ContentFormat.choices, default=ContentFormat.RAW, editable=False,
+        help_text="How the stored content blob is encoded"
+    )
+    content_digest = models.CharField(
+        max_length=64, blank=True, default='', editable=False,
+        help_text="SHA-256 of the stored content blob, empty until first computed"
+    )
+
+    objects = LiveFileManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', 'created_at', 'id'], name='file_owner_created_id_idx'),
+            models.Index(fields=['owner', 'file_type', 'created_at'], name='file_owner_type_idx'),
+            models.Index(fields=['owner', 'category', 'created_at'], name='file_owner_category_idx'),
+            models.Index(fields=['deleted_at'], name='file_pending_purge_idx', condition=models.Q(deleted_at__isnull=False)),
+        ]
     def __str__(self):
         return f"{self.file_name}, {self.file_type}, {self.file_size} bytes"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored size and category so signals can apply the delta on update.
+        instance._loaded_file_size = instance.__dict__.get('file_size')
+        instance._loaded_category_id = instance.__dict__.get('category_id')
+        return instance
+
+
+class UploadSession(models.Model):
+    """
+    A resumable, chunked upload of a file's encrypted content.
+    Each chunk is stored as one part of a content storage multipart upload,
+    which is assembled over the stored content when the session is finalized.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    file = models.ForeignKey(FileMetadata, on_delete=models.CASCADE, related_name='upload_sessions')
+    total_size = models.BigIntegerField(help_text="Total size of the upload in bytes")
+    chunk_size = models.IntegerField(help_text="Size of every chunk except the last, in bytes")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    storage_upload_id = models.CharField(max_length=255, blank=True, default='', editable=False)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Upload {self.id} for {self.file_id}, {self.total_size} bytes"
+
+    @property
+    def chunk_count(self):
+        if self.total_size == 0:
+            return 0
+        return (self.total_size + self.chunk_size - 1) // self.chunk_size
+
+    def expected_chunk_length(self, index):
+        return min(self.chunk_size, self.total_size - index * self.chunk_size)
+
+
+class UploadChunk(models.Model):
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.IntegerField()
+    size = models.IntegerField()
+    etag = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        ordering = ['index']
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'index'], name='unique_chunk_per_session')
+        ]
+
+    def __str__(self):
+        return f"Chunk {self.index} of {self.session_id}"
+
+
+class ChangeLogEntry(models.Model):
+    """
+    One change to a user's files or categories, in commit order.
+    `seq` never goes backwards, so a client that remembers the last `seq` it
+    saw can ask for everything after it. Only the latest entry per object is
+    kept, which bounds the log by the number of objects and tombstones.
+    """
+    class Kind(models.TextChoices):
+        FILE = 'file', 'File'
+        CATEGORY = 'category', 'Category'
+
+    class Action(models.TextChoices):
+        UPSERT = 'upsert', 'Created or updated'
+        DELETE = 'delete', 'Deleted'
+
+    seq = models.BigAutoField(primary_key=True)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='changes')
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    object_id = models.CharField(max_length=36)
+    action = models.CharField(max_length=10, choices=Action.choices)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['seq']
+        indexes = [
+            models.Index(fields=['owner', 'seq'], name='change_owner_seq_idx'),
+            models.Index(fields=['owner', 'kind', 'object_id'], name='change_owner_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.seq} {self.action} {self.kind} {self.object_id}"
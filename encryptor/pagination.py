@@ -1,4 +1,12 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+import uuid
+from datetime import datetime
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 class StandardResultsSetPagination(PageNumberPagination):
     """
@@ -7,4 +15,128 @@ class StandardResultsSetPagination(PageNumberPagination):
     """
     page_size = 40
     page_size_query_param = 'page_size'
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
+
+class FileCursorPagination(BasePagination):
+    """
+    Keyset pagination over (created_at, id), newest first.
+    Each page is a range scan on the (owner, created_at, id) index that starts
+    from the opaque cursor, so deep pages cost the same as the first one and
+    no COUNT(*) is issued. Opt in with `?pagination=cursor`.
+    """
+    page_size = 40
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    invalid_cursor_message = 'Invalid cursor'
+
+    @classmethod
+    def is_requested(cls, request):
+        params = request.query_params
+        return params.get(cls.mode_query_param) == 'cursor' or cls.cursor_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+            if size > 0:
+                return min(size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk, reverse = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            return datetime.fromisoformat(created_at), uuid.UUID(pk), bool(reverse)
+        except (AttributeError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def position(row):
+        """
+        (created_at, pk) of a model instance or a `.values()` row.
+        """
+        if isinstance(row, dict):
+            return row['created_at'], row['id']
+        return row.created_at, row.pk
+
+    def encode_cursor(self, created_at, pk, reverse):
+        payload = json.dumps([created_at.isoformat(), str(pk), int(reverse)], separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        url = replace_query_param(self.base_url, self.mode_query_param, 'cursor')
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        if cursor is None:
+            reverse = False
+            queryset = queryset.order_by('-created_at', '-id')
+        else:
+            created_at, pk, reverse = cursor
+            if reverse:
+                queryset = queryset.filter(created_at__gte=created_at)\
+                    .filter(Q(created_at__gt=created_at) | Q(id__gt=pk))\
+                    .order_by('created_at', 'id')
+            else:
+                queryset = queryset.filter(created_at__lte=created_at)\
+                    .filter(Q(created_at__lt=created_at) | Q(id__lt=pk))\
+                    .order_by('-created_at', '-id')
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+
+        self.next_link = None
+        self.previous_link = None
+        if rows:
+            if has_next:
+                self.next_link = self.encode_cursor(*self.position(rows[-1]), reverse=False)
+            if has_previous:
+                self.previous_link = self.encode_cursor(*self.position(rows[0]), reverse=True)
+        elif cursor is not None:
+            # Empty page past either end: point back at where the client came from.
+            created_at, pk, _ = cursor
+            if reverse:
+                self.next_link = self.encode_cursor(created_at, pk, reverse=False)
+            else:
+                self.previous_link = self.encode_cursor(created_at, pk, reverse=True)
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.next_link,
+            'previous': self.previous_link,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+def is_first_page(request):
+    """
+    Whether a files list request asks for the first page in either pagination mode.
+    """
+    params = request.query_params
+    return params.get(StandardResultsSetPagination.page_query_param, '1') == '1' \
+        and FileCursorPagination.cursor_query_param not in params
@@ -0,0 +1,193 @@
+"""
+Request scenarios covering every API route, with the query budget each one
+must stay within whatever the size of the user's library. Used by the
+performance regression tests.
+"""
+import json
+import os
+import statistics
+import time
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from auth_app.lookups import salt_lookup
+from auth_app.tokens import token_versions
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'perf_baselines.json')
+
+OWNER = 'owner'
+ADMIN = 'admin'
+ANONYMOUS = 'anonymous'
+
+
+class Scenario:
+    """
+    One request. `path` and `data` may use the fixture names as str.format
+    fields; `data` may also be a callable taking the fixtures. `setup(client,
+    fixtures)` runs unmeasured before each run and returns extra fixtures,
+    for requests that consume state outside the database.
+    """
+
+    def __init__(self, name, method, path, budget, status, data=None, client=OWNER, content_type=None, headers=None,
+                 setup=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.budget = budget
+        self.status = status
+        self.data = data
+        self.client = client
+        self.content_type = content_type
+        self.headers = headers or {}
+        self.setup = setup
+
+    def request(self, client, fixtures):
+        data = self.data(fixtures) if callable(self.data) else self.data
+        kwargs = dict(self.headers)
+        if self.content_type:
+            kwargs['content_type'] = self.content_type
+        elif data is not None and self.method != 'get':
+            kwargs['format'] = 'json'
+        return getattr(client, self.method)(self.path.format(**fixtures), data, **kwargs)
+
+
+def _registration(fixtures):
+    return {
+        'username': 'perf-newcomer', 'salt': 'salt', 'key_hash': 'hash', 'encrypted_dek': 'dek',
+        'recovery_encrypted_dek': 'rdek', 'recovery_key_hash': 'rhash', 'recovery_salt': 'rsalt',
+    }
+
+
+def _open_upload(client, fixtures, upload_chunk=False):
+    url = f"/api/files/{fixtures['upload_file']}/upload-sessions/"
+    session = client.post(url, {'total_size': 10}, format='json').data['id']
+    if upload_chunk:
+        client.put(f'{url}{session}/chunks/0/', b'0123456789', content_type='application/octet-stream')
+    return {'session': session}
+
+
+def _open_complete_upload(client, fixtures):
+    return _open_upload(client, fixtures, upload_chunk=True)
+
+
+def _new_files(fixtures):
+    return [
+        {'file_name': f'new-{n}.bin', 'file_type': 'bin', 'file_size': 10, 'category': fixtures['category']}
+        for n in range(10)
+    ]
+
+
+SCENARIOS = [
+    # axiomcore/urls.py
+    Scenario('health', 'get', '/', 0, 200, client=ANONYMOUS),
+    Scenario('app-info', 'get', '/api/app-info/', 0, 200, client=ANONYMOUS),
+    Scenario('plans', 'get', '/plans/', 0, 200, client=ANONYMOUS),
+    Scenario('token-obtain', 'post', '/api/token/', 1, 200, client=ANONYMOUS,
+             data=lambda f: {'username': f['username'], 'password': 'hash'}),
+    Scenario('token-refresh', 'post', '/api/token/refresh/', 1, 200, client=ANONYMOUS,
+             data=lambda f: {'refresh': f['refresh']}),
+    Scenario('token-verify', 'post', '/api/token/verify/', 0, 200, client=ANONYMOUS,
+             data=lambda f: {'token': f['access']}),
+    Scenario('verify-auth', 'get', '/verify-auth/', 1, 200),
+    Scenario('cache-stats', 'get', '/cache-stats/', 1, 200, client=ADMIN),
+    # auth_app/urls.py
+    Scenario('accounts-root', 'get', '/auth/', 1, 200),
+    Scenario('account-create', 'post', '/auth/accounts/', 2, 201, client=ANONYMOUS, data=_registration),
+    Scenario('account-list', 'get', '/auth/accounts/', 2, 200, client=ADMIN),
+    Scenario('account-retrieve', 'get', '/auth/accounts/{user}/', 2, 200),
+    Scenario('account-update', 'patch', '/auth/accounts/{user}/', 4, 200, data={'encrypted_dek': 'dek2'}),
+    Scenario('account-destroy', 'delete', '/auth/accounts/{user}/', 6, 202),
+    Scenario('account-me', 'get', '/auth/accounts/me/', 1, 200),
+    Scenario('account-dashboard', 'get', '/auth/accounts/account-dashboard/', 1, 200),
+    Scenario('get-salt', 'get', '/auth/accounts/get-salt/?username={username}', 2, 200, client=ANONYMOUS),
+    Scenario('get-recovery-salt', 'get', '/auth/accounts/get-recovery-salt/?username={username}', 2, 200,
+             client=ANONYMOUS),
+    Scenario('initiate-recovery', 'post', '/auth/accounts/initiate-recovery/', 1, 200, client=ANONYMOUS,
+             data=lambda f: {'username': f['username'], 'recovery_key_hash': 'rhash'}),
+    Scenario('finalize-recovery', 'post', '/auth/accounts/finalize-recovery/', 2, 200, client=ANONYMOUS,
+             data=lambda f: {'username': f['username'], 'new_salt': 's2', 'new_key_hash': 'h2', 'new_encrypted_dek': 'd2'}),
+    Scenario('change-password', 'post', '/auth/accounts/change-password/', 2, 200,
+             data={'new_salt': 's2', 'new_key_hash': 'h2', 'new_encrypted_dek': 'd2'}),
+    Scenario('purge-status', 'get', '/auth/accounts/purge-status/{job}/', 1, 200, client=ANONYMOUS),
+    # encryptor/urls.py
+    Scenario('api-root', 'get', '/api/', 1, 200),
+    Scenario('files-list', 'get', '/api/files/', 3, 200),
+    Scenario('files-list-cursor', 'get', '/api/files/?pagination=cursor', 2, 200),
+    Scenario('files-search', 'get', '/api/files/?search=report', 4, 200),
+    Scenario('files-filter', 'get', '/api/files/?category={category_name}&min_size=1', 3, 200),
+    Scenario('file-retrieve', 'get', '/api/files/{file}/', 2, 200),
+    Scenario('file-create', 'post', '/api/files/', 11, 201,
+             data=lambda f: {'file_name': 'new.bin', 'file_type': 'bin', 'file_size': 10, 'category': f['category']}),
+    Scenario('file-update', 'patch', '/api/files/{file}/', 7, 200, data={'file_name': 'renamed.bin'}),
+    Scenario('file-destroy', 'delete', '/api/files/{file}/', 10, 204),
+    Scenario('files-bulk-create', 'post', '/api/files/bulk-create/', 11, 201, data=_new_files),
+    Scenario('files-bulk-delete', 'post', '/api/files/bulk-delete/', 9, 200, data=lambda f: {'ids': f['file_ids']}),
+    Scenario('file-content', 'get', '/api/files/{content_file}/content/', 2, 200),
+    Scenario('file-content-binary', 'get', '/api/files/{content_file}/content/', 2, 200,
+             headers={'HTTP_ACCEPT': 'application/octet-stream'}),
+    Scenario('file-content-put', 'put', '/api/files/{content_file}/content/', 6, 204,
+             data=b'new content', content_type='application/octet-stream'),
+    Scenario('file-content-raw', 'get', '/api/files/{content_file}/content/raw/', 2, 200),
+    Scenario('upload-session-create', 'post', '/api/files/{upload_file}/upload-sessions/', 7, 201,
+             data={'total_size': 10}),
+    Scenario('upload-session-detail', 'get', '/api/files/{upload_file}/upload-sessions/{session}/', 4, 200,
+             setup=_open_upload),
+    Scenario('upload-chunk', 'put', '/api/files/{upload_file}/upload-sessions/{session}/chunks/0/', 5, 204,
+             data=b'0123456789', content_type='application/octet-stream', setup=_open_upload),
+    Scenario('upload-finalize', 'post', '/api/files/{upload_file}/upload-sessions/{session}/finalize/', 10, 204,
+             setup=_open_complete_upload),
+    Scenario('upload-session-delete', 'delete', '/api/files/{upload_file}/upload-sessions/{session}/', 5, 204,
+             setup=_open_upload),
+    Scenario('categories-list', 'get', '/api/categories/', 2, 200),
+    Scenario('category-retrieve', 'get', '/api/categories/{category}/', 2, 200),
+    Scenario('category-create', 'post', '/api/categories/', 5, 201, data={'category': 'Fresh'}),
+    Scenario('category-update', 'patch', '/api/categories/{category}/', 9, 200, data={'category': 'Renamed'}),
+    Scenario('category-destroy', 'delete', '/api/categories/{empty_category}/', 6, 204),
+    Scenario('category-summary', 'get', '/api/category-summary/', 2, 200),
+    Scenario('category-summary-retrieve', 'get', '/api/category-summary/{category}/', 2, 200),
+    Scenario('changes', 'get', '/api/changes/?since=0', 4, 200),
+    Scenario('events', 'get', '/api/events/', 0, 501),
+]
+
+
+def reset_process_caches():
+    """
+    Empties the response cache and in-memory lookup tables so every request
+    runs cold and issues the same queries each time.
+    """
+    cache.clear()
+    token_versions.clear()
+    salt_lookup.clear()
+
+
+def run_scenario(scenario, client, fixtures, runs=1):
+    """
+    Runs `scenario` `runs` times, each time cold and rolled back afterwards.
+    Returns the last response, its query count and the median duration in seconds.
+    """
+    durations = []
+    for _ in range(runs):
+        with transaction.atomic():
+            run_fixtures = dict(fixtures, **scenario.setup(client, fixtures)) if scenario.setup else fixtures
+            reset_process_caches()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = scenario.request(client, run_fixtures)
+                durations.append(time.perf_counter() - started)
+            transaction.set_rollback(True)
+    queries = [query for query in queries.captured_queries if not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+    return response, len(queries), statistics.median(durations)
+
+
+def load_baselines():
+    try:
+        with open(BASELINES_PATH) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baselines(baselines):
+    with open(BASELINES_PATH, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
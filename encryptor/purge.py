@@ -0,0 +1,231 @@
+import logging
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from auth_app.models import AccountPurgeJob, User
+from .models import Category, FileMetadata
+from .signals import files_bulk_deleted
+from . import search
+from .storage import get_content_storage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_INTERVAL = 60
+DEFAULT_LEASE = 300
+DEFAULT_RETRY_DELAY = 60
+DEFAULT_RETRY_MAX_DELAY = 3600
+
+
+def soft_delete_files(queryset):
+    """
+    Marks the files in `queryset` as deleted with a single UPDATE and notifies
+    `files_bulk_deleted` receivers. Their blobs and rows are removed later by
+    the purge worker. Returns the number of files deleted.
+    """
+    with transaction.atomic():
+        files = list(queryset.only('id', 'owner_id', 'category_id', 'file_size'))
+        if not files:
+            return 0
+        deleted = FileMetadata.objects.filter(pk__in=[f.pk for f in files]).update(deleted_at=timezone.now())
+        by_owner = {}
+        for file in files:
+            by_owner.setdefault(file.owner_id, []).append(file)
+        for owner_id, owner_files in by_owner.items():
+            files_bulk_deleted.send(sender=FileMetadata, owner_id=owner_id, files=owner_files)
+        transaction.on_commit(purge_worker.wake)
+    return deleted
+
+
+def _purge_batch(ids):
+    """
+    Removes the blobs, search rows and table rows of already soft-deleted files.
+    """
+    try:
+        get_content_storage().delete_many(ids)
+    except OSError as e:
+        logger.warning("Error deleting content blobs: %s", e)
+    search.remove_files(ids)
+    FileMetadata.all_objects.filter(pk__in=ids).delete()
+
+
+def purge_deleted_files(batch_size=None, max_batches=None):
+    """
+    Removes blobs and rows of soft-deleted files in batches of `batch_size`.
+    Returns the number of files purged.
+    """
+    batch_size = batch_size or getattr(settings, 'PURGE_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    purged = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = list(
+            FileMetadata.all_objects.filter(deleted_at__isnull=False)
+            .order_by('deleted_at').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        _purge_batch(ids)
+        purged += len(ids)
+        batches += 1
+    return purged
+
+
+def schedule_account_purge(user):
+    """
+    Deactivates `user` immediately and queues the deletion of their files,
+    categories and account row. Returns the AccountPurgeJob tracking it.
+    """
+    with transaction.atomic():
+        job = AccountPurgeJob.objects.filter(
+            user_id=user.pk, status__in=[AccountPurgeJob.Status.PENDING, AccountPurgeJob.Status.RUNNING]
+        ).first()
+        if job is None:
+            User.objects.revoke_tokens(user.pk, is_active=False)
+            job = AccountPurgeJob.objects.create(
+                user_id=user.pk,
+                username=user.username,
+                total_files=FileMetadata.all_objects.filter(owner_id=user.pk).count(),
+            )
+        transaction.on_commit(purge_worker.wake)
+    return job
+
+
+def _lease_until(now):
+    return now + timedelta(seconds=getattr(settings, 'PURGE_LEASE', DEFAULT_LEASE))
+
+
+def _retry_at(now, attempts):
+    delay = getattr(settings, 'PURGE_RETRY_DELAY', DEFAULT_RETRY_DELAY) * 2 ** max(attempts - 1, 0)
+    return now + timedelta(seconds=min(delay, getattr(settings, 'PURGE_RETRY_MAX_DELAY', DEFAULT_RETRY_MAX_DELAY)))
+
+
+def _claimable(now):
+    # Pending jobs due for a (re)try and running ones whose worker's lease expired.
+    return Q(status__in=[AccountPurgeJob.Status.PENDING, AccountPurgeJob.Status.RUNNING]) \
+        & (Q(lease_until__isnull=True) | Q(lease_until__lte=now))
+
+
+def claim_account_purge(job):
+    """
+    Atomically takes the job for this worker for PURGE_LEASE seconds, unless
+    another worker holds it or claimed it since `job` was loaded. Returns the
+    claim's attempt number, or None.
+    """
+    now = timezone.now()
+    attempt = job.attempts + 1
+    claimed = AccountPurgeJob.objects.filter(_claimable(now), pk=job.pk, attempts=job.attempts).update(
+        status=AccountPurgeJob.Status.RUNNING, attempts=attempt, lease_until=_lease_until(now), updated_at=now,
+    )
+    return attempt if claimed else None
+
+
+def run_account_purge(job, batch_size=None):
+    """
+    Claims the job, then deletes its files in bounded batches, recording
+    progress and renewing the lease after each one, then its categories and
+    finally the user row. Stops if the lease was lost to another worker; a
+    failure puts the job back to PENDING for a retry with backoff. Returns
+    whether the job was claimed.
+    """
+    batch_size = batch_size or getattr(settings, 'PURGE_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    attempt = claim_account_purge(job)
+    if attempt is None:
+        return False
+    # Every update below is keyed on the claim, so a worker whose lease was
+    # taken over can't overwrite the new holder's progress.
+    held = AccountPurgeJob.objects.filter(pk=job.pk, attempts=attempt)
+    try:
+        while True:
+            ids = list(
+                FileMetadata.all_objects.filter(owner_id=job.user_id).values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            # Mark the batch deleted first so per-row post_delete receivers skip
+            # work that _purge_batch does for the whole batch.
+            FileMetadata.all_objects.filter(pk__in=ids, deleted_at__isnull=True).update(deleted_at=timezone.now())
+            _purge_batch(ids)
+            now = timezone.now()
+            if not held.update(purged_files=F('purged_files') + len(ids), lease_until=_lease_until(now), updated_at=now):
+                logger.warning("Account purge %s was taken over by another worker.", job.pk)
+                return True
+
+        Category.objects.filter(owner_id=job.user_id).delete()
+        User.objects.filter(pk=job.user_id).delete()
+    except Exception as e:
+        logger.exception("Account purge %s failed; retrying later.", job.pk)
+        now = timezone.now()
+        held.update(status=AccountPurgeJob.Status.PENDING, error=str(e), lease_until=_retry_at(now, attempt), updated_at=now)
+        return True
+
+    now = timezone.now()
+    held.update(status=AccountPurgeJob.Status.DONE, lease_until=None, finished_at=now, updated_at=now)
+    return True
+
+
+def process_account_purges(batch_size=None):
+    """
+    Runs every pending account purge that is due and every running one whose
+    worker's lease expired. Returns the number of jobs this worker claimed.
+    """
+    jobs = list(AccountPurgeJob.objects.filter(_claimable(timezone.now())))
+    return sum(run_account_purge(job, batch_size=batch_size) for job in jobs)
+
+
+class PurgeWorker:
+    """
+    In-process background thread that runs account purges, drains
+    soft-deleted files and compacts pack storage. It is started when the
+    WSGI or ASGI application loads, so purges left pending or running by a
+    restart resume once their lease expires, is woken after a delete commits
+    and also sweeps every PURGE_INTERVAL seconds; the purge_deleted_files
+    command covers processes that exit before draining. Every server process
+    runs one, and account purges are leased so each runs in one at a time.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """
+        Starts the thread with an immediate sweep.
+        """
+        self.wake()
+
+    def wake(self):
+        if not getattr(settings, 'PURGE_WORKER_ENABLED', True):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='encryptor-purge', daemon=True)
+                self._thread.start()
+        self._event.set()
+
+    def _run(self):
+        interval = getattr(settings, 'PURGE_INTERVAL', DEFAULT_INTERVAL)
+        while True:
+            self._event.wait(timeout=interval)
+            self._event.clear()
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Purge worker pass failed.")
+            finally:
+                connection.close()
+
+    def run_once(self):
+        close_old_connections()
+        process_account_purges()
+        purged = purge_deleted_files()
+        storage = get_content_storage()
+        if hasattr(storage, 'compact'):
+            storage.compact()
+        return purged
+
+
+purge_worker = PurgeWorker()
@@ -0,0 +1,163 @@
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, When
+from rest_framework.filters import SearchFilter
+
+FTS_TABLE = 'encryptor_filemetadata_fts'
+# Gives every indexed file its own FTS rowid: file_id (UUID hex) -> rowid.
+# Deleting a file's row here also deletes its index row (by trigger).
+FTS_IDS_TABLE = 'encryptor_filemetadata_fts_ids'
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+DEFAULT_MAX_RESULTS = 1000
+
+# bm25 column weights: file_id, owner, file_name, file_type, category
+BM25_WEIGHTS = '0.0, 0.0, 10.0, 2.0, 4.0'
+
+
+def is_available():
+    """
+    The FTS5 index only exists on SQLite; other backends fall back to SearchFilter.
+    """
+    return connection.vendor == 'sqlite'
+
+
+def _owner_token(owner_id):
+    return owner_id.hex
+
+
+def _write_rows(cursor, rows):
+    """
+    Replaces the index rows of (file_id, owner, file_name, file_type, category)
+    tuples. Each file keeps the rowid assigned the first time it was indexed.
+    """
+    cursor.executemany(f"INSERT OR IGNORE INTO {FTS_IDS_TABLE} (file_id) VALUES (%s)", [[row[0]] for row in rows])
+    cursor.executemany(
+        f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, file_id, owner, file_name, file_type, category) "
+        f"SELECT rowid, file_id, %s, %s, %s, %s FROM {FTS_IDS_TABLE} WHERE file_id = %s",
+        [[*row[1:], row[0]] for row in rows],
+    )
+
+
+def index_file(instance, category_name=None):
+    if not is_available():
+        return
+    if category_name is None:
+        category_name = instance.category.category
+    with connection.cursor() as cursor:
+        _write_rows(cursor, [(instance.id.hex, _owner_token(instance.owner_id),
+                              instance.file_name, instance.file_type, category_name)])
+
+
+def index_files(files, category_names):
+    """
+    Indexes many files at once. `category_names` maps category id to its name.
+    """
+    if not is_available() or not files:
+        return
+    with connection.cursor() as cursor:
+        _write_rows(cursor, [
+            (f.id.hex, _owner_token(f.owner_id), f.file_name, f.file_type, category_names[f.category_id])
+            for f in files
+        ])
+
+
+def remove_files(file_ids):
+    if not is_available() or not file_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {FTS_IDS_TABLE} WHERE file_id = %s",
+            [[file_id.hex] for file_id in file_ids],
+        )
+
+
+def rename_category(file_ids, category_name):
+    if not is_available() or not file_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {FTS_TABLE} SET category = %s "
+            f"WHERE rowid = (SELECT rowid FROM {FTS_IDS_TABLE} WHERE file_id = %s)",
+            [[category_name, file_id.hex] for file_id in file_ids],
+        )
+
+
+def rebuild_index():
+    """
+    Drops every index row and re-indexes all files. Returns the number indexed.
+    """
+    from .models import FileMetadata
+
+    if not is_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_IDS_TABLE}")
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+    batch = []
+    count = 0
+    for file in FileMetadata.objects.select_related('category').iterator(chunk_size=2000):
+        batch.append(file)
+        if len(batch) >= 2000:
+            index_files(batch, {f.category_id: f.category.category for f in batch})
+            count += len(batch)
+            batch = []
+    index_files(batch, {f.category_id: f.category.category for f in batch})
+    return count + len(batch)
+
+
+def build_match_expression(owner_id, terms):
+    """
+    Restricts the match to the owner's rows and prefix-matches every term
+    against the name, type and category columns.
+    """
+    tokens = [token for term in terms for token in TOKEN_RE.findall(term)]
+    if not tokens:
+        return None
+    words = ' AND '.join(f'"{token}"*' for token in tokens)
+    return f'owner : "{_owner_token(owner_id)}" AND {{file_name file_type category}} : ({words})'
+
+
+def search_file_ids(owner_id, terms, limit=None):
+    """
+    Returns matching file ids for `owner_id`, best bm25 rank first, at most
+    `limit` of them (SEARCH_MAX_RESULTS by default).
+    """
+    expression = build_match_expression(owner_id, terms)
+    if expression is None:
+        return []
+    if limit is None:
+        limit = getattr(settings, 'SEARCH_MAX_RESULTS', DEFAULT_MAX_RESULTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT file_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, {BM25_WEIGHTS}) LIMIT %s",
+            [expression, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    Answers `?search=` from the FTS5 index with prefix matching and ranked
+    results, so search cost no longer grows with the size of the library.
+    Only the SEARCH_MAX_RESULTS best-ranked matches are returned; the
+    paginated `count` never exceeds it, so clients should narrow the terms
+    rather than page past it. Falls back to the regular icontains SearchFilter on other databases.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if not is_available():
+            return super().filter_queryset(request, queryset, view)
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        ids = search_file_ids(request.user.pk, terms)
+        if not ids:
+            return queryset.none()
+        ranking = Case(
+            *[When(id=file_id, then=position) for position, file_id in enumerate(ids)],
+            output_field=IntegerField(),
+        )
+        return queryset.filter(id__in=ids).order_by(ranking)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import FileMetadata, Category
+from django.conf import settings
+from .models import FileMetadata, Category, UploadSession
 from rest_framework.validators import UniqueTogetherValidator
 
 class NestedCategorySerializer(serializers.ModelSerializer):
@@ -50,9 +51,95 @@ class FileMetadataSerializer(serializers.ModelSerializer):
             
         return representation
 
-class CategorySummarySerializer(serializers.ModelSerializer):
-    files_count = serializers.IntegerField(read_only=True)
+class FileMetadataRowSerializer:
+    """
+    Read-only fast path for file listings. Turns rows of
+    `queryset.values(*FileMetadataRowSerializer.values)`, one joined query
+    per page, into exactly what FileMetadataSerializer returns, without a
+    serializer or category lookup per row.
+    """
+    values = (
+        'id', 'file_name', 'file_type', 'file_size', 'created_at', 'updated_at',
+        'category_id', 'category__category', 'owner_id',
+    )
+
+    def __init__(self):
+        # Reuse the serializer's own fields so values are formatted identically.
+        fields = FileMetadataSerializer().fields
+        self.to_id = fields['id'].to_representation
+        self.to_created_at = fields['created_at'].to_representation
+        self.to_updated_at = fields['updated_at'].to_representation
+
+    def to_representation(self, rows):
+        to_id, to_created_at, to_updated_at = self.to_id, self.to_created_at, self.to_updated_at
+        return [
+            {
+                'id': to_id(row['id']),
+                'file_name': row['file_name'],
+                'file_type': row['file_type'],
+                'file_size': row['file_size'],
+                'created_at': to_created_at(row['created_at']),
+                'updated_at': to_updated_at(row['updated_at']),
+                'category': {'id': row['category_id'], 'category': row['category__category']},
+                'owner': row['owner_id'],
+            }
+            for row in rows
+        ]
 
+class FileMetadataBulkItemSerializer(serializers.ModelSerializer):
+    """
+    Validates one item of a bulk create without touching the database;
+    category ownership is checked for the whole batch in a single query.
+    """
+    category = serializers.IntegerField(label='Category ID')
+
+    class Meta:
+        model = FileMetadata
+        fields = ['file_name', 'file_type', 'file_size', 'category']
+
+class CategorySummarySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['id', 'category', 'files_count']
\ No newline at end of file
+        fields = ['id', 'category', 'files_count', 'total_bytes']
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    chunk_size = serializers.IntegerField(required=False, min_value=1)
+    chunk_count = serializers.IntegerField(read_only=True)
+    received_chunks = serializers.SerializerMethodField()
+    missing_chunks = serializers.SerializerMethodField()
+    received_bytes = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'file', 'total_size', 'chunk_size', 'chunk_count',
+            'received_chunks', 'missing_chunks', 'received_bytes',
+            'created_at', 'expires_at'
+        ]
+        read_only_fields = ['id', 'file', 'created_at', 'expires_at']
+
+    def validate_total_size(self, value):
+        if value < 0:
+            raise serializers.ValidationError("Total size cannot be negative.")
+        return value
+
+    def validate_chunk_size(self, value):
+        max_chunk_size = settings.UPLOAD_SESSION_MAX_CHUNK_SIZE
+        if value > max_chunk_size:
+            raise serializers.ValidationError(f"Chunk size cannot exceed {max_chunk_size} bytes.")
+        return value
+
+    def _received(self, obj):
+        if not hasattr(obj, '_received_chunks'):
+            obj._received_chunks = list(obj.chunks.values_list('index', 'size'))
+        return obj._received_chunks
+
+    def get_received_chunks(self, obj):
+        return [index for index, _ in self._received(obj)]
+
+    def get_missing_chunks(self, obj):
+        received = {index for index, _ in self._received(obj)}
+        return [index for index in range(obj.chunk_count) if index not in received]
+
+    def get_received_bytes(self, obj):
+        return sum(size for _, size in self._received(obj))
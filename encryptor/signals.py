@@ -1,19 +1,188 @@
-from django.db.models.signals import post_delete
-from django.dispatch import receiver
-from .models import FileMetadata
-import os
-from django.conf import settings
+import logging
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from auth_app.models import User
+from axiomcore.response_cache import invalidate_user
+from .models import FileMetadata, Category, UploadSession
+from . import search
+from .changes import CATEGORY, DELETE, FILE, UPSERT, record_changes
+from .storage import get_content_storage
+
+logger = logging.getLogger(__name__)
+
+# Sent after FileMetadata.objects.bulk_create(), which skips post_save.
+# Receivers get `owner_id` and the created `files` (with categories cached).
+files_bulk_created = Signal()
+
+# Sent after a file's content is replaced, which does not save the row.
+# Receivers get the `instance`.
+file_content_changed = Signal()
+
+# Sent after files are soft-deleted; post_delete only fires once the purge
+# worker removes the rows. Receivers get `owner_id` and the deleted `files`.
+files_bulk_deleted = Signal()
+
 
 @receiver(post_delete, sender=FileMetadata)
-def delete_file_content(sender, instance, **kwargs):
+def delete_file_content(sender, instance, origin=None, **kwargs):
     """
-    Deletes the associated .txt file from the media directory
+    Deletes the associated content blob from storage
     when a FileMetadata object is deleted.
     """
+    if instance.deleted_at is not None and getattr(origin, 'model', None) is FileMetadata:
+        # The purge worker removes blobs of soft-deleted files in batches before
+        # deleting their rows; cascades from elsewhere still clean up here.
+        return
+    try:
+        get_content_storage().delete(instance.id)
+    except Exception:
+        logger.exception("Error deleting content of file %s.", instance.id)
+
+
+@receiver(post_delete, sender=UploadSession)
+def abort_storage_upload(sender, instance, **kwargs):
+    """
+    Aborts the storage multipart upload when a session is aborted or expires.
+    """
+    if not instance.storage_upload_id:
+        return
     try:
-        filepath = os.path.join(settings.MEDIA_ROOT, 'file_content', f"{instance.id}.txt")
-        if os.path.exists(filepath):
-            os.remove(filepath)
-    except Exception as e:
-        # Log this error in a real application
-        print(f"Error deleting file for {instance.id}: {str(e)}")
\ No newline at end of file
+        get_content_storage().abort_multipart(instance.file_id, instance.storage_upload_id)
+    except Exception:
+        logger.exception("Error aborting storage upload of session %s.", instance.id)
+
+
+@receiver(post_save, sender=FileMetadata)
+def track_storage_on_save(sender, instance, created, **kwargs):
+    """
+    Keeps User.used_storage_bytes and the category totals in step with
+    created, resized and moved files.
+    """
+    if created:
+        previous_size, previous_category_id = 0, None
+    else:
+        previous_size = getattr(instance, '_loaded_file_size', None)
+        previous_category_id = getattr(instance, '_loaded_category_id', None)
+        if previous_size is None or previous_category_id is None:
+            # Instance was not loaded from the database; its old size is unknown.
+            return
+    User.objects.adjust_used_storage(instance.owner_id, instance.file_size - previous_size)
+    if previous_category_id == instance.category_id:
+        Category.objects.adjust_totals(instance.category_id, 0, instance.file_size - previous_size)
+    else:
+        if previous_category_id is not None:
+            Category.objects.adjust_totals(previous_category_id, -1, -previous_size)
+        Category.objects.adjust_totals(instance.category_id, 1, instance.file_size)
+    instance._loaded_file_size = instance.file_size
+    instance._loaded_category_id = instance.category_id
+
+
+@receiver(post_delete, sender=FileMetadata)
+def track_storage_on_delete(sender, instance, **kwargs):
+    if instance.deleted_at is None:
+        User.objects.adjust_used_storage(instance.owner_id, -instance.file_size)
+        Category.objects.adjust_totals(instance.category_id, -1, -instance.file_size)
+
+
+@receiver(post_save, sender=FileMetadata)
+def index_file_for_search(sender, instance, **kwargs):
+    search.index_file(instance)
+
+
+@receiver(post_delete, sender=FileMetadata)
+def remove_file_from_search(sender, instance, **kwargs):
+    if instance.deleted_at is None:
+        search.remove_files([instance.id])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_name(sender, instance, created, **kwargs):
+    if not created:
+        file_ids = list(FileMetadata.objects.filter(category=instance).values_list('id', flat=True))
+        search.rename_category(file_ids, instance.category)
+
+
+def _adjust_category_totals(files, sign):
+    totals = {}
+    for f in files:
+        count, size = totals.get(f.category_id, (0, 0))
+        totals[f.category_id] = (count + 1, size + f.file_size)
+    Category.objects.adjust_many_totals({
+        category_id: (sign * count, sign * size) for category_id, (count, size) in totals.items()
+    })
+
+
+@receiver(files_bulk_created)
+def track_storage_on_bulk_create(sender, owner_id, files, **kwargs):
+    User.objects.adjust_used_storage(owner_id, sum(f.file_size for f in files))
+    _adjust_category_totals(files, 1)
+
+
+@receiver(files_bulk_created)
+def index_bulk_created_files(sender, owner_id, files, **kwargs):
+    search.index_files(files, {f.category_id: f.category.category for f in files})
+
+
+@receiver(files_bulk_deleted)
+def track_storage_on_bulk_delete(sender, owner_id, files, **kwargs):
+    User.objects.adjust_used_storage(owner_id, -sum(f.file_size for f in files))
+    _adjust_category_totals(files, -1)
+
+
+@receiver(files_bulk_deleted)
+def remove_bulk_deleted_files(sender, owner_id, files, **kwargs):
+    file_ids = [f.id for f in files]
+    search.remove_files(file_ids)
+    UploadSession.objects.filter(file_id__in=file_ids).delete()
+
+
+@receiver(post_save, sender=FileMetadata)
+def log_file_saved(sender, instance, **kwargs):
+    record_changes(instance.owner_id, FILE, UPSERT, [instance.id])
+
+
+@receiver(file_content_changed)
+def log_file_content_changed(sender, instance, **kwargs):
+    record_changes(instance.owner_id, FILE, UPSERT, [instance.id])
+
+
+@receiver(post_delete, sender=FileMetadata)
+def log_file_deleted(sender, instance, **kwargs):
+    # Soft-deleted files were logged when they were deleted.
+    if instance.deleted_at is None:
+        record_changes(instance.owner_id, FILE, DELETE, [instance.id])
+
+
+@receiver(files_bulk_created)
+def log_bulk_created_files(sender, owner_id, files, **kwargs):
+    record_changes(owner_id, FILE, UPSERT, [f.id for f in files])
+
+
+@receiver(files_bulk_deleted)
+def log_bulk_deleted_files(sender, owner_id, files, **kwargs):
+    record_changes(owner_id, FILE, DELETE, [f.id for f in files])
+
+
+@receiver(post_save, sender=Category)
+def log_category_saved(sender, instance, **kwargs):
+    record_changes(instance.owner_id, CATEGORY, UPSERT, [instance.pk])
+
+
+@receiver(post_delete, sender=Category)
+def log_category_deleted(sender, instance, **kwargs):
+    record_changes(instance.owner_id, CATEGORY, DELETE, [instance.pk])
+
+
+@receiver(post_save, sender=FileMetadata)
+@receiver(post_delete, sender=FileMetadata)
+@receiver(file_content_changed)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_owner_responses(sender, instance, **kwargs):
+    invalidate_user(instance.owner_id)
+
+
+@receiver(files_bulk_created)
+@receiver(files_bulk_deleted)
+def invalidate_owner_responses_in_bulk(sender, owner_id, **kwargs):
+    invalidate_user(owner_id)
@@ -0,0 +1,22 @@
+from functools import lru_cache
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from .base import BlobInfo, ContentStorage
+from .filesystem import FileSystemContentStorage, ShardedFileSystemContentStorage
+from .pack import PackContentStorage
+from .s3 import S3ContentStorage
+
+
+@lru_cache(maxsize=None)
+def get_content_storage():
+    backend = getattr(settings, 'CONTENT_STORAGE_BACKEND', 'encryptor.storage.FileSystemContentStorage')
+    options = getattr(settings, 'CONTENT_STORAGE_OPTIONS', {})
+    return import_string(backend)(**options)
+
+
+@receiver(setting_changed)
+def reset_content_storage(setting, **kwargs):
+    if setting in ('CONTENT_STORAGE_BACKEND', 'CONTENT_STORAGE_OPTIONS', 'MEDIA_ROOT'):
+        get_content_storage.cache_clear()
@@ -0,0 +1,94 @@
+import os
+from ..streaming import iter_file_range
+
+
+class BlobInfo:
+    __slots__ = ('size', 'modified', 'etag')
+
+    def __init__(self, size, modified, etag):
+        self.size = size
+        self.modified = modified
+        self.etag = etag
+
+
+class ContentStorage:
+    """
+    Where encrypted file content lives. Keys are FileMetadata ids.
+
+    Backends must implement open/stat/save/delete_many and the multipart
+    methods; the remaining methods have generic implementations built on those.
+    """
+
+    # Smallest part a multipart upload accepts, except for the last part.
+    min_part_size = 0
+    max_parts = 10000
+
+    def open(self, key):
+        """
+        Returns a readable, seekable binary file object for the blob.
+        Raises FileNotFoundError when it does not exist.
+        """
+        raise NotImplementedError
+
+    def stat(self, key):
+        """
+        Returns a BlobInfo. Raises FileNotFoundError when the blob does not exist.
+        """
+        raise NotImplementedError
+
+    def read(self, key):
+        with self.open(key) as f:
+            return f.read()
+
+    def iter_range(self, key, start, length, chunk_size):
+        """
+        Yields `length` bytes of the blob from `start` in chunks of at most `chunk_size`.
+        """
+        return iter_file_range(self.open(key), start, length, chunk_size)
+
+    def save(self, key, data):
+        raise NotImplementedError
+
+    def save_stream(self, key, chunks):
+        """
+        Stores the blob from an iterable of byte chunks.
+        """
+        self.save(key, b''.join(chunks))
+
+    def save_from_path(self, key, path):
+        """
+        Stores the local file at `path` as the blob and takes ownership of it.
+        """
+        with open(path, 'rb') as f:
+            self.save(key, f.read())
+        os.remove(path)
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def delete_many(self, keys):
+        raise NotImplementedError
+
+    # Multipart uploads. Parts are numbered from 1 and may arrive in any order.
+
+    def create_multipart(self, key):
+        """
+        Starts a multipart upload for `key` and returns its upload id.
+        """
+        raise NotImplementedError
+
+    def upload_part(self, key, upload_id, part_number, part_offset, length, chunks):
+        """
+        Stores one part from an iterable of byte chunks and returns its etag.
+        `part_offset` is the part's byte offset in the final blob.
+        """
+        raise NotImplementedError
+
+    def complete_multipart(self, key, upload_id, parts):
+        """
+        Assembles the blob from `parts`, a list of (part_number, etag) pairs.
+        """
+        raise NotImplementedError
+
+    def abort_multipart(self, key, upload_id):
+        raise NotImplementedError
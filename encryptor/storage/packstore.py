@@ -0,0 +1,281 @@
+import fcntl
+import os
+import struct
+import threading
+import time
+import uuid
+
+# key, pack number, offset, length, modified time, op
+RECORD = struct.Struct('<16sIQQdB')
+OP_PUT = 1
+OP_DELETE = 0
+
+
+class PackEntry:
+    __slots__ = ('pack', 'offset', 'length', 'modified')
+
+    def __init__(self, pack, offset, length, modified):
+        self.pack = pack
+        self.offset = offset
+        self.length = length
+        self.modified = modified
+
+
+class PackStore:
+    """
+    Append-only pack files for small blobs.
+
+    Blobs are appended to `pack-NNNNNN.pack` files and located through an
+    append-only journal (`index.log`) of fixed-size records. Every process
+    keeps the journal in memory and tails it before each lookup, so writers in
+    other workers become visible without re-reading the whole file. Writers
+    serialize on an flock'd lock file. Reads use os.pread on cached file
+    descriptors, avoiding an open/close per blob. Deleting appends a
+    tombstone; `compact()` copies live blobs out of mostly-dead packs and
+    rewrites the journal.
+    """
+
+    def __init__(self, location, target_pack_size=256 * 1024 * 1024, fsync=False):
+        self.location = location
+        self.target_pack_size = target_pack_size
+        self.fsync = fsync
+        self.journal_path = os.path.join(location, 'index.log')
+        self.lock_path = os.path.join(location, 'lock')
+        self._mutex = threading.RLock()
+        self._fds = {}
+        self._entries = {}
+        self._journal_pos = 0
+        self._journal_ino = None
+        os.makedirs(location, exist_ok=True)
+
+    # Paths and descriptors
+
+    def pack_path(self, pack):
+        return os.path.join(self.location, f'pack-{pack:06d}.pack')
+
+    def _pack_numbers(self):
+        numbers = []
+        for name in os.listdir(self.location):
+            if name.startswith('pack-') and name.endswith('.pack'):
+                numbers.append(int(name[5:-5]))
+        return sorted(numbers)
+
+    def _fd(self, pack):
+        fd = self._fds.get(pack)
+        if fd is None:
+            fd = os.open(self.pack_path(pack), os.O_RDONLY)
+            self._fds[pack] = fd
+        return fd
+
+    def _close_fds(self):
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds.clear()
+
+    def close(self):
+        with self._mutex:
+            self._close_fds()
+
+    # Journal
+
+    def _apply(self, data):
+        usable = len(data) - len(data) % RECORD.size
+        for key, pack, offset, length, modified, op in RECORD.iter_unpack(data[:usable]):
+            if op == OP_PUT:
+                self._entries[key] = PackEntry(pack, offset, length, modified)
+            else:
+                self._entries.pop(key, None)
+        return usable
+
+    def refresh(self):
+        """
+        Applies journal records written since the last call, or reloads the
+        whole journal when compaction has replaced it.
+        """
+        with self._mutex:
+            try:
+                stat = os.stat(self.journal_path)
+            except FileNotFoundError:
+                return
+            if stat.st_ino != self._journal_ino:
+                self._entries = {}
+                self._journal_pos = 0
+                self._journal_ino = stat.st_ino
+                self._close_fds()
+            if stat.st_size <= self._journal_pos:
+                return
+            with open(self.journal_path, 'rb') as journal:
+                journal.seek(self._journal_pos)
+                self._journal_pos += self._apply(journal.read(stat.st_size - self._journal_pos))
+
+    def _append_records(self, records):
+        with open(self.journal_path, 'ab') as journal:
+            # A writer that died mid-record left a torn tail; drop it so the
+            # new records stay aligned. Callers hold the lock.
+            torn = journal.tell() % RECORD.size
+            if torn:
+                journal.truncate(journal.tell() - torn)
+            journal.write(b''.join(RECORD.pack(*record) for record in records))
+            journal.flush()
+            if self.fsync:
+                os.fsync(journal.fileno())
+
+    def _locked(self):
+        return _FileLock(self.lock_path, self._mutex)
+
+    # Blob operations
+
+    @staticmethod
+    def _key(key):
+        return uuid.UUID(str(key)).bytes
+
+    def lookup(self, key):
+        self.refresh()
+        return self._entries.get(self._key(key))
+
+    def __contains__(self, key):
+        return self.lookup(key) is not None
+
+    def read(self, key, start=0, length=None):
+        for attempt in range(2):
+            entry = self.lookup(key)
+            if entry is None:
+                raise FileNotFoundError(key)
+            size = entry.length - start if length is None else length
+            size = max(0, min(size, entry.length - start))
+            with self._mutex:
+                try:
+                    return os.pread(self._fd(entry.pack), size, entry.offset + start)
+                except FileNotFoundError:
+                    if attempt:
+                        raise
+                    # The pack was compacted away between refresh and open.
+                    self._journal_ino = None
+
+    def put(self, key, data):
+        with self._locked():
+            self.refresh()
+            pack = self._active_pack()
+            path = self.pack_path(pack)
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+            try:
+                offset = os.fstat(fd).st_size
+                os.write(fd, data)
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+            record = (self._key(key), pack, offset, len(data), time.time(), OP_PUT)
+            self._append_records([record])
+            self.refresh()
+
+    def delete_many(self, keys):
+        with self._locked():
+            self.refresh()
+            records = [
+                (self._key(key), 0, 0, 0, time.time(), OP_DELETE)
+                for key in keys if self._key(key) in self._entries
+            ]
+            if records:
+                self._append_records(records)
+                self.refresh()
+
+    def _active_pack(self):
+        numbers = self._pack_numbers()
+        if not numbers:
+            return 1
+        latest = numbers[-1]
+        if os.path.getsize(self.pack_path(latest)) >= self.target_pack_size:
+            return latest + 1
+        return latest
+
+    # Compaction
+
+    def stats(self):
+        """
+        Returns {pack: (file_size, live_bytes)}.
+        """
+        self.refresh()
+        live = {}
+        for entry in self._entries.values():
+            live[entry.pack] = live.get(entry.pack, 0) + entry.length
+        return {
+            pack: (os.path.getsize(self.pack_path(pack)), live.get(pack, 0))
+            for pack in self._pack_numbers()
+        }
+
+    def compact(self, min_dead_ratio=0.5):
+        """
+        Rewrites the live blobs of every inactive pack whose dead fraction is at
+        least `min_dead_ratio` into the active pack, deletes those packs and
+        rewrites the journal. Returns the number of bytes reclaimed.
+        """
+        with self._locked():
+            stats = self.stats()
+            if not stats:
+                return 0
+            active = self._active_pack()
+            victims = [
+                pack for pack, (size, live) in stats.items()
+                if pack != active and size and (size - live) / size >= min_dead_ratio
+            ]
+            if not victims:
+                return 0
+
+            moved = []
+            fd = os.open(self.pack_path(active), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+            try:
+                for key, entry in list(self._entries.items()):
+                    if entry.pack not in victims:
+                        continue
+                    data = os.pread(self._fd(entry.pack), entry.length, entry.offset)
+                    offset = os.fstat(fd).st_size
+                    os.write(fd, data)
+                    moved.append((key, PackEntry(active, offset, entry.length, entry.modified)))
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+            for key, entry in moved:
+                self._entries[key] = entry
+
+            tmp_path = self.journal_path + '.tmp'
+            with open(tmp_path, 'wb') as journal:
+                journal.write(b''.join(
+                    RECORD.pack(key, e.pack, e.offset, e.length, e.modified, OP_PUT)
+                    for key, e in self._entries.items()
+                ))
+                journal.flush()
+                os.fsync(journal.fileno())
+            os.replace(tmp_path, self.journal_path)
+
+            reclaimed = 0
+            self._close_fds()
+            for pack in victims:
+                reclaimed += stats[pack][0]
+                os.remove(self.pack_path(pack))
+            self._journal_ino = None
+            self.refresh()
+            return reclaimed - sum(entry.length for _, entry in moved)
+
+
+class _FileLock:
+    """
+    Exclusive lock across threads (mutex) and processes (flock).
+    """
+
+    def __init__(self, path, mutex):
+        self.path = path
+        self.mutex = mutex
+        self.fd = None
+
+    def __enter__(self):
+        self.mutex.acquire()
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+        self.mutex.release()
@@ -0,0 +1,334 @@
+import base64
+import calendar
+import hashlib
+import hmac
+import http.client
+import os
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote, urlsplit
+from xml.etree import ElementTree
+from .base import BlobInfo, ContentStorage
+
+UNSIGNED_PAYLOAD = 'UNSIGNED-PAYLOAD'
+S3_NS = '{http://s3.amazonaws.com/doc/2006-03-01/}'
+
+
+class S3Error(OSError):
+    def __init__(self, status, code, message):
+        super().__init__(f"S3 {status} {code}: {message}")
+        self.status = status
+        self.code = code
+
+
+def _find_text(element, name):
+    node = element.find(S3_NS + name)
+    if node is None:
+        node = element.find(name)
+    return node.text if node is not None else None
+
+
+class S3Client:
+    """
+    Minimal S3 REST client (path-style, AWS Signature V4) covering the calls
+    content storage needs, so no SDK dependency is required. Bodies are sent
+    as UNSIGNED-PAYLOAD and may be any iterable of bytes, so uploads stream.
+    """
+
+    def __init__(self, endpoint_url, bucket, access_key, secret_key, region='us-east-1', timeout=60):
+        parts = urlsplit(endpoint_url)
+        self.secure = parts.scheme == 'https'
+        self.host = parts.netloc
+        self.base_path = parts.path.rstrip('/')
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.timeout = timeout
+
+    # Signing
+
+    def _signing_key(self, date):
+        key = ('AWS4' + self.secret_key).encode('utf-8')
+        for part in (date, self.region, 's3', 'aws4_request'):
+            key = hmac.new(key, part.encode('utf-8'), hashlib.sha256).digest()
+        return key
+
+    def _sign(self, method, path, query, headers):
+        now = datetime.now(timezone.utc)
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        date = now.strftime('%Y%m%d')
+        headers['host'] = self.host
+        headers['x-amz-date'] = amz_date
+        headers.setdefault('x-amz-content-sha256', UNSIGNED_PAYLOAD)
+
+        canonical_query = '&'.join(
+            f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(query.items())
+        )
+        signed = sorted(headers)
+        canonical_headers = ''.join(f"{name}:{str(headers[name]).strip()}\n" for name in signed)
+        signed_headers = ';'.join(signed)
+        canonical_request = '\n'.join([
+            method, quote(path, safe='/-_.~'), canonical_query, canonical_headers,
+            signed_headers, headers['x-amz-content-sha256'],
+        ])
+        scope = f"{date}/{self.region}/s3/aws4_request"
+        string_to_sign = '\n'.join([
+            'AWS4-HMAC-SHA256', amz_date, scope,
+            hashlib.sha256(canonical_request.encode('utf-8')).hexdigest(),
+        ])
+        signature = hmac.new(self._signing_key(date), string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+        headers['authorization'] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        )
+        return canonical_query
+
+    # Transport
+
+    def _connection(self):
+        cls = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+        return cls(self.host, timeout=self.timeout)
+
+    def request(self, method, key=None, query=None, headers=None, body=None, stream=False, expect=(200,)):
+        """
+        Sends a signed request. Returns (response, connection) when `stream`
+        is set so the caller can read the body incrementally, else (status,
+        headers, body bytes).
+        """
+        query = dict(query or {})
+        headers = {name.lower(): value for name, value in (headers or {}).items()}
+        path = f"{self.base_path}/{self.bucket}"
+        if key is not None:
+            path += f"/{key}"
+        canonical_query = self._sign(method, path, query, headers)
+        url = quote(path, safe='/-_.~') + (f"?{canonical_query}" if canonical_query else '')
+
+        connection = self._connection()
+        try:
+            connection.request(method, url, body=body, headers=headers)
+            response = connection.getresponse()
+            if response.status not in expect:
+                payload = response.read()
+                self._raise(response.status, payload)
+            if stream:
+                return response, connection
+            payload = response.read()
+            return response.status, response.headers, payload
+        except Exception:
+            connection.close()
+            raise
+        finally:
+            if not stream:
+                connection.close()
+
+    @staticmethod
+    def _raise(status, payload):
+        code, message = 'Error', payload[:200].decode('utf-8', 'replace')
+        try:
+            root = ElementTree.fromstring(payload)
+            code = _find_text(root, 'Code') or code
+            message = _find_text(root, 'Message') or message
+        except ElementTree.ParseError:
+            pass
+        if status == 404:
+            raise FileNotFoundError(f"S3 {code}: {message}")
+        raise S3Error(status, code, message)
+
+    # Object calls
+
+    def put_object(self, key, body, length):
+        _, headers, _ = self.request('PUT', key, headers={'content-length': str(length)}, body=body)
+        return headers.get('ETag')
+
+    def head_object(self, key):
+        _, headers, _ = self.request('HEAD', key)
+        return headers
+
+    def get_object(self, key, start=None, end=None):
+        headers = {}
+        if start is not None:
+            headers['range'] = f"bytes={start}-{'' if end is None else end}"
+        return self.request('GET', key, headers=headers, stream=True, expect=(200, 206))
+
+    def delete_objects(self, keys):
+        for offset in range(0, len(keys), 1000):
+            batch = keys[offset:offset + 1000]
+            objects = ''.join(f"<Object><Key>{key}</Key></Object>" for key in batch)
+            body = f'<Delete><Quiet>true</Quiet>{objects}</Delete>'.encode('utf-8')
+            self.request('POST', query={'delete': ''}, body=body, headers={
+                'content-length': str(len(body)),
+                'content-md5': base64.b64encode(hashlib.md5(body).digest()).decode('ascii'),
+            })
+
+    def create_multipart_upload(self, key):
+        _, _, payload = self.request('POST', key, query={'uploads': ''})
+        return _find_text(ElementTree.fromstring(payload), 'UploadId')
+
+    def upload_part(self, key, upload_id, part_number, body, length):
+        _, headers, _ = self.request(
+            'PUT', key, query={'partNumber': str(part_number), 'uploadId': upload_id},
+            headers={'content-length': str(length)}, body=body,
+        )
+        return headers.get('ETag')
+
+    def complete_multipart_upload(self, key, upload_id, parts):
+        items = ''.join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+            for number, etag in sorted(parts)
+        )
+        body = f'<CompleteMultipartUpload>{items}</CompleteMultipartUpload>'.encode('utf-8')
+        self.request('POST', key, query={'uploadId': upload_id}, body=body,
+                     headers={'content-length': str(len(body))})
+
+    def abort_multipart_upload(self, key, upload_id):
+        self.request('DELETE', key, query={'uploadId': upload_id}, expect=(200, 204, 404))
+
+
+class S3ObjectReader:
+    """
+    File-like reader over one object that issues a ranged GET per read.
+    Streaming responses use S3ContentStorage.iter_range instead.
+    """
+
+    def __init__(self, storage, key, size):
+        self.storage = storage
+        self.key = key
+        self.size = size
+        self.position = 0
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self.position
+        elif whence == 2:
+            offset += self.size
+        self.position = max(0, offset)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.position
+        size = min(size, self.size - self.position)
+        if size <= 0:
+            return b''
+        data = b''.join(self.storage.iter_range(self.key, self.position, size, 1024 * 1024))
+        self.position += len(data)
+        return data
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class S3ContentStorage(ContentStorage):
+    """
+    Keeps blobs in an S3-compatible bucket so every app server sees the same
+    content without shared disks. Multipart uploads map onto S3's own.
+    """
+
+    min_part_size = 5 * 1024 * 1024
+
+    def __init__(self, endpoint_url, bucket, access_key, secret_key, region='us-east-1', prefix='file_content/',
+                 part_size=8 * 1024 * 1024):
+        self.client = S3Client(endpoint_url, bucket, access_key, secret_key, region=region)
+        self.prefix = prefix
+        self.part_size = max(part_size, self.min_part_size)
+
+    def object_key(self, key):
+        return f"{self.prefix}{key}"
+
+    def stat(self, key):
+        headers = self.client.head_object(self.object_key(key))
+        modified = headers.get('Last-Modified')
+        timestamp = calendar.timegm(parsedate_to_datetime(modified).utctimetuple()) if modified else time.time()
+        return BlobInfo(int(headers.get('Content-Length', 0)), timestamp, headers.get('ETag'))
+
+    def open(self, key):
+        return S3ObjectReader(self, key, self.stat(key).size)
+
+    def read(self, key):
+        response, connection = self.client.get_object(self.object_key(key))
+        try:
+            return response.read()
+        finally:
+            connection.close()
+
+    def iter_range(self, key, start, length, chunk_size):
+        if length <= 0:
+            return
+        response, connection = self.client.get_object(self.object_key(key), start, start + length - 1)
+        try:
+            while True:
+                data = response.read(chunk_size)
+                if not data:
+                    break
+                yield data
+        finally:
+            connection.close()
+
+    def save(self, key, data):
+        self.client.put_object(self.object_key(key), data, len(data))
+
+    def save_stream(self, key, chunks):
+        """
+        Buffers at most one part in memory: small blobs become a single PUT,
+        larger ones a multipart upload.
+        """
+        buffer = bytearray()
+        upload_id = None
+        parts = []
+        try:
+            for chunk in chunks:
+                buffer.extend(chunk)
+                while len(buffer) >= self.part_size:
+                    if upload_id is None:
+                        upload_id = self.create_multipart(key)
+                    part = bytes(buffer[:self.part_size])
+                    del buffer[:self.part_size]
+                    number = len(parts) + 1
+                    parts.append((number, self.client.upload_part(self.object_key(key), upload_id, number, part, len(part))))
+            if upload_id is None:
+                self.save(key, bytes(buffer))
+                return
+            if buffer:
+                number = len(parts) + 1
+                parts.append((number, self.client.upload_part(self.object_key(key), upload_id, number, bytes(buffer), len(buffer))))
+            self.complete_multipart(key, upload_id, parts)
+        except Exception:
+            if upload_id is not None:
+                self.abort_multipart(key, upload_id)
+            raise
+
+    def save_from_path(self, key, path):
+        with open(path, 'rb') as f:
+            self.save_stream(key, iter(lambda: f.read(1024 * 1024), b''))
+        os.remove(path)
+
+    def delete_many(self, keys):
+        if keys:
+            self.client.delete_objects([self.object_key(key) for key in keys])
+
+    def create_multipart(self, key):
+        return self.client.create_multipart_upload(self.object_key(key))
+
+    def upload_part(self, key, upload_id, part_number, part_offset, length, chunks):
+        return self.client.upload_part(self.object_key(key), upload_id, part_number, chunks, length)
+
+    def complete_multipart(self, key, upload_id, parts):
+        if not parts:
+            self.abort_multipart(key, upload_id)
+            self.save(key, b'')
+            return
+        self.client.complete_multipart_upload(self.object_key(key), upload_id, parts)
+
+    def abort_multipart(self, key, upload_id):
+        self.client.abort_multipart_upload(self.object_key(key), upload_id)
@@ -0,0 +1,205 @@
+import hashlib
+import threading
+import time
+import uuid
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.etree import ElementTree
+
+from ..streaming import RANGE_RE
+
+
+class LocalS3Server:
+    """
+    In-memory, in-process stand-in for the subset of the S3 API that
+    S3ContentStorage uses (path-style objects, ranged GET, multi-delete and
+    multipart uploads). Meant for tests and local development only: requests
+    must be signed but signatures are not verified.
+
+        with LocalS3Server() as server:
+            storage = S3ContentStorage(server.endpoint_url, 'bucket', 'key', 'secret')
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.objects = {}
+        self.uploads = {}
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def endpoint_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='local-s3', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(_S3RequestHandler):
+            state = server
+
+        return Handler
+
+
+class _S3RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    # Helpers
+
+    def _parse(self):
+        parts = urlsplit(self.path)
+        bucket, _, key = unquote(parts.path).lstrip('/').partition('/')
+        query = {name: values[0] for name, values in parse_qs(parts.query, keep_blank_values=True).items()}
+        return bucket, key, query
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _error(self, status, code, message):
+        body = f'<Error><Code>{code}</Code><Message>{message}</Message></Error>'.encode('utf-8')
+        self._send(status, body, {'Content-Type': 'application/xml'})
+
+    def _authorized(self):
+        if not self.headers.get('Authorization', '').startswith('AWS4-HMAC-SHA256 '):
+            self._error(403, 'AccessDenied', 'Request is not signed.')
+            return False
+        return True
+
+    # Verbs
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        bucket, key, _ = self._parse()
+        with self.state.lock:
+            entry = self.state.objects.get((bucket, key))
+        if entry is None:
+            self._error(404, 'NoSuchKey', 'The specified key does not exist.')
+            return
+        data, etag, modified = entry
+        headers = {'ETag': etag, 'Last-Modified': formatdate(modified, usegmt=True), 'Accept-Ranges': 'bytes'}
+        match = RANGE_RE.match(self.headers.get('Range', ''))
+        if match and match.group(1):
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else len(data) - 1, len(data) - 1)
+            if start >= len(data):
+                self._error(416, 'InvalidRange', 'The requested range is not satisfiable.')
+                return
+            headers['Content-Range'] = f'bytes {start}-{end}/{len(data)}'
+            self._send(206, data[start:end + 1], headers)
+            return
+        self._send(200, data, headers)
+
+    def do_PUT(self):
+        if not self._authorized():
+            return
+        bucket, key, query = self._parse()
+        body = self._body()
+        if len(body) != int(self.headers.get('Content-Length') or 0):
+            # The client gave up mid-body; S3 discards incomplete uploads.
+            self.close_connection = True
+            return
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        with self.state.lock:
+            if 'uploadId' in query:
+                upload = self.state.uploads.get(query['uploadId'])
+                if upload is None:
+                    self._error(404, 'NoSuchUpload', 'The specified upload does not exist.')
+                    return
+                upload['parts'][int(query['partNumber'])] = (body, etag)
+            else:
+                self.state.objects[(bucket, key)] = (body, etag, time.time())
+        self._send(200, headers={'ETag': etag})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        bucket, key, query = self._parse()
+        body = self._body()
+        if 'delete' in query:
+            root = ElementTree.fromstring(body)
+            with self.state.lock:
+                for node in root.iter('Key'):
+                    self.state.objects.pop((bucket, node.text), None)
+            self._send(200, b'<DeleteResult/>', {'Content-Type': 'application/xml'})
+        elif 'uploads' in query:
+            upload_id = uuid.uuid4().hex
+            with self.state.lock:
+                self.state.uploads[upload_id] = {'bucket': bucket, 'key': key, 'parts': {}}
+            result = (
+                f'<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>'
+                f'<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>'
+            )
+            self._send(200, result.encode('utf-8'), {'Content-Type': 'application/xml'})
+        elif 'uploadId' in query:
+            self._complete(bucket, key, query['uploadId'], body)
+        else:
+            self._error(400, 'InvalidRequest', 'Unsupported POST.')
+
+    def _complete(self, bucket, key, upload_id, body):
+        requested = [
+            (int(part.find('PartNumber').text), part.find('ETag').text)
+            for part in ElementTree.fromstring(body).iter('Part')
+        ]
+        with self.state.lock:
+            upload = self.state.uploads.get(upload_id)
+            if upload is None:
+                self._error(404, 'NoSuchUpload', 'The specified upload does not exist.')
+                return
+            chunks = []
+            for number, etag in requested:
+                part = upload['parts'].get(number)
+                if part is None or part[1] != etag:
+                    self._error(400, 'InvalidPart', f'Part {number} was not uploaded with that ETag.')
+                    return
+                chunks.append(part[0])
+            data = b''.join(chunks)
+            etag = f'"{hashlib.md5(data).hexdigest()}-{len(chunks)}"'
+            self.state.objects[(bucket, key)] = (data, etag, time.time())
+            del self.state.uploads[upload_id]
+        self._send(200, f'<CompleteMultipartUploadResult><ETag>{etag}</ETag></CompleteMultipartUploadResult>'.encode('utf-8'))
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        bucket, key, query = self._parse()
+        with self.state.lock:
+            if 'uploadId' in query:
+                self.state.uploads.pop(query['uploadId'], None)
+            else:
+                self.state.objects.pop((bucket, key), None)
+        self._send(204)
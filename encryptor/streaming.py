@@ -0,0 +1,170 @@
+import re
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from axiomcore.instrumentation import record_storage_read
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class BinaryRenderer(BaseRenderer):
+    """
+    Lets clients send `Accept: application/octet-stream` to the raw content
+    endpoints. Raw bodies are returned as-is, error payloads fall back to JSON.
+    """
+    media_type = 'application/octet-stream'
+    format = 'bin'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (bytes, bytearray)):
+            return bytes(data)
+        return JSONRenderer().render(data, renderer_context=renderer_context)
+
+
+def get_chunk_size():
+    return getattr(settings, 'CONTENT_STREAM_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def parse_range_header(header, size):
+    """
+    Parses a single `bytes=start-end` range against a resource of `size` bytes.
+    Returns (start, end) inclusive, None when the header should be ignored
+    (absent, malformed or multi-range), or raises ValueError when unsatisfiable.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if size == 0:
+        # No byte of an empty resource can be selected, not even by a suffix range.
+        raise ValueError("Unsatisfiable range.")
+
+    if not first:
+        # Suffix range: the last N bytes.
+        length = int(last)
+        if length == 0:
+            raise ValueError("Unsatisfiable range.")
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Unsatisfiable range.")
+    return start, min(end, size - 1)
+
+
+def if_range_matches(if_range, etag, last_modified):
+    """
+    If-Range carries either an entity tag or an HTTP date. The range is only
+    honoured when the validator still matches the current representation.
+    """
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        # Weak tags never match for If-Range.
+        return etag is not None and if_range == etag
+    timestamp = parse_http_date_safe(if_range)
+    return timestamp is not None and last_modified is not None and int(last_modified) == timestamp
+
+
+def iter_file_range(fileobj, start, length, chunk_size):
+    """
+    Yields `length` bytes of `fileobj` starting at `start`, one chunk at a time,
+    and closes the file once exhausted.
+    """
+    try:
+        fileobj.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = fileobj.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        fileobj.close()
+
+
+def ranged_blob_response(request, storage, key, content_type='application/octet-stream', etag=None):
+    """
+    Builds a streaming response for a stored blob honouring Range / If-Range and HEAD.
+    `etag` replaces the storage's own validator when given.
+    Raises FileNotFoundError when the blob does not exist.
+    """
+    info = storage.stat(key)
+    size, last_modified = info.size, info.modified
+    etag = etag or info.etag
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+    }
+
+    start, end = 0, size - 1
+    status_code = 200
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and if_range_matches(request.META.get('HTTP_IF_RANGE'), etag, last_modified):
+        try:
+            byte_range = parse_range_header(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416, headers=headers)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = 206
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    length = max(0, end - start + 1)
+    headers['Content-Length'] = str(length)
+
+    if request.method == 'HEAD':
+        return HttpResponse(status=status_code, content_type=content_type, headers=headers)
+
+    # Counted up front: the body is streamed after the request is measured.
+    record_storage_read(length)
+    response = StreamingHttpResponse(
+        storage.iter_range(key, start, length, get_chunk_size()),
+        status=status_code,
+        content_type=content_type,
+        headers=headers,
+    )
+    return response
+
+
+def read_exact_chunks(stream, length, chunk_size):
+    """
+    Yields exactly `length` bytes from `stream` in chunks of at most
+    `chunk_size`. Raises ValueError when the body is shorter or longer.
+    """
+    remaining = length
+    while remaining > 0:
+        data = stream.read(min(chunk_size, remaining))
+        if not data:
+            raise ValueError(f"Body ended {remaining} bytes short.")
+        remaining -= len(data)
+        yield data
+    if stream.read(1):
+        raise ValueError("Body is longer than expected.")
+
+
+def iter_stream(stream, chunk_size):
+    """
+    Yields a request body in chunks of at most `chunk_size` bytes until it ends.
+    """
+    if stream is None:
+        return
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        yield data
@@ -1,3 +1,1655 @@
-from django.test import TestCase
+import asyncio
+import base64
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+import uuid
+from datetime import timedelta
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.test import AsyncClient, LiveServerTestCase, SimpleTestCase, TestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from auth_app.models import AccountPurgeJob, User
+from auth_app.serializers import CustomTokenObtainPairSerializer
+from axiomcore.response_cache import reset_response_cache_stats, response_cache_stats
+from . import search
+from .benchmark import OPERATIONS, percentile
+from .events import EventBroker, get_event_broker
+from .filter import FileFilter
+from .conditional import check_write_preconditions, evaluate_preconditions
+from .content import write_content
+from .models import Category, ChangeLogEntry, FileMetadata, UploadSession
+from .purge import purge_deleted_files
+from .perf import ADMIN, ANONYMOUS, OWNER, SCENARIOS, load_baselines, run_scenario, save_baselines
+from .serializers import FileMetadataSerializer
+from .storage import PackContentStorage, S3ContentStorage, get_content_storage
+from .storage.packstore import RECORD
+from .storage.s3_standin import LocalS3Server
 
-# Create your tests here.
+
+class FileFilterQueryPlanTests(TestCase):
+    """
+    The listing filters must compile to predicates SQLite can answer with an
+    index search on the user's rows rather than a scan of the whole table.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('planner', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        cls.category = Category.objects.create(category='Docs', owner=cls.user)
+        FileMetadata.objects.bulk_create([
+            FileMetadata(owner=cls.user, category=cls.category, file_name=f'note-{i}', file_type='text/plain', file_size=i)
+            for i in range(20)
+        ])
+
+    def explain(self, params):
+        queryset = FileMetadata.objects.filter(owner=self.user)
+        filterset = FileFilter(params, queryset=queryset)
+        self.assertTrue(filterset.is_valid(), filterset.errors)
+        return filterset.qs.explain()
+
+    def assertIndexSearch(self, plan, index_name):
+        self.assertIn(f'SEARCH encryptor_filemetadata USING INDEX {index_name}', plan)
+        self.assertNotIn('SCAN encryptor_filemetadata', plan)
+
+    def test_created_range_uses_owner_created_index(self):
+        plan = self.explain({'created_after': '2025-01-01T00:00:00Z', 'created_before': '2025-02-01T00:00:00Z'})
+        self.assertIndexSearch(plan, 'file_owner_created_id_idx')
+        self.assertIn('created_at>? AND created_at<?', plan)
+
+    def test_created_on_day_is_a_range(self):
+        plan = self.explain({'created_at': '2025-01-15'})
+        self.assertIndexSearch(plan, 'file_owner_created_id_idx')
+        self.assertNotIn('django_datetime_cast_date', str(FileFilter({'created_at': '2025-01-15'}, queryset=FileMetadata.objects.all()).qs.query))
+
+    def test_file_type_uses_owner_type_index(self):
+        plan = self.explain({'file_type': 'text/plain'})
+        self.assertIndexSearch(plan, 'file_owner_type_idx')
+
+    def test_size_range_stays_on_owner_index(self):
+        plan = self.explain({'min_size': 5, 'max_size': 10})
+        self.assertIn('SEARCH encryptor_filemetadata USING INDEX', plan)
+        self.assertNotIn('SCAN encryptor_filemetadata', plan)
+
+    def test_category_filter_uses_owner_category_index(self):
+        queryset = FileMetadata.objects.filter(owner=self.user, category=self.category)
+        self.assertIndexSearch(queryset.explain(), 'file_owner_category_idx')
+
+
+class S3ContentStorageTests(TestCase):
+    """
+    Exercises the S3 backend end to end against the in-process stand-in.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = LocalS3Server().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.storage = S3ContentStorage(self.server.endpoint_url, 'content', 'test-key', 'test-secret')
+        self.key = uuid.uuid4()
+
+    def test_save_read_range_and_delete(self):
+        self.storage.save(self.key, b'0123456789')
+        self.assertEqual(self.storage.read(self.key), b'0123456789')
+        self.assertEqual(self.storage.stat(self.key).size, 10)
+        self.assertEqual(b''.join(self.storage.iter_range(self.key, 2, 5, 2)), b'23456')
+        self.storage.delete(self.key)
+        with self.assertRaises(FileNotFoundError):
+            self.storage.stat(self.key)
+
+    def test_save_stream_switches_to_multipart(self):
+        part = self.storage.min_part_size
+        chunks = [b'a' * part, b'b' * part, b'c' * 10]
+        self.storage.save_stream(self.key, iter(chunks))
+        self.assertEqual(self.storage.read(self.key), b''.join(chunks))
+        self.assertEqual(self.server.uploads, {})
+
+    def test_upload_session_assembles_parts_in_storage(self):
+        user = User.objects.create_user('uploader', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        category = Category.objects.create(category='Docs', owner=user)
+        metadata = FileMetadata.objects.create(owner=user, category=category, file_name='big', file_type='bin', file_size=0)
+        client = APIClient()
+        client.force_authenticate(user)
+        body = os.urandom(self.storage.min_part_size + 1024)
+
+        with override_settings(
+            CONTENT_STORAGE_BACKEND='encryptor.storage.S3ContentStorage',
+            CONTENT_STORAGE_OPTIONS={
+                'endpoint_url': self.server.endpoint_url, 'bucket': 'content',
+                'access_key': 'test-key', 'secret_key': 'test-secret',
+            },
+        ):
+            base = f'/api/files/{metadata.id}/upload-sessions/'
+            response = client.post(base, {'total_size': len(body), 'chunk_size': 1024}, format='json')
+            self.assertEqual(response.status_code, 400)
+
+            response = client.post(base, {'total_size': len(body)}, format='json')
+            self.assertEqual(response.status_code, 201, response.data)
+            session = f"{base}{response.data['id']}/"
+            chunk_size = response.data['chunk_size']
+
+            # Upload the last chunk first; parts may arrive in any order.
+            for index in (1, 0):
+                chunk = body[index * chunk_size:(index + 1) * chunk_size]
+                response = client.put(f'{session}chunks/{index}/', chunk, content_type='application/octet-stream')
+                self.assertEqual(response.status_code, 204)
+            response = client.put(f'{session}chunks/1/', b'short', content_type='application/octet-stream')
+            self.assertEqual(response.status_code, 400)
+
+            response = client.post(f'{session}finalize/')
+            self.assertEqual(response.status_code, 204)
+            self.assertEqual(get_content_storage().read(metadata.id), body)
+            self.assertEqual(self.server.uploads, {})
+
+
+class RecordingBroker(EventBroker):
+    """
+    Local stand-in for a shared broker: keeps published events in memory.
+    """
+    published = []
+
+    def publish(self, user_id, event):
+        self.published.append((str(user_id), event))
+
+
+class ChangeEventTests(TestCase):
+    """
+    Writes notify the user's other devices through the configured broker,
+    and the ASGI event stream relays them.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('pusher', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        cls.category = Category.objects.create(category='Docs', owner=cls.user)
+
+    @override_settings(EVENT_BROKER_BACKEND='encryptor.tests.RecordingBroker')
+    def test_write_publishes_after_commit(self):
+        RecordingBroker.published = []
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = client.post('/api/files/', {
+                'file_name': 'note', 'file_type': 'text/plain', 'file_size': 3, 'category': self.category.id,
+            }, format='json', HTTP_X_DEVICE_ID='phone')
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(RecordingBroker.published, [])
+
+        for callback in callbacks:
+            callback()
+        user_id, event = RecordingBroker.published[-1]
+        self.assertEqual(user_id, str(self.user.pk))
+        self.assertEqual((event['kind'], event['action'], event['origin']), ('file', 'upsert', 'phone'))
+        self.assertEqual(event['seq'], ChangeLogEntry.objects.filter(owner=self.user).latest('seq').seq)
+
+    async def test_event_stream_skips_own_device(self):
+        token = await sync_to_async(lambda: str(AccessToken.for_user(self.user)))()
+        response = await AsyncClient().get(f'/api/events/?device=laptop&token={token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertIn(b'connected', await anext(stream))
+
+        broker = get_event_broker()
+        broker.publish(self.user.pk, {'seq': 1, 'kind': 'file', 'action': 'upsert', 'count': 1, 'origin': 'laptop'})
+        broker.publish(self.user.pk, {'seq': 2, 'kind': 'file', 'action': 'delete', 'count': 1, 'origin': 'phone'})
+        chunk = await asyncio.wait_for(anext(stream), timeout=5)
+        self.assertTrue(chunk.startswith(b'event: change\nid: 2\n'))
+        await stream.aclose()
+
+    async def test_event_stream_requires_token(self):
+        response = await AsyncClient().get('/api/events/')
+        self.assertEqual(response.status_code, 401)
+
+
+class CategoryTotalsTests(TestCase):
+    """
+    Category.files_count and total_bytes follow every way files are created,
+    resized, moved and deleted, so the summary never aggregates files.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('counter', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        cls.photos = Category.objects.create(category='Photos', owner=cls.user)
+        cls.notes = Category.objects.create(category='Notes', owner=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def totals(self):
+        return {
+            category.category: (category.files_count, category.total_bytes)
+            for category in Category.objects.filter(owner=self.user)
+        }
+
+    def test_totals_follow_file_changes(self):
+        files = [{'file_name': f'{n}.jpg', 'file_type': 'jpg', 'file_size': 100, 'category': self.photos.pk} for n in range(3)]
+        created = self.client.post('/api/files/bulk-create/', files, format='json').data['results']
+        single = self.client.post(
+            '/api/files/', {'file_name': 'a.txt', 'file_type': 'txt', 'file_size': 10, 'category': self.notes.pk}, format='json'
+        ).data
+        self.assertEqual(self.totals(), {'Photos': (3, 300), 'Notes': (1, 10)})
+
+        moved = created[0]['file']['id']
+        self.client.patch(f'/api/files/{moved}/', {'category': self.notes.pk, 'file_size': 150}, format='json')
+        self.client.patch(f"/api/files/{single['id']}/", {'file_size': 20}, format='json')
+        self.assertEqual(self.totals(), {'Photos': (2, 200), 'Notes': (2, 170)})
+
+        self.client.post('/api/files/bulk-delete/', {'ids': [created[1]['file']['id']]}, format='json')
+        self.client.delete(f"/api/files/{single['id']}/")
+        self.assertEqual(self.totals(), {'Photos': (1, 100), 'Notes': (1, 150)})
+
+        with self.assertNumQueries(1):
+            summary = self.client.get('/api/category-summary/').data
+        self.assertEqual(
+            [(row['category'], row['files_count'], row['total_bytes']) for row in summary],
+            [('Photos', 1, 100), ('Notes', 1, 150)],
+        )
+
+        Category.objects.filter(pk=self.photos.pk).update(files_count=7)
+        call_command('rebuild_category_totals', stdout=io.StringIO())
+        self.assertEqual(self.totals(), {'Photos': (1, 100), 'Notes': (1, 150)})
+
+    def test_bulk_changes_update_totals_in_one_query(self):
+        files = [
+            {'file_name': f'{n}.bin', 'file_type': 'bin', 'file_size': 10, 'category': (self.photos, self.notes)[n % 2].pk}
+            for n in range(4)
+        ]
+        created = self.client.post('/api/files/bulk-create/', files, format='json').data['results']
+        self.assertEqual(self.totals(), {'Photos': (2, 20), 'Notes': (2, 20)})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post('/api/files/bulk-delete/', {'ids': [row['file']['id'] for row in created]}, format='json')
+        updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE "encryptor_category"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.totals(), {'Photos': (0, 0), 'Notes': (0, 0)})
+
+
+class ResponseCacheTests(TestCase):
+    """
+    Per-user responses are cached in a cache shared between processes (here
+    file-based) and dropped when any process bumps the user's generation.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cached', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        cls.category = Category.objects.create(category='Docs', owner=cls.user)
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        shared_cache = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': self.cache_dir.name,
+        }})
+        shared_cache.enable()
+        self.addCleanup(shared_cache.disable)
+        reset_response_cache_stats()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_file(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                '/api/files/', {'file_name': 'a.txt', 'file_type': 'txt', 'file_size': 1, 'category': self.category.pk},
+                format='json',
+            )
+
+    def test_first_files_page_cached_until_files_change(self):
+        self.assertEqual(self.client.get('/api/files/').data['count'], 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/files/').data['count'], 0)
+        self.client.get('/api/files/?page=2')
+
+        self.create_file()
+        self.assertEqual(self.client.get('/api/files/').data['count'], 1)
+        self.assertEqual(response_cache_stats()['files'], {'hits': 1, 'misses': 2})
+
+    def test_invalidation_through_another_cache_instance(self):
+        self.assertEqual(self.client.get('/api/files/').data['count'], 0)
+        # Another worker process has its own connection to the same cache.
+        other = FileBasedCache(self.cache_dir.name, {})
+        with mock.patch('axiomcore.response_cache._cache', return_value=other):
+            self.create_file()
+        self.assertEqual(self.client.get('/api/files/').data['count'], 1)
+
+    def test_per_user_responses_not_cached_in_process_local_cache(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.client.get('/api/files/')
+            self.client.get('/api/files/')
+        self.assertNotIn('files', response_cache_stats())
+
+
+class FileListFastPathTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('lister', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        categories = [Category.objects.create(category=name, owner=cls.user) for name in ('Ünïcode', 'Plain')]
+        for n in range(45):
+            FileMetadata.objects.create(
+                owner=cls.user, category=categories[n % 2], file_name=f'file "{n}".bin', file_type='bin', file_size=n * 1000
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_output_matches_serializer(self):
+        renderer = JSONRenderer()
+        files = FileMetadata.objects.filter(owner=self.user).order_by('-created_at', '-id')
+        for url, queries in (('/api/files/?page_size=100', 2), ('/api/files/?pagination=cursor&page_size=100', 1)):
+            with self.subTest(url=url), self.assertNumQueries(queries):
+                results = self.client.get(url).data['results']
+            self.assertEqual(renderer.render(results), renderer.render(FileMetadataSerializer(files, many=True).data))
+
+    def test_retrieve_joins_category(self):
+        file = FileMetadata.objects.filter(owner=self.user).first()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(f'/api/files/{file.pk}/').status_code, 200)
+
+
+class RequestInstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('timed', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        cls.category = Category.objects.create(category='Docs', owner=cls.user)
+        cls.file = FileMetadata.objects.create(
+            owner=cls.user, category=cls.category, file_name='a.bin', file_type='bin', file_size=11
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.storage_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.storage_dir.cleanup)
+        storage_settings = override_settings(
+            CONTENT_STORAGE_BACKEND='encryptor.storage.FileSystemContentStorage',
+            CONTENT_STORAGE_OPTIONS={'location': self.storage_dir.name},
+        )
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+
+    def timings(self, response):
+        return {entry.split(';')[0]: entry for entry in response['Server-Timing'].split(', ')}
+
+    def test_reports_queries_and_view(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/files/?page=2')
+        timings = self.timings(response)
+        self.assertIn(f'desc="{len(queries)} queries"', timings['db'])
+        self.assertEqual(timings['view'], 'view;desc="FileViewSet.list"')
+        self.assertRegex(timings['render'], r'^render;dur=\d+(\.\d+)?$')
+
+    def test_reports_serialization(self):
+        FileMetadata.objects.bulk_create([
+            FileMetadata(owner=self.user, category=self.category, file_name=f'{n}.bin', file_type='bin', file_size=n)
+            for n in range(50)
+        ])
+        Category.objects.bulk_create([Category(category=f'Category {n}', owner=self.user) for n in range(20)])
+        for url in ('/api/files/', '/api/categories/'):
+            with self.subTest(url=url):
+                serialize = self.timings(self.client.get(url))['serialize']
+                self.assertRegex(serialize, r'^serialize;dur=\d+(\.\d+)?$')
+                self.assertGreater(float(serialize.split('=')[1]), 0)
+
+    def test_counts_content_bytes(self):
+        response = self.client.put(
+            f'/api/files/{self.file.pk}/content/', b'0123456789a', content_type='application/octet-stream'
+        )
+        self.assertEqual(response.status_code, 204)
+        timings = self.timings(response)
+        self.assertEqual(timings['storage-write'], 'storage-write;desc="11 bytes"')
+        self.assertEqual(timings['storage-read'], 'storage-read;desc="0 bytes"')
+
+        response = self.client.get(f'/api/files/{self.file.pk}/content/', HTTP_ACCEPT='application/octet-stream')
+        self.assertEqual(self.timings(response)['storage-read'], 'storage-read;desc="11 bytes"')
+
+    @override_settings(REQUEST_LOG_SAMPLE_RATE=1)
+    def test_sampled_requests_are_logged(self):
+        with self.assertLogs('axiomcore.requests', 'INFO') as logs:
+            self.client.get(f'/api/files/{self.file.pk}/')
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'FileViewSet.retrieve')
+        self.assertEqual(line['status'], 200)
+        self.assertGreater(line['db_queries'], 0)
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_can_be_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/files/'))
+
+
+class SeedAxiomCommandTests(TestCase):
+    def seed(self, **options):
+        options = {'users': 5, 'files': 200, 'categories': 3, 'batch_size': 64, 'stdout': io.StringIO(), **options}
+        call_command('seed_axiom', **options)
+
+    def test_counters_match_rows(self):
+        self.seed()
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(FileMetadata.objects.count(), 200)
+        for command in ('rebuild_category_totals', 'reconcile_storage_usage'):
+            out = io.StringIO()
+            call_command(command, dry_run=True, stdout=out)
+            self.assertIn("Found 0 drifted", out.getvalue())
+        self.assertEqual(ChangeLogEntry.objects.count(), 200 + 15)
+        # The most files go to the first user.
+        counts = [User.objects.get(username=f'seed-{n}').files.count() for n in range(5)]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+
+    def test_same_seed_gives_same_data(self):
+        def snapshot():
+            return (
+                list(User.objects.order_by('username').values_list('id', 'salt', 'subscription_plan')),
+                list(FileMetadata.objects.order_by('id').values_list('id', 'file_name', 'file_size', 'category__category')),
+            )
+        with transaction.atomic():
+            self.seed(seed=7)
+            first = snapshot()
+            transaction.set_rollback(True)
+        self.seed(seed=7)
+        self.assertEqual(snapshot(), first)
+
+    def test_blobs_match_sizes_and_digests(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(
+            CONTENT_STORAGE_BACKEND='encryptor.storage.FileSystemContentStorage',
+            CONTENT_STORAGE_OPTIONS={'location': location},
+        ):
+            self.seed(files=20, median_size=100 * 1024, size_sigma=0.5, blobs=True)
+            storage = get_content_storage()
+            for metadata in FileMetadata.objects.all():
+                data = storage.read(metadata.id)
+                self.assertEqual(len(data), metadata.file_size)
+                self.assertEqual(hashlib.sha256(data).hexdigest(), metadata.content_digest)
+
+    def test_refuses_existing_prefix(self):
+        self.seed(users=1, files=1)
+        with self.assertRaises(CommandError):
+            self.seed(users=1, files=1)
+
+
+class BenchmarkHttpCommandTests(LiveServerTestCase):
+    def setUp(self):
+        self.storage_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.storage_dir.cleanup)
+        storage_settings = override_settings(
+            CONTENT_STORAGE_BACKEND='encryptor.storage.FileSystemContentStorage',
+            CONTENT_STORAGE_OPTIONS={'location': self.storage_dir.name},
+        )
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+        call_command('seed_axiom', users=2, files=100, plans='PRO=1', median_size=1024, stdout=io.StringIO())
+
+    def test_reports_every_operation(self):
+        out = io.StringIO()
+        call_command(
+            'benchmark_http', url=self.live_server_url, concurrency=2, duration=1, warmup=0,
+            content_size=1024, stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['operations']), set(OPERATIONS))
+        for name, stats in report['operations'].items():
+            with self.subTest(operation=name):
+                self.assertGreater(stats['requests'], 0)
+                self.assertEqual(stats['errors'], 0, stats['statuses'])
+                self.assertLessEqual(stats['p50_ms'], stats['p95_ms'])
+                self.assertLessEqual(stats['p95_ms'], stats['p99_ms'])
+
+    def test_requires_seeded_users(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark_http', url=self.live_server_url, prefix='missing', duration=1, stdout=io.StringIO())
+
+    def test_asgi_server_requires_uvicorn(self):
+        find_spec = importlib.util.find_spec
+        without_uvicorn = lambda name, *args: None if name == 'uvicorn' else find_spec(name, *args)
+        with mock.patch('importlib.util.find_spec', side_effect=without_uvicorn):
+            with self.assertRaisesMessage(CommandError, 'pip install uvicorn'):
+                call_command('benchmark_http', server='asgi', duration=1, stdout=io.StringIO())
+
+    def test_percentile_uses_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual([percentile(values, f) for f in (0.5, 0.95, 0.99)], [50, 95, 99])
+        self.assertIsNone(percentile([], 0.5))
+
+
+class EndpointPerformanceTests(TestCase):
+    """
+    Runs every API route against libraries of 10, 1k and 50k files (override
+    with PERF_TIERS=10,1000). Query counts must stay within each scenario's
+    budget and be the same for every library size. With PERF_CHECK_TIMINGS=1
+    median timings are also compared with perf_baselines.json, within
+    PERF_TOLERANCE times the baseline; they vary too much between machines
+    to be checked by default. PERF_UPDATE_BASELINES=1 records new baselines
+    instead and PERF_REPORT=<path> writes the measured counts and timings as
+    JSON.
+    """
+
+    TIERS = [int(tier) for tier in os.environ.get('PERF_TIERS', '10,1000,50000').split(',')]
+    RUNS = 3
+
+    def setUp(self):
+        self.storage_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.storage_dir.cleanup)
+        storage_settings = override_settings(
+            CONTENT_STORAGE_BACKEND='encryptor.storage.FileSystemContentStorage',
+            CONTENT_STORAGE_OPTIONS={'location': self.storage_dir.name},
+        )
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+
+    def token_client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {CustomTokenObtainPairSerializer.get_token(user).access_token}')
+        return client
+
+    def prepare(self, file_count):
+        call_command(
+            'seed_axiom', users=1, files=file_count, categories=10, prefix='perf', plans='PRO=1',
+            median_size=1024, key_hash='hash', recovery_key_hash='rhash', stdout=io.StringIO(),
+        )
+        user = User.objects.get(username='perf-0')
+        admin = User.objects.create_superuser('perf-admin', 'password')
+        owner = self.token_client(user)
+        files = list(FileMetadata.objects.filter(owner=user).order_by('created_at').values_list('id', flat=True)[:10])
+        category = Category.objects.filter(owner=user).order_by('id').first()
+        empty_category = Category.objects.create(category='Empty', owner=user)
+
+        content_file = FileMetadata.objects.get(pk=files[1])
+        write_content(content_file, [b'encrypted bytes'])
+        other = User.objects.create_user('perf-leaving', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        job = AccountPurgeJob.objects.create(user_id=other.pk, username=other.username)
+
+        refresh = CustomTokenObtainPairSerializer.get_token(user)
+        fixtures = {
+            'user': user.pk, 'username': user.username, 'file': files[0], 'content_file': files[1],
+            'upload_file': files[2], 'file_ids': [str(file_id) for file_id in files[5:10]], 'category': category.pk,
+            'category_name': category.category, 'empty_category': empty_category.pk, 'job': job.pk,
+            'refresh': str(refresh), 'access': str(refresh.access_token),
+        }
+        clients = {OWNER: owner, ADMIN: self.token_client(admin), ANONYMOUS: APIClient()}
+        return clients, fixtures
+
+    def test_query_budgets_and_timings(self):
+        counts = {}
+        timings = {}
+        for tier in self.TIERS:
+            with transaction.atomic():
+                clients, fixtures = self.prepare(tier)
+                for scenario in SCENARIOS:
+                    response, queries, duration = run_scenario(scenario, clients[scenario.client], fixtures, self.RUNS)
+                    with self.subTest(scenario=scenario.name, files=tier):
+                        self.assertEqual(response.status_code, scenario.status, getattr(response, 'data', None))
+                        self.assertLessEqual(queries, scenario.budget)
+                    counts.setdefault(scenario.name, {})[tier] = queries
+                    timings.setdefault(str(tier), {})[scenario.name] = round(duration, 4)
+                transaction.set_rollback(True)
+
+        for name, by_tier in counts.items():
+            with self.subTest(scenario=name):
+                self.assertEqual(len(set(by_tier.values())), 1, f"Query count depends on library size: {by_tier}")
+
+        if os.environ.get('PERF_REPORT'):
+            with open(os.environ['PERF_REPORT'], 'w') as f:
+                json.dump({'queries': counts, 'timings': timings}, f, indent=2, sort_keys=True)
+        if os.environ.get('PERF_UPDATE_BASELINES') == '1':
+            save_baselines(timings)
+            return
+        if os.environ.get('PERF_CHECK_TIMINGS') != '1':
+            return
+        tolerance = float(os.environ.get('PERF_TOLERANCE', '5'))
+        baselines = load_baselines()
+        for tier, durations in timings.items():
+            for name, duration in durations.items():
+                baseline = baselines.get(tier, {}).get(name)
+                if baseline is None:
+                    continue
+                with self.subTest(scenario=name, files=tier):
+                    # Absolute slack keeps sub-millisecond baselines from failing on noise.
+                    self.assertLessEqual(duration, baseline * tolerance + 0.05)
+
+
+class ContentRangeTests(TestCase):
+    """
+    content/raw answers Range requests with 206, unsatisfiable ones with 416,
+    and only honours a range while If-Range still matches.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('ranger', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        category = Category.objects.create(category='Docs', owner=cls.user)
+        cls.metadata = FileMetadata.objects.create(owner=cls.user, category=category, file_name='blob', file_type='bin', file_size=10)
+
+    def setUp(self):
+        self.storage_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.storage_dir.cleanup)
+        storage_settings = override_settings(
+            CONTENT_STORAGE_BACKEND='encryptor.storage.FileSystemContentStorage',
+            CONTENT_STORAGE_OPTIONS={'location': self.storage_dir.name},
+            CONTENT_STREAM_CHUNK_SIZE=4,
+        )
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+        write_content(self.metadata, [b'0123456789'])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/files/{self.metadata.id}/content/raw/'
+
+    def get(self, **headers):
+        return self.client.get(self.url, HTTP_ACCEPT='application/octet-stream', **headers)
+
+    def test_full_and_partial_content(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        for header, body, content_range in [
+            ('bytes=2-5', b'2345', 'bytes 2-5/10'),
+            ('bytes=7-', b'789', 'bytes 7-9/10'),
+            ('bytes=-3', b'789', 'bytes 7-9/10'),
+            ('bytes=8-100', b'89', 'bytes 8-9/10'),
+        ]:
+            with self.subTest(range=header):
+                response = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(b''.join(response.streaming_content), body)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(response['Content-Length'], str(len(body)))
+
+        response = self.client.head(self.url, HTTP_RANGE='bytes=0-3')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Length'], '4')
+
+    def test_unsatisfiable_and_ignored_ranges(self):
+        for header in ('bytes=10-', 'bytes=5-2', 'bytes=-0'):
+            with self.subTest(range=header):
+                response = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */10')
+        # Malformed and multi-range headers are ignored rather than rejected.
+        for header in ('bytes=a-b', 'bytes=0-1,4-5', 'items=0-1'):
+            with self.subTest(range=header):
+                self.assertEqual(self.get(HTTP_RANGE=header).status_code, 200)
+
+    def test_ranges_of_empty_content_are_unsatisfiable(self):
+        write_content(FileMetadata.objects.get(pk=self.metadata.pk), [b''])
+        self.assertEqual(self.get().status_code, 200)
+        for header in ('bytes=-5', 'bytes=0-', 'bytes=0-0'):
+            with self.subTest(range=header):
+                response = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */0')
+
+    def test_if_range(self):
+        first = self.get()
+        etag, last_modified = first['ETag'], first['Last-Modified']
+
+        for if_range in (etag, last_modified):
+            with self.subTest(if_range=if_range):
+                response = self.get(HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE=if_range)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(b''.join(response.streaming_content), b'01')
+
+        write_content(FileMetadata.objects.get(pk=self.metadata.pk), [b'abcdefghij'])
+        for if_range in (etag, f'W/{etag}', 'Thu, 01 Jan 1970 00:00:00 GMT'):
+            with self.subTest(if_range=if_range):
+                response = self.get(HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE=if_range)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(b''.join(response.streaming_content), b'abcdefghij')
+
+
+class UploadSessionTests(TestCase):
+    """
+    Chunks may arrive in any order, the session reports what is missing,
+    open sessions count against the quota and expired ones are cleaned up.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('resumer', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        category = Category.objects.create(category='Docs', owner=cls.user)
+        cls.metadata = FileMetadata.objects.create(owner=cls.user, category=category, file_name='big', file_type='bin', file_size=0)
+
+    def setUp(self):
+        self.storage_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.storage_dir.cleanup)
+        storage_settings = override_settings(
+            CONTENT_STORAGE_BACKEND='encryptor.storage.FileSystemContentStorage',
+            CONTENT_STORAGE_OPTIONS={'location': self.storage_dir.name},
+        )
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.base = f'/api/files/{self.metadata.id}/upload-sessions/'
+
+    def open_session(self, total_size, chunk_size=4):
+        response = self.client.post(self.base, {'total_size': total_size, 'chunk_size': chunk_size}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return f"{self.base}{response.data['id']}/", response.data
+
+    def put_chunk(self, session, index, data):
+        return self.client.put(f'{session}chunks/{index}/', data, content_type='application/octet-stream')
+
+    def test_out_of_order_chunks_and_missing_report(self):
+        session, data = self.open_session(10)
+        self.assertEqual((data['chunk_count'], data['missing_chunks']), (3, [0, 1, 2]))
+
+        self.assertEqual(self.put_chunk(session, 2, b'89').status_code, 204)
+        self.assertEqual(self.put_chunk(session, 0, b'0123').status_code, 204)
+        self.assertEqual(self.put_chunk(session, 3, b'x').status_code, 400)
+        data = self.client.get(session).data
+        self.assertEqual((data['received_chunks'], data['missing_chunks'], data['received_bytes']), ([0, 2], [1], 6))
+
+        response = self.client.post(f'{session}finalize/')
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('1 chunks are missing', response.data['error'])
+
+        self.assertEqual(self.put_chunk(session, 1, b'4567').status_code, 204)
+        self.assertEqual(self.client.post(f'{session}finalize/').status_code, 204)
+        self.assertEqual(get_content_storage().read(self.metadata.id), b'0123456789')
+        self.assertEqual(self.client.get(session).status_code, 404)
+
+    def test_open_sessions_reserve_quota(self):
+        self.user.upload_limit_mb = 1
+        megabyte = 1024 * 1024
+        session, _ = self.open_session(megabyte - 10, chunk_size=megabyte)
+        response = self.client.post(self.base, {'total_size': 20, 'chunk_size': 4}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('file_size', response.data)
+
+        # Aborting releases the reservation.
+        self.assertEqual(self.client.delete(session).status_code, 204)
+        self.open_session(20)
+
+    def test_replacing_content_reserves_only_the_growth(self):
+        self.user.upload_limit_mb = 1
+        kilobyte = 1024
+        FileMetadata.objects.filter(pk=self.metadata.pk).update(file_size=600 * kilobyte)
+        User.objects.filter(pk=self.user.pk).update(used_storage_bytes=600 * kilobyte)
+
+        # 600 KB stored, replaced by 700 KB: only the extra 100 KB is reserved.
+        self.open_session(700 * kilobyte, chunk_size=kilobyte)
+        self.open_session(900 * kilobyte, chunk_size=kilobyte)
+        response = self.client.post(self.base, {'total_size': 1000 * kilobyte, 'chunk_size': kilobyte}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('file_size', response.data)
+
+    def test_expired_sessions_are_cleaned_up(self):
+        self.user.upload_limit_mb = 1
+        session, data = self.open_session(1024 * 1024, chunk_size=1024 * 1024)
+        self.assertEqual(self.put_chunk(session, 0, b'x' * 1024 * 1024).status_code, 204)
+        upload_id = UploadSession.objects.get(pk=data['id']).storage_upload_id
+        upload_path = get_content_storage().upload_path(upload_id)
+        self.assertTrue(os.path.exists(upload_path))
+
+        UploadSession.objects.filter(pk=data['id']).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.client.get(session).status_code, 404)
+        # The expired reservation no longer counts, and opening a session removes it.
+        self.open_session(1024)
+        self.assertFalse(UploadSession.objects.filter(pk=data['id']).exists())
+        self.assertFalse(os.path.exists(upload_path))
+
+    def test_failed_abort_is_logged(self):
+        _, data = self.open_session(10)
+        storage = get_content_storage()
+        with mock.patch.object(storage, 'abort_multipart', side_effect=OSError('gone')), \
+                self.assertLogs('encryptor.signals', 'ERROR') as logs:
+            UploadSession.objects.filter(pk=data['id']).delete()
+        self.assertIn(f"Error aborting storage upload of session {data['id']}.", logs.output[0])
+
+
+class StorageUsageTests(TestCase):
+    """
+    User.used_storage_bytes follows file creates, resizes and deletes, and
+    reconcile_storage_usage repairs any drift.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('usage', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        cls.category = Category.objects.create(category='Docs', owner=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def used(self, user=None):
+        return User.objects.values_list('used_storage_bytes', flat=True).get(pk=(user or self.user).pk)
+
+    def test_counter_follows_create_resize_and_delete(self):
+        first = self.client.post('/api/files/', {
+            'file_name': 'a.txt', 'file_type': 'txt', 'file_size': 100, 'category': self.category.pk,
+        }, format='json').data
+        self.client.post('/api/files/bulk-create/', [
+            {'file_name': f'{n}.txt', 'file_type': 'txt', 'file_size': 50, 'category': self.category.pk} for n in range(2)
+        ], format='json')
+        self.assertEqual(self.used(), 200)
+
+        self.client.patch(f"/api/files/{first['id']}/", {'file_size': 40}, format='json')
+        self.assertEqual(self.used(), 140)
+        self.client.patch(f"/api/files/{first['id']}/", {'file_name': 'b.txt'}, format='json')
+        self.assertEqual(self.used(), 140)
+
+        self.client.delete(f"/api/files/{first['id']}/")
+        self.assertEqual(self.used(), 100)
+        # Deleting it again must not count twice.
+        self.assertEqual(self.client.delete(f"/api/files/{first['id']}/").status_code, 404)
+        self.assertEqual(self.used(), 100)
+
+    def test_reconcile_storage_usage(self):
+        FileMetadata.objects.create(owner=self.user, category=self.category, file_name='a', file_type='txt', file_size=30)
+        other = User.objects.create_user('usage-2', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        User.objects.filter(pk=self.user.pk).update(used_storage_bytes=999)
+        User.objects.filter(pk=other.pk).update(used_storage_bytes=5)
+
+        out = io.StringIO()
+        call_command('reconcile_storage_usage', dry_run=True, stdout=out)
+        self.assertIn('Found 2 drifted storage counters.', out.getvalue())
+        self.assertEqual(self.used(), 999)
+
+        call_command('reconcile_storage_usage', stdout=io.StringIO())
+        self.assertEqual((self.used(), self.used(other)), (30, 0))
+        out = io.StringIO()
+        call_command('reconcile_storage_usage', stdout=out)
+        self.assertIn('Fixed 0 drifted storage counters.', out.getvalue())
+
+
+class FileCursorPaginationTests(TestCase):
+    """
+    Cursor pages walk every file exactly once in both directions, including
+    files that share a created_at, and reject cursors they did not issue.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('pager', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        category = Category.objects.create(category='Docs', owner=cls.user)
+        FileMetadata.objects.bulk_create([
+            FileMetadata(owner=cls.user, category=category, file_name=f'{n}.txt', file_type='txt', file_size=1)
+            for n in range(7)
+        ])
+        # Five of the files share one timestamp, so only the id orders them.
+        ids = list(FileMetadata.objects.filter(owner=cls.user).values_list('id', flat=True))
+        moment = timezone.now()
+        FileMetadata.objects.filter(pk__in=ids[:5]).update(created_at=moment)
+        FileMetadata.objects.filter(pk__in=ids[5:]).update(created_at=moment - timedelta(days=1))
+        cls.expected = [
+            str(pk) for pk in FileMetadata.objects.filter(owner=cls.user).order_by('-created_at', '-id').values_list('id', flat=True)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data, [row['id'] for row in response.data['results']]
+
+    def test_forward_and_backward(self):
+        seen, pages = [], []
+        url = '/api/files/?pagination=cursor&page_size=2'
+        while url:
+            data, ids = self.page(url)
+            pages.append(ids)
+            seen.extend(ids)
+            url = data['next']
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(ids) for ids in pages], [2, 2, 2, 1])
+        self.assertIsNone(self.page('/api/files/?pagination=cursor&page_size=2')[0]['previous'])
+
+        # Walk back from the last page.
+        url = data['previous']
+        for expected in reversed(pages[:-1]):
+            data, ids = self.page(url)
+            self.assertEqual(ids, expected)
+            url = data['previous']
+        self.assertIsNone(url)
+
+    def test_invalid_cursor_is_not_found(self):
+        def encode(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        for cursor in [
+            'not-base64!',
+            encode(['2024-01-01T00:00:00+00:00', 'not-a-uuid', False]),
+            encode(['2024-01-01T00:00:00+00:00', 42, False]),
+            encode(['2024-01-01T00:00:00+00:00', None, False]),
+            encode(['yesterday', self.expected[0], False]),
+            encode([None, self.expected[0], False]),
+            encode({'created_at': '2024-01-01'}),
+            encode(7),
+        ]:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(f'/api/files/?cursor={cursor}').status_code, 404)
+
+
+class FullTextSearchTests(TestCase):
+    """
+    ?search= prefix-matches names, types and category names within the
+    owner's files, and the index follows renames and rebuilds.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('seeker', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        cls.other = User.objects.create_user('stranger', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        cls.category = Category.objects.create(category='Taxes', owner=cls.user)
+        other_category = Category.objects.create(category='Taxes', owner=cls.other)
+        for name in ('invoice-march.pdf', 'holiday photo.jpg'):
+            FileMetadata.objects.create(owner=cls.user, category=cls.category, file_name=name, file_type=name[-3:], file_size=1)
+        FileMetadata.objects.create(owner=cls.other, category=other_category, file_name='invoice-april.pdf', file_type='pdf', file_size=1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def names(self, terms):
+        # Cached pages are invalidated on commit, which TestCase never reaches.
+        cache.clear()
+        response = self.client.get('/api/files/', {'search': terms})
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['file_name'] for row in response.data['results'])
+
+    def test_prefix_matching_within_owner(self):
+        self.assertEqual(self.names('invo'), ['invoice-march.pdf'])
+        self.assertEqual(self.names('hol pho'), ['holiday photo.jpg'])
+        self.assertEqual(self.names('jpg'), ['holiday photo.jpg'])
+        self.assertEqual(self.names('tax'), ['holiday photo.jpg', 'invoice-march.pdf'])
+        self.assertEqual(self.names('april'), [])
+        self.assertEqual(self.names('invoice holiday'), [])
+
+    def test_renames_are_reindexed(self):
+        self.category.category = 'Receipts'
+        self.category.save()
+        self.assertEqual(self.names('tax'), [])
+        self.assertEqual(len(self.names('receipts')), 2)
+
+        file_id = FileMetadata.objects.get(file_name='invoice-march.pdf').pk
+        self.client.patch(f'/api/files/{file_id}/', {'file_name': 'bill-march.pdf'}, format='json')
+        self.assertEqual(self.names('invoice'), [])
+        self.assertEqual(self.names('bill'), ['bill-march.pdf'])
+
+    def test_files_sharing_id_prefix_keep_own_rows(self):
+        # Both ids agree on their upper 64 bits.
+        first = uuid.UUID('12345678-1234-4234-8234-000000000001')
+        second = uuid.UUID('12345678-1234-4234-8234-000000000002')
+        for file_id, name in ((first, 'alpha.txt'), (second, 'beta.txt')):
+            FileMetadata.objects.create(id=file_id, owner=self.user, category=self.category, file_name=name, file_type='txt', file_size=1)
+        self.assertEqual(self.names('alpha'), ['alpha.txt'])
+        self.assertEqual(self.names('beta'), ['beta.txt'])
+
+        self.client.delete(f'/api/files/{first}/')
+        self.assertEqual(self.names('alpha'), [])
+        self.assertEqual(self.names('beta'), ['beta.txt'])
+
+    @override_settings(SEARCH_MAX_RESULTS=1)
+    def test_results_are_capped(self):
+        cache.clear()
+        response = self.client.get('/api/files/', {'search': 'tax'})
+        self.assertEqual(response.data['count'], 1)
+
+    def test_rebuild_search_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {search.FTS_TABLE}")
+        self.assertEqual(self.names('invoice'), [])
+
+        out = io.StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 3 files.', out.getvalue())
+        self.assertEqual(self.names('invoice'), ['invoice-march.pdf'])
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.names('invoice'), ['invoice-april.pdf'])
+
+
+class BulkCreateTests(TestCase):
+    """
+    bulk-create validates every item before inserting any, checks the quota
+    once for the summed size and updates counters and the search index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('bulky', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        cls.category = Category.objects.create(category='Docs', owner=cls.user)
+        other = User.objects.create_user('bulky-2', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        cls.foreign_category = Category.objects.create(category='Docs', owner=other)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def item(self, name, size=10, category=None):
+        return {'file_name': name, 'file_type': 'txt', 'file_size': size, 'category': category or self.category.pk}
+
+    def test_invalid_item_rejects_whole_batch(self):
+        items = [self.item('a.txt'), self.item('b.txt', category=self.foreign_category.pk), {'file_name': 'c.txt'}]
+        response = self.client.post('/api/files/bulk-create/', items, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result['status'] for result in response.data['results']], ['valid', 'invalid', 'invalid'])
+        self.assertIn('category', response.data['results'][1]['errors'])
+        self.assertIn('file_size', response.data['results'][2]['errors'])
+        self.assertFalse(FileMetadata.objects.filter(owner=self.user).exists())
+
+    def test_quota_checked_once_for_summed_size(self):
+        self.user.upload_limit_mb = 1
+        half = 512 * 1024
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/files/bulk-create/', [self.item(f'{n}.bin', half) for n in range(3)], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('file_size', response.data)
+        self.assertFalse(FileMetadata.objects.filter(owner=self.user).exists())
+        self.assertEqual(sum('"encryptor_uploadsession"' in query['sql'] for query in queries), 1)
+
+        response = self.client.post('/api/files/bulk-create/', [self.item(f'{n}.bin', half) for n in range(2)], format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_created_files_update_counters_and_search(self):
+        response = self.client.post(
+            '/api/files/bulk-create/', [self.item('quarterly-report.pdf', 30), self.item('notes.txt', 12)], format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'created'])
+
+        self.assertEqual(User.objects.get(pk=self.user.pk).used_storage_bytes, 42)
+        category = Category.objects.get(pk=self.category.pk)
+        self.assertEqual((category.files_count, category.total_bytes), (2, 42))
+        self.assertEqual(
+            list(ChangeLogEntry.objects.filter(owner=self.user, kind='file').values_list('object_id', flat=True).order_by('object_id')),
+            sorted(result['file']['id'] for result in response.data['results']),
+        )
+        cache.clear()
+        found = self.client.get('/api/files/', {'search': 'quarter'}).data['results']
+        self.assertEqual([row['file_name'] for row in found], ['quarterly-report.pdf'])
+
+
+class SoftDeleteTests(TestCase):
+    """
+    Deleted files vanish from every read path at once, their counters are
+    adjusted exactly once, and the purge removes blobs and rows in batches.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('deleter', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        cls.category = Category.objects.create(category='Docs', owner=cls.user)
+
+    def setUp(self):
+        self.storage_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.storage_dir.cleanup)
+        storage_settings = override_settings(
+            CONTENT_STORAGE_BACKEND='encryptor.storage.FileSystemContentStorage',
+            CONTENT_STORAGE_OPTIONS={'location': self.storage_dir.name},
+        )
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.files = [
+            FileMetadata.objects.create(owner=self.user, category=self.category, file_name=f'memo-{n}.txt', file_type='txt', file_size=10)
+            for n in range(4)
+        ]
+        for metadata in self.files:
+            write_content(metadata, [b'secret'])
+        self.deleted = [str(f.id) for f in self.files[:3]]
+
+    def delete(self):
+        response = self.client.post('/api/files/bulk-delete/', {'ids': self.deleted[:2]}, format='json')
+        self.assertEqual(response.data, {'deleted': 2})
+        self.assertEqual(self.client.delete(f'/api/files/{self.deleted[2]}/').status_code, 204)
+
+    def counters(self):
+        category = Category.objects.get(pk=self.category.pk)
+        return User.objects.get(pk=self.user.pk).used_storage_bytes, category.files_count, category.total_bytes
+
+    def test_deleted_files_are_hidden_everywhere(self):
+        self.delete()
+        cache.clear()
+        remaining = [str(self.files[3].id)]
+        self.assertEqual([row['id'] for row in self.client.get('/api/files/').data['results']], remaining)
+        self.assertEqual(self.client.get('/api/files/', {'pagination': 'cursor'}).data['results'][0]['id'], remaining[0])
+        self.assertEqual([row['id'] for row in self.client.get('/api/files/', {'search': 'memo'}).data['results']], remaining)
+        self.assertEqual(self.client.get(f'/api/files/{self.deleted[0]}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/files/{self.deleted[0]}/content/').status_code, 404)
+        summary = self.client.get('/api/category-summary/').data
+        self.assertEqual([(row['files_count'], row['total_bytes']) for row in summary], [(1, 10)])
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        self.assertEqual(self.client.get('/auth/accounts/account-dashboard/').data['used_storage_bytes'], 10)
+
+    def test_counters_adjusted_once(self):
+        self.assertEqual(self.counters(), (40, 4, 40))
+        self.delete()
+        self.assertEqual(self.counters(), (10, 1, 10))
+
+        # Deleting again finds nothing, and purging the rows must not count them twice.
+        response = self.client.post('/api/files/bulk-delete/', {'ids': self.deleted}, format='json')
+        self.assertEqual(response.data, {'deleted': 0})
+        purge_deleted_files()
+        self.assertEqual(self.counters(), (10, 1, 10))
+
+    def test_purge_removes_blobs_and_rows_in_batches(self):
+        self.delete()
+        storage = get_content_storage()
+        self.assertEqual(FileMetadata.all_objects.filter(owner=self.user).count(), 4)
+
+        self.assertEqual(purge_deleted_files(batch_size=2, max_batches=1), 2)
+        self.assertEqual(FileMetadata.all_objects.filter(deleted_at__isnull=False).count(), 1)
+        self.assertEqual(purge_deleted_files(batch_size=2), 1)
+        self.assertEqual(list(FileMetadata.all_objects.filter(owner=self.user)), [self.files[3]])
+        for file_id in self.deleted:
+            with self.assertRaises(FileNotFoundError):
+                storage.stat(file_id)
+        self.assertEqual(storage.read(self.files[3].id), b'secret')
+        self.assertEqual(purge_deleted_files(), 0)
+
+
+PACK_WRITER = """
+import sys, uuid
+from encryptor.storage.packstore import PackStore
+store = PackStore(sys.argv[1])
+store.put(uuid.UUID(sys.argv[2]), b'from another process')
+store.delete_many([uuid.UUID(sys.argv[3])])
+"""
+
+
+class PackContentStorageTests(SimpleTestCase):
+    """
+    Small blobs live in shared packs located through an append-only journal
+    that every process tails; large ones fall back to individual files.
+    """
+
+    def setUp(self):
+        self.location = tempfile.TemporaryDirectory()
+        self.addCleanup(self.location.cleanup)
+        self.storage = self.open_storage()
+
+    def open_storage(self, **options):
+        storage = PackContentStorage(self.location.name, max_blob_size=64, target_pack_size=256, **options)
+        self.addCleanup(storage.packs.close)
+        return storage
+
+    def test_round_trip_and_overwrite(self):
+        key = uuid.uuid4()
+        self.storage.save(key, b'first version')
+        self.assertEqual(self.storage.read(key), b'first version')
+        self.storage.save(key, b'second')
+        self.assertEqual(self.storage.read(key), b'second')
+        self.assertEqual(self.storage.stat(key).size, 6)
+        self.assertEqual(b''.join(self.storage.iter_range(key, 1, 3, 2)), b'eco')
+        with self.storage.open(key) as blob:
+            blob.seek(2)
+            self.assertEqual(blob.read(), b'cond')
+        # A fresh instance replays the journal to the same state.
+        self.assertEqual(self.open_storage().read(key), b'second')
+
+    def test_streams_are_not_buffered_whole(self):
+        small, large = uuid.uuid4(), uuid.uuid4()
+        self.storage.save_stream(small, [b'0123', b'4567'])
+        self.assertIsNotNone(self.storage.packs.lookup(small))
+        self.assertEqual(self.storage.read(small), b'01234567')
+
+        chunk = 64 * 1024
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        self.storage.save_stream(large, (bytes([n % 256]) * chunk for n in range(160)))
+        peak = tracemalloc.get_traced_memory()[1]
+        self.assertLess(peak, 20 * chunk)
+        self.assertIsNone(self.storage.packs.lookup(large))
+        self.assertEqual(self.storage.stat(large).size, 160 * chunk)
+        with self.storage.open(large) as blob:
+            blob.seek(159 * chunk)
+            self.assertEqual(blob.read(1), bytes([159]))
+
+    def test_delete_appends_tombstone(self):
+        kept, deleted = uuid.uuid4(), uuid.uuid4()
+        self.storage.save(kept, b'kept')
+        self.storage.save(deleted, b'deleted')
+        size = os.path.getsize(self.storage.packs.journal_path)
+        self.storage.delete(deleted)
+        self.assertEqual(os.path.getsize(self.storage.packs.journal_path), size + RECORD.size)
+        with self.assertRaises(FileNotFoundError):
+            self.storage.read(deleted)
+        reopened = self.open_storage()
+        with self.assertRaises(FileNotFoundError):
+            reopened.stat(deleted)
+        self.assertEqual(reopened.read(kept), b'kept')
+
+    def test_large_blobs_fall_back_to_files(self):
+        key = uuid.uuid4()
+        large = os.urandom(100)
+        self.storage.save(key, large)
+        self.assertNotIn(key, self.storage.packs)
+        self.assertTrue(os.path.exists(self.storage.files.path(key)))
+        self.assertEqual(self.storage.read(key), large)
+
+        self.storage.save(key, b'small again')
+        self.assertIn(key, self.storage.packs)
+        self.assertFalse(os.path.exists(self.storage.files.path(key)))
+        self.storage.save_stream(key, iter([large[:50], large[50:]]))
+        self.assertNotIn(key, self.storage.packs)
+        self.assertEqual(self.storage.read(key), large)
+
+    def test_other_process_writes_are_seen(self):
+        written, deleted = uuid.uuid4(), uuid.uuid4()
+        self.storage.save(deleted, b'doomed')
+        with self.assertRaises(FileNotFoundError):
+            self.storage.read(written)
+
+        subprocess.run(
+            [sys.executable, '-c', PACK_WRITER, self.storage.packs.location, str(written), str(deleted)],
+            cwd=settings.BASE_DIR, check=True,
+        )
+        self.assertEqual(self.storage.read(written), b'from another process')
+        with self.assertRaises(FileNotFoundError):
+            self.storage.read(deleted)
+
+    def test_compact_keeps_live_and_drops_dead_blobs(self):
+        live = [uuid.uuid4() for _ in range(2)]
+        dead = [uuid.uuid4() for _ in range(8)]
+        for key in dead[:3] + live + dead[3:]:
+            self.storage.save(key, str(key).encode())
+        other = self.open_storage()
+        self.assertEqual(other.read(live[0]), str(live[0]).encode())
+        self.assertEqual(sorted(self.storage.packs.stats()), [1, 2])
+
+        self.storage.delete_many(dead)
+        self.assertGreater(self.storage.compact(), 0)
+        self.assertEqual(sorted(self.storage.packs.stats()), [2])
+        for storage in (self.storage, other, self.open_storage()):
+            for key in live:
+                self.assertEqual(storage.read(key), str(key).encode())
+            for key in dead:
+                with self.assertRaises(FileNotFoundError):
+                    storage.read(key)
+        self.assertEqual(self.storage.compact(), 0)
+
+    def test_crash_between_pack_and_journal_write(self):
+        key, lost, later = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        self.storage.save(key, b'committed')
+        packs = self.storage.packs
+        # Blob bytes appended but the writer died before journaling them,
+        # then a second writer died halfway through its journal record.
+        with open(packs.pack_path(packs._active_pack()), 'ab') as pack:
+            pack.write(b'orphaned bytes')
+        with open(packs.journal_path, 'ab') as journal:
+            journal.write(RECORD.pack(packs._key(lost), 1, 0, 9, 0.0, 1)[:RECORD.size // 2])
+
+        reader = self.open_storage()
+        self.assertEqual(reader.read(key), b'committed')
+        with self.assertRaises(FileNotFoundError):
+            reader.read(lost)
+
+        self.storage.save(later, b'after the crash')
+        for storage in (self.storage, reader, self.open_storage()):
+            self.assertEqual(storage.read(key), b'committed')
+            self.assertEqual(storage.read(later), b'after the crash')
+        self.assertEqual(os.path.getsize(packs.journal_path) % RECORD.size, 0)
+
+
+class LegacyContentTests(TestCase):
+    """
+    Legacy base64 blobs are converted to raw bytes on first access or by
+    convert_content_blobs, text that is not canonical base64 is kept as it
+    was stored, and both JSON and octet-stream clients read the same content.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('legacy', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        cls.category = Category.objects.create(category='Docs', owner=cls.user)
+
+    def setUp(self):
+        self.storage_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.storage_dir.cleanup)
+        storage_settings = override_settings(
+            CONTENT_STORAGE_BACKEND='encryptor.storage.FileSystemContentStorage',
+            CONTENT_STORAGE_OPTIONS={'location': self.storage_dir.name},
+        )
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+        self.storage = get_content_storage()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def new_file(self):
+        return FileMetadata.objects.create(owner=self.user, category=self.category, file_name='blob', file_type='bin', file_size=1)
+
+    def legacy_file(self, text):
+        metadata = self.new_file()
+        self.storage.save(metadata.id, text.encode())
+        FileMetadata.objects.filter(pk=metadata.pk).update(content_format=FileMetadata.ContentFormat.BASE64)
+        return metadata
+
+    def get_json(self, metadata):
+        response = self.client.get(f'/api/files/{metadata.id}/content/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['encrypted_blob']
+
+    def get_binary(self, metadata):
+        response = self.client.get(f'/api/files/{metadata.id}/content/', HTTP_ACCEPT='application/octet-stream')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def content_format(self, metadata):
+        return FileMetadata.objects.values_list('content_format', flat=True).get(pk=metadata.pk)
+
+    def test_legacy_rows_round_trip(self):
+        data = bytes(range(256))
+        text = base64.b64encode(data).decode()
+        for read_first in (self.get_json, self.get_binary):
+            with self.subTest(read_first=read_first.__name__):
+                metadata = self.legacy_file(text)
+                read_first(metadata)
+                self.assertEqual(self.content_format(metadata), 'raw')
+                self.assertEqual(self.storage.read(metadata.id), data)
+                self.assertEqual(self.get_json(metadata), text)
+                self.assertEqual(self.get_binary(metadata), data)
+
+    def test_non_canonical_text_is_kept(self):
+        for text in ('not base64!', 'YQ', 'YR==', 'QUJD\nREVG', 'héllo'):
+            with self.subTest(text=text):
+                metadata = self.legacy_file(text)
+                self.assertEqual(self.get_json(metadata), text)
+                self.assertEqual(self.content_format(metadata), 'text')
+                self.assertEqual(self.get_binary(metadata), text.encode())
+
+                metadata = self.new_file()
+                response = self.client.put(f'/api/files/{metadata.id}/content/', {'encrypted_blob': text}, format='json')
+                self.assertEqual(response.status_code, 204)
+                self.assertEqual(self.content_format(metadata), 'text')
+                self.assertEqual(self.get_json(metadata), text)
+
+    def test_put_and_get_negotiation(self):
+        data = os.urandom(1000)
+        binary_file, json_file = self.new_file(), self.new_file()
+        response = self.client.put(f'/api/files/{binary_file.id}/content/', data, content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 204)
+        response = self.client.put(
+            f'/api/files/{json_file.id}/content/', {'encrypted_blob': base64.b64encode(data).decode()}, format='json'
+        )
+        self.assertEqual(response.status_code, 204)
+
+        for metadata in (binary_file, json_file):
+            self.assertEqual(self.content_format(metadata), 'raw')
+            self.assertEqual(self.storage.read(metadata.id), data)
+            self.assertEqual(self.get_binary(metadata), data)
+            self.assertEqual(self.get_json(metadata), base64.b64encode(data).decode())
+
+        response = self.client.put(f'/api/files/{json_file.id}/content/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_convert_content_blobs(self):
+        data = b'\x00encrypted\xff'
+        converted = [self.legacy_file(base64.b64encode(data).decode()) for _ in range(3)]
+        kept = self.legacy_file('plain text')
+        raw = self.new_file()
+        write_content(raw, [b'already raw'])
+
+        out = io.StringIO()
+        call_command('convert_content_blobs', batch_size=2, stdout=out)
+        self.assertIn('Converted 3 blobs to raw bytes.', out.getvalue())
+        self.assertIn('Kept 1 blobs that are not canonical base64 as text.', out.getvalue())
+        for metadata in converted:
+            self.assertEqual(self.content_format(metadata), 'raw')
+            self.assertEqual(self.storage.read(metadata.id), data)
+            self.assertEqual(
+                FileMetadata.objects.get(pk=metadata.pk).content_digest, hashlib.sha256(data).hexdigest()
+            )
+        self.assertEqual((self.content_format(kept), self.storage.read(kept.id)), ('text', b'plain text'))
+        self.assertEqual(self.storage.read(raw.id), b'already raw')
+
+        out = io.StringIO()
+        call_command('convert_content_blobs', stdout=out)
+        self.assertIn('Converted 0 blobs to raw bytes.', out.getvalue())
+
+
+class ConditionalContentTests(TestCase):
+    """
+    Content responses carry ETags from the stored digest: GET answers 304
+    without touching storage, and conditional PUTs are compare-and-set.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('careful', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        cls.category = Category.objects.create(category='Docs', owner=cls.user)
+
+    def setUp(self):
+        self.storage_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.storage_dir.cleanup)
+        storage_settings = override_settings(
+            CONTENT_STORAGE_BACKEND='encryptor.storage.FileSystemContentStorage',
+            CONTENT_STORAGE_OPTIONS={'location': self.storage_dir.name},
+        )
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.metadata = FileMetadata.objects.create(owner=self.user, category=self.category, file_name='doc', file_type='bin', file_size=1)
+        self.url = f'/api/files/{self.metadata.id}/content/'
+
+    def put(self, data, **headers):
+        return self.client.put(self.url, data, content_type='application/octet-stream', **headers)
+
+    def stored(self):
+        return get_content_storage().read(self.metadata.id)
+
+    def test_json_and_binary_etags_differ(self):
+        etag = self.put(b'v1')['ETag']
+        binary = self.client.get(self.url, HTTP_ACCEPT='application/octet-stream')
+        json_response = self.client.get(self.url, HTTP_ACCEPT='application/json')
+        self.assertEqual(binary['ETag'], etag)
+        self.assertNotEqual(json_response['ETag'], etag)
+        self.assertIn('Accept', binary['Vary'])
+
+        # Either representation's tag identifies the current content for writes.
+        response = self.put(b'v2', HTTP_IF_MATCH=json_response['ETag'])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.stored(), b'v2')
+
+    def test_not_modified_without_opening_blob(self):
+        self.put(b'cached')
+        etags = {
+            accept: self.client.get(self.url, HTTP_ACCEPT=accept)['ETag']
+            for accept in ('application/octet-stream', 'application/json')
+        }
+        storage = get_content_storage()
+        with mock.patch.object(storage, 'open', side_effect=AssertionError), \
+                mock.patch.object(storage, 'read', side_effect=AssertionError), \
+                mock.patch.object(storage, 'stat', side_effect=AssertionError):
+            for accept, etag in etags.items():
+                with self.subTest(accept=accept):
+                    response = self.client.get(self.url, HTTP_ACCEPT=accept, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response['ETag'], etag)
+
+    def test_if_match_mismatch_fails(self):
+        old = self.put(b'v1')['ETag']
+        self.put(b'v2')
+        self.assertEqual(self.put(b'v3', HTTP_IF_MATCH=old).status_code, 412)
+        self.assertEqual(self.client.put(
+            self.url, {'encrypted_blob': 'djM='}, format='json', HTTP_IF_MATCH=old
+        ).status_code, 412)
+        self.assertEqual(self.stored(), b'v2')
+
+    def test_if_none_match_star_only_creates(self):
+        self.assertEqual(self.put(b'first', HTTP_IF_NONE_MATCH='*').status_code, 204)
+        self.assertEqual(self.put(b'second', HTTP_IF_NONE_MATCH='*').status_code, 412)
+        self.assertEqual(self.stored(), b'first')
+
+    def test_write_between_check_and_commit_fails(self):
+        etag = self.put(b'v1')['ETag']
+        check = evaluate_preconditions
+
+        def racing_check(request, etags):
+            response = check(request, etags)
+            # Another client replaces the content after this request's check passed.
+            write_content(FileMetadata.objects.get(pk=self.metadata.pk), [b'theirs'])
+            return response
+
+        with mock.patch('encryptor.views.evaluate_preconditions', racing_check):
+            self.assertEqual(self.put(b'mine', HTTP_IF_MATCH=etag).status_code, 412)
+        self.assertEqual(self.stored(), b'theirs')
+
+
+class ConditionalMetadataTests(TestCase):
+    """
+    PATCH and DELETE of file metadata with If-Match are compare-and-set on
+    the version the ETag was computed from.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('editor', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+        cls.category = Category.objects.create(category='Docs', owner=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.metadata = FileMetadata.objects.create(owner=self.user, category=self.category, file_name='doc', file_type='bin', file_size=1)
+        self.url = f'/api/files/{self.metadata.id}/'
+
+    def patch(self, name, **headers):
+        return self.client.patch(self.url, {'file_name': name}, format='json', **headers)
+
+    def racing(self):
+        check = check_write_preconditions
+
+        def racing_check(request, etags):
+            check(request, etags)
+            # Another client updates the file after this request's check passed.
+            other = FileMetadata.objects.get(pk=self.metadata.pk)
+            other.file_name = 'theirs'
+            other.save()
+
+        return mock.patch('encryptor.views.check_write_preconditions', racing_check)
+
+    def test_if_match(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.patch('mine', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.patch('stale', HTTP_IF_MATCH=etag).status_code, 412)
+        self.assertEqual(self.client.delete(self.url, HTTP_IF_MATCH=etag).status_code, 412)
+        self.assertEqual(FileMetadata.objects.get(pk=self.metadata.pk).file_name, 'mine')
+
+    def test_update_between_check_and_save_fails(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.racing():
+            self.assertEqual(self.patch('mine', HTTP_IF_MATCH=etag).status_code, 412)
+        self.assertEqual(FileMetadata.objects.get(pk=self.metadata.pk).file_name, 'theirs')
+
+    def test_delete_between_check_and_delete_fails(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.racing():
+            self.assertEqual(self.client.delete(self.url, HTTP_IF_MATCH=etag).status_code, 412)
+        self.assertIsNone(FileMetadata.objects.get(pk=self.metadata.pk).deleted_at)
+
+
+class ChangeFeedTests(TestCase):
+    """
+    /api/changes/ returns each changed object once, at the position of its
+    latest change, with tombstones for deletes and a cursor that only moves forward.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('syncer', 'salt', 'hash', 'rhash', 'rsalt', 'dek', 'rdek')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.category = self.client.post('/api/categories/', {'category': 'Docs'}, format='json').data
+
+    def create_file(self, name):
+        return self.client.post('/api/files/', {
+            'file_name': name, 'file_type': 'txt', 'file_size': 1, 'category': self.category['id'],
+        }, format='json').data
+
+    def feed(self, since=0, **params):
+        response = self.client.get('/api/changes/', {'since': since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_repeated_edits_give_one_entry(self):
+        created = self.create_file('draft.txt')
+        start = self.feed()['cursor']
+        for n in range(3):
+            self.client.patch(f"/api/files/{created['id']}/", {'file_name': f'draft-{n}.txt'}, format='json')
+        changes = self.feed(start)['changes']
+        self.assertEqual([(c['kind'], c['id'], c['action']) for c in changes], [('file', created['id'], 'upsert')])
+        self.assertEqual(changes[0]['data']['file_name'], 'draft-2.txt')
+        self.assertEqual(ChangeLogEntry.objects.filter(owner=self.user, object_id=created['id']).count(), 1)
+
+    def test_deletes_leave_tombstones(self):
+        kept, deleted, bulk_deleted = (self.create_file(f'{n}.txt') for n in range(3))
+        self.client.delete(f"/api/files/{deleted['id']}/")
+        self.client.post('/api/files/bulk-delete/', {'ids': [bulk_deleted['id']]}, format='json')
+        changes = {c['id']: c for c in self.feed()['changes'] if c['kind'] == 'file'}
+        self.assertEqual(changes[kept['id']]['action'], 'upsert')
+        for tombstone in (changes[deleted['id']], changes[bulk_deleted['id']]):
+            self.assertEqual(tombstone['action'], 'delete')
+            self.assertNotIn('data', tombstone)
+
+    def test_cursor_advances_with_has_more_and_limit(self):
+        for n in range(5):
+            self.create_file(f'{n}.txt')
+        since, pages, seqs = 0, 0, []
+        while True:
+            data = self.feed(since, limit=2)
+            pages += 1
+            self.assertLessEqual(len(data['changes']), 2)
+            seqs.extend(c['seq'] for c in data['changes'])
+            self.assertGreaterEqual(data['cursor'], since)
+            since = data['cursor']
+            if not data['has_more']:
+                break
+        # One category and five files.
+        self.assertEqual((len(seqs), pages), (6, 3))
+        self.assertEqual(seqs, sorted(set(seqs)))
+        self.assertEqual(self.feed(since), {'changes': [], 'cursor': since, 'has_more': False})
+
+        # Editing an already-synced file moves it past the cursor.
+        first = FileMetadata.objects.filter(owner=self.user).order_by('created_at').first()
+        self.client.patch(f'/api/files/{first.pk}/', {'file_name': 'renamed.txt'}, format='json')
+        data = self.feed(since)
+        self.assertEqual([c['id'] for c in data['changes']], [str(first.pk)])
+        self.assertGreater(data['cursor'], since)
+
+    @override_settings(CHANGE_FEED_MAX_PAGE_SIZE=3)
+    def test_limit_is_capped_and_validated(self):
+        for n in range(5):
+            self.create_file(f'{n}.txt')
+        data = self.feed(limit=100)
+        self.assertEqual((len(data['changes']), data['has_more']), (3, True))
+        for params in ({'limit': 0}, {'limit': 'many'}, {'since': -1}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/changes/', params).status_code, 400)
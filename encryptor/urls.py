@@ -1,9 +1,14 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import FileViewSet, CategoryViewSet,CategorySummaryViewSet
+from .events import change_events
+from .views import FileViewSet, CategoryViewSet,CategorySummaryViewSet, ChangeFeedViewSet
 
 router = DefaultRouter()
 router.register(r'files', FileViewSet, basename='file')
 router.register(r"categories", CategoryViewSet, basename='category')
 router.register(r'category-summary', CategorySummaryViewSet, basename='category-summary')
+router.register(r'changes', ChangeFeedViewSet, basename='change')
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = router.urls + [
+    path('events/', change_events, name='change-events'),
+]
\ No newline at end of file
@@ -1,24 +1,51 @@
+import base64
 import os
 from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.filters import SearchFilter
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
 from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Sum
-from .models import FileMetadata, Category
-from .serializers import FileMetadataSerializer, CategorySerializer,CategorySummarySerializer
-from .pagination import StandardResultsSetPagination
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Greatest
+from .models import FileMetadata, Category, UploadSession, UploadChunk, ChangeLogEntry
+from .serializers import (
+    FileMetadataSerializer,
+    FileMetadataRowSerializer,
+    CategorySerializer,
+    CategorySummarySerializer,
+    UploadSessionSerializer,
+    FileMetadataBulkItemSerializer
+)
+from .signals import files_bulk_created
+from .purge import soft_delete_files
+from .pagination import StandardResultsSetPagination, FileCursorPagination, is_first_page
 from .filter import FileFilter
+from .search import FullTextSearchFilter
+from .storage import get_content_storage
+from .streaming import BinaryRenderer, ranged_blob_response, read_exact_chunks, iter_stream, get_chunk_size
+from .content import decode_base64, ensure_digest, ensure_raw, record_content, write_content
+from .changes import changes_since
+from .conditional import (
+    PreconditionFailed, check_write_preconditions, conditional_data_response, content_etag, data_etag,
+    evaluate_preconditions,
+)
+from axiomcore.instrumentation import SerializationTimingMixin, count_written, measure_serialization, record_storage_read
+from axiomcore.response_cache import cache_response
+from auth_app.authentication import ClaimsJWTAuthentication
+from auth_app.models import User
 from auth_app.permissions import IsUserNotLocked, IsSubscriptionActive
-from django.db.models import Count
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(SerializationTimingMixin, viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated, IsUserNotLocked, IsSubscriptionActive]
-    authentication_classes= [JWTAuthentication]
+    authentication_classes = [ClaimsJWTAuthentication]
     
     def get_queryset(self):
         return Category.objects.filter(owner=self.request.user)
@@ -29,25 +56,40 @@ class CategoryViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         serializer.save(owner=self.request.user)
 
-class FileViewSet(viewsets.ModelViewSet):
+class FileViewSet(SerializationTimingMixin, viewsets.ModelViewSet):
     serializer_class = FileMetadataSerializer
     permission_classes = [IsAuthenticated, IsUserNotLocked, IsSubscriptionActive]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [ClaimsJWTAuthentication]
     pagination_class = StandardResultsSetPagination
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter]
     filterset_class = FileFilter
-    search_fields = ['file_name', 'file_type', 'category', 'created_at']
+    search_fields = ['file_name', 'file_type', 'category__category']
 
     def get_queryset(self):
-        return FileMetadata.objects.filter(owner=self.request.user)
+        return FileMetadata.objects.filter(owner=self.request.user).select_related('category')
 
-    def perform_create(self, serializer):
-        user = self.request.user
-        new_file_size = serializer.validated_data.get('file_size', 0)        
-        limit_mb = user.upload_limit_mb        
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if FileCursorPagination.is_requested(self.request):
+                self._paginator = FileCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def _enforce_quota(self, user, additional_bytes):
+        """
+        Raises a ValidationError when `additional_bytes` on top of the stored files
+        and the bytes reserved by open upload sessions would exceed the plan limit.
+        A session replaces its file's content, so it only reserves the growth
+        over the file's current size, which is already counted as used.
+        """
+        limit_mb = user.upload_limit_mb
         limit_bytes = limit_mb * 1024 * 1024
-        current_usage_bytes = self.get_queryset().aggregate(Sum('file_size'))['file_size__sum'] or 0
-        projected_usage_bytes = current_usage_bytes + new_file_size        
+        current_usage_bytes = User.objects.filter(pk=user.pk).values_list('used_storage_bytes', flat=True).first() or 0
+        reserved_bytes = UploadSession.objects.filter(owner=user, expires_at__gt=timezone.now())\
+            .aggregate(reserved=Sum(Greatest(F('total_size') - F('file__file_size'), Value(0))))['reserved'] or 0
+        projected_usage_bytes = current_usage_bytes + reserved_bytes + additional_bytes
         if projected_usage_bytes > limit_bytes:
             current_usage_mb = current_usage_bytes / (1024 * 1024)
             error_message = (
@@ -58,55 +100,436 @@ class FileViewSet(viewsets.ModelViewSet):
             )
             raise serializers.ValidationError({'file_size': [error_message]})
 
+    def perform_create(self, serializer):
+        user = self.request.user
+        new_file_size = serializer.validated_data.get('file_size', 0)
+        self._enforce_quota(user, new_file_size)
         serializer.save(owner=user)
-    
-    def _get_content_filepath(self, metadata_id):
-        content_dir = os.path.join(settings.MEDIA_ROOT, 'file_content')
-        os.makedirs(content_dir, exist_ok=True)
-        return os.path.join(content_dir, f"{metadata_id}.txt")
 
-    @action(detail=True, methods=['get', 'put'], url_path='content')
+    def list(self, request, *args, **kwargs):
+        return conditional_data_response(request, self._list(request, *args, **kwargs))
+
+    @cache_response('files', condition=is_first_page)
+    def _list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).values(*FileMetadataRowSerializer.values)
+        rows = FileMetadataRowSerializer()
+        page = self.paginate_queryset(queryset)
+        with measure_serialization():
+            data = rows.to_representation(page if page is not None else queryset)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_data_response(request, super().retrieve(request, *args, **kwargs))
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        response['ETag'] = data_etag(response.data)
+        return response
+
+    def _check_preconditions(self, instance):
+        """
+        Evaluates If-Match / If-None-Match against the retrieve representation's
+        ETag. Returns whether the request was conditional, in which case the
+        write must be a compare-and-set on the `updated_at` the ETag was
+        computed from.
+        """
+        if 'HTTP_IF_MATCH' not in self.request.META and 'HTTP_IF_NONE_MATCH' not in self.request.META:
+            return False
+        check_write_preconditions(self.request, [data_etag(self.get_serializer(instance).data)])
+        return True
+
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        conditional = self._check_preconditions(instance)
+        with transaction.atomic():
+            if conditional:
+                # Writing first takes the row's write lock until commit, so a
+                # concurrent conditional update waits here and then fails the comparison.
+                claimed = FileMetadata.objects.filter(pk=instance.pk, updated_at=instance.updated_at)\
+                    .update(updated_at=timezone.now())
+                if not claimed:
+                    raise PreconditionFailed()
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        files = self.get_queryset().filter(pk=instance.pk)
+        if self._check_preconditions(instance):
+            files = files.filter(updated_at=instance.updated_at)
+        if not soft_delete_files(files):
+            raise PreconditionFailed()
+
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    def bulk_delete(self, request):
+        """
+        Soft-deletes the listed files with a single UPDATE. They disappear from
+        the API immediately; blobs and rows are purged in the background.
+        """
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        max_items = settings.BULK_DELETE_MAX_ITEMS
+        if not isinstance(ids, list) or not ids:
+            return Response({"ids": ["Expected a non-empty list of file IDs."]}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > max_items:
+            return Response({"ids": [f"At most {max_items} files can be deleted at once."]}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            deleted = soft_delete_files(self.get_queryset().filter(id__in=ids))
+        except DjangoValidationError:
+            return Response({"ids": ["Every ID must be a valid UUID."]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'deleted': deleted}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='bulk-create')
+    def bulk_create(self, request):
+        """
+        Registers many files in one request. Category ownership is checked with
+        one IN query and the quota once for the summed size, then every row is
+        inserted with bulk_create in a single transaction. Nothing is created if
+        any item is invalid; the response carries a result for every item.
+        """
+        items = request.data
+        max_items = settings.BULK_CREATE_MAX_ITEMS
+        if not isinstance(items, list) or not items:
+            return Response({"error": "Expected a non-empty list of files."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > max_items:
+            return Response({"error": f"At most {max_items} files can be created at once."}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = []
+        valid_items = []
+        for index, item in enumerate(items):
+            item_serializer = FileMetadataBulkItemSerializer(data=item)
+            if item_serializer.is_valid():
+                valid_items.append((index, item_serializer.validated_data))
+                results.append({'index': index, 'status': 'valid'})
+            else:
+                results.append({'index': index, 'status': 'invalid', 'errors': item_serializer.errors})
+
+        category_ids = {data['category'] for _, data in valid_items}
+        categories = {
+            category.id: category
+            for category in Category.objects.filter(owner=request.user, id__in=category_ids)
+        }
+        for index, data in valid_items:
+            if data['category'] not in categories:
+                results[index] = {
+                    'index': index,
+                    'status': 'invalid',
+                    'errors': {'category': [f'Invalid pk "{data["category"]}" - object does not exist.']},
+                }
+        if any(result['status'] == 'invalid' for result in results):
+            return Response({'results': results}, status=status.HTTP_400_BAD_REQUEST)
+
+        self._enforce_quota(request.user, sum(data['file_size'] for _, data in valid_items))
+
+        files = [
+            FileMetadata(
+                owner=request.user,
+                category=categories[data['category']],
+                file_name=data['file_name'],
+                file_type=data['file_type'],
+                file_size=data['file_size'],
+            )
+            for _, data in valid_items
+        ]
+        with transaction.atomic():
+            FileMetadata.objects.bulk_create(files)
+            files_bulk_created.send(sender=FileMetadata, owner_id=request.user.pk, files=files)
+
+        serializer = self.get_serializer(files, many=True)
+        results = [
+            {'index': index, 'status': 'created', 'file': file_data}
+            for index, file_data in enumerate(serializer.data)
+        ]
+        return Response({'results': results}, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['get', 'put'], url_path='content',
+            renderer_classes=[JSONRenderer, BinaryRenderer])
     def content(self, request, pk=None):
+        """
+        Content is stored as raw ciphertext. Clients sending and accepting
+        `application/octet-stream` exchange those bytes directly; JSON clients
+        keep exchanging `{"encrypted_blob": "<base64>"}`, encoded on the fly.
+
+        Responses carry a strong ETag derived from the stored content digest.
+        GET honours If-None-Match (304) and PUT honours If-Match / If-None-Match (412)
+        as a compare-and-set on the digest, so concurrent conditional writes cannot
+        both succeed.
+        """
         metadata = self.get_object()
-        filepath = self._get_content_filepath(metadata.id)
+        storage = get_content_storage()
 
         if request.method == 'GET':
+            binary = request.accepted_renderer.format == BinaryRenderer.format
             try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    encrypted_blob = f.read()
-                return Response({'encrypted_blob': encrypted_blob})
+                content_format = ensure_raw(metadata, storage)
+                etag = content_etag(ensure_digest(metadata, storage), binary)
+                response = evaluate_preconditions(request, [etag])
+                if response is None and binary:
+                    response = ranged_blob_response(request, storage, metadata.id, etag=etag)
+                elif response is None:
+                    data = storage.read(metadata.id)
+                    record_storage_read(len(data))
+                    if content_format == FileMetadata.ContentFormat.RAW:
+                        data = base64.b64encode(data)
+                    response = Response({'encrypted_blob': data.decode('utf-8')}, headers={'ETag': etag})
             except FileNotFoundError:
                 return Response({"error": "Content not found."}, status=status.HTTP_404_NOT_FOUND)
             except Exception as e:
                 return Response({"error": f"Error reading file: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            patch_vary_headers(response, ('Accept',))
+            return response
 
         elif request.method == 'PUT':
-            encrypted_blob = request.data.get('encrypted_blob')
-            
-            if encrypted_blob is None:
-                 return Response({"encrypted_blob": ["This field is required."]}, status=status.HTTP_400_BAD_REQUEST)
+            binary = request.content_type.startswith(BinaryRenderer.media_type)
+            if not binary:
+                encrypted_blob = request.data.get('encrypted_blob')
+                if encrypted_blob is None:
+                     return Response({"encrypted_blob": ["This field is required."]}, status=status.HTTP_400_BAD_REQUEST)
 
-            try:
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(encrypted_blob)
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            except Exception as e:
-                return Response({"error": f"Error writing file: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            conditional = 'HTTP_IF_MATCH' in request.META or 'HTTP_IF_NONE_MATCH' in request.META
+            if conditional:
+                try:
+                    ensure_raw(metadata, storage)
+                    digest = ensure_digest(metadata, storage)
+                    etags = [content_etag(digest, True), content_etag(digest, False)]
+                except FileNotFoundError:
+                    etags = []
+                response = evaluate_preconditions(request, etags)
+                if response is not None:
+                    return response
+
+            with transaction.atomic():
+                if conditional:
+                    # Compare-and-set against the digest the preconditions were
+                    # checked with. Writing first takes the row's write lock
+                    # until commit, so a concurrent conditional write waits
+                    # here and then fails the comparison.
+                    claimed = FileMetadata.objects.filter(
+                        pk=metadata.pk, content_digest=metadata.content_digest
+                    ).update(updated_at=timezone.now())
+                    if not claimed:
+                        return Response(status=status.HTTP_412_PRECONDITION_FAILED)
+
+                try:
+                    if binary:
+                        write_content(metadata, iter_stream(request.stream, get_chunk_size()), storage=storage)
+                    else:
+                        data = decode_base64(encrypted_blob)
+                        if data is None:
+                            # Not canonical base64: keep the exact text so it reads back unchanged.
+                            write_content(metadata, [encrypted_blob.encode('utf-8')], FileMetadata.ContentFormat.TEXT, storage)
+                        else:
+                            write_content(metadata, [data], storage=storage)
+                except Exception as e:
+                    transaction.set_rollback(True)
+                    return Response({"error": f"Error writing file: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return Response(status=status.HTTP_204_NO_CONTENT, headers={'ETag': content_etag(metadata.content_digest, binary)})
+
+    @action(detail=True, methods=['get', 'head'], url_path='content/raw',
+            renderer_classes=[JSONRenderer, BinaryRenderer])
+    def content_raw(self, request, pk=None):
+        """
+        Streams the stored blob as raw bytes in fixed-size chunks.
+        Supports `Range` / `If-Range` (206 partial content) and `HEAD`, so clients
+        can fetch large blobs in parallel pieces and resume interrupted downloads.
+        """
+        metadata = self.get_object()
+        storage = get_content_storage()
+        try:
+            ensure_raw(metadata, storage)
+            etag = content_etag(ensure_digest(metadata, storage), True)
+            return evaluate_preconditions(request, [etag]) or ranged_blob_response(request, storage, metadata.id, etag=etag)
+        except FileNotFoundError:
+            return Response({"error": "Content not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    def _get_upload_session(self, metadata, session_id):
+        try:
+            return UploadSession.objects.get(
+                pk=session_id, file=metadata, owner=self.request.user, expires_at__gt=timezone.now()
+            )
+        except (UploadSession.DoesNotExist, ValueError, DjangoValidationError):
+            raise NotFound("Upload session not found or expired.")
 
-class CategorySummaryViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(detail=True, methods=['post'], url_path='upload-sessions')
+    def upload_sessions(self, request, pk=None):
+        """
+        Opens a resumable upload session for this file's content and reserves
+        the bytes `total_size` adds to the file against the user's storage
+        quota until it expires.
+        """
+        metadata = self.get_object()
+        serializer = UploadSessionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        UploadSession.objects.filter(owner=request.user, expires_at__lte=timezone.now()).delete()
+        total_size = serializer.validated_data['total_size']
+        self._enforce_quota(request.user, max(0, total_size - metadata.file_size))
+
+        storage = get_content_storage()
+        chunk_size = serializer.validated_data.get(
+            'chunk_size', max(settings.UPLOAD_SESSION_CHUNK_SIZE, storage.min_part_size)
+        )
+        if chunk_size < storage.min_part_size and total_size > chunk_size:
+            raise serializers.ValidationError(
+                {'chunk_size': [f"Chunk size must be at least {storage.min_part_size} bytes for this storage."]}
+            )
+        if total_size > chunk_size * storage.max_parts:
+            raise serializers.ValidationError(
+                {'chunk_size': [f"Chunk size is too small, uploads are limited to {storage.max_parts} chunks."]}
+            )
+
+        try:
+            upload_id = storage.create_multipart(metadata.id)
+        except Exception as e:
+            return Response({"error": f"Error starting upload: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        session = serializer.save(
+            owner=request.user,
+            file=metadata,
+            chunk_size=chunk_size,
+            expires_at=timezone.now() + settings.UPLOAD_SESSION_TTL,
+            storage_upload_id=upload_id,
+        )
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get', 'delete'], url_path=r'upload-sessions/(?P<session_id>[^/.]+)')
+    def upload_session_detail(self, request, pk=None, session_id=None):
+        """
+        GET reports which chunks have been received, DELETE aborts the upload.
+        """
+        metadata = self.get_object()
+        session = self._get_upload_session(metadata, session_id)
+        if request.method == 'DELETE':
+            session.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(UploadSessionSerializer(session).data)
+
+    @action(detail=True, methods=['put'], url_path=r'upload-sessions/(?P<session_id>[^/.]+)/chunks/(?P<index>\d+)')
+    def upload_chunk(self, request, pk=None, session_id=None, index=None):
+        """
+        Streams one numbered chunk from the raw request body into content
+        storage as part `index + 1` of the upload. Re-sending a chunk overwrites it.
+        """
+        metadata = self.get_object()
+        session = self._get_upload_session(metadata, session_id)
+        index = int(index)
+        if index >= session.chunk_count:
+            return Response({"index": [f"Chunk index must be below {session.chunk_count}."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        expected = session.expected_chunk_length(index)
+        try:
+            etag = get_content_storage().upload_part(
+                metadata.id, session.storage_upload_id, index + 1, index * session.chunk_size, expected,
+                count_written(read_exact_chunks(request.stream, expected, get_chunk_size())),
+            )
+        except ValueError as e:
+            return Response(
+                {"error": f"Chunk {index} must be exactly {expected} bytes. {str(e)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            return Response({"error": f"Error writing chunk: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        UploadChunk.objects.update_or_create(session=session, index=index, defaults={'size': expected, 'etag': etag})
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=['post'], url_path=r'upload-sessions/(?P<session_id>[^/.]+)/finalize')
+    def finalize_upload(self, request, pk=None, session_id=None):
+        """
+        Atomically replaces the file's content with the assembled upload once
+        every chunk has been received.
+        """
+        metadata = self.get_object()
+        session = self._get_upload_session(metadata, session_id)
+        missing = session.chunk_count - session.chunks.count()
+        if missing:
+            return Response(
+                {"error": f"Upload is incomplete, {missing} chunks are missing."},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        parts = [(chunk.index + 1, chunk.etag) for chunk in session.chunks.all()]
+        try:
+            get_content_storage().complete_multipart(metadata.id, session.storage_upload_id, parts)
+            record_content(metadata, FileMetadata.ContentFormat.RAW)
+        except Exception as e:
+            return Response({"error": f"Error finalizing upload: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        # The multipart upload is consumed, so deleting the session must not abort it.
+        session.storage_upload_id = ''
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class CategorySummaryViewSet(SerializationTimingMixin, viewsets.ReadOnlyModelViewSet):
     """
-    Returns a list of categories with the count of files in each.
-    Example output: [{"category": "Personal", "files_count": 12}, ...]
+    Returns a list of categories with the count and total size of files in each.
+    Example output: [{"category": "Personal", "files_count": 12, "total_bytes": 52428}, ...]
     """
     serializer_class = CategorySummarySerializer
     permission_classes = [IsAuthenticated, IsUserNotLocked, IsSubscriptionActive]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [ClaimsJWTAuthentication]
 
     def get_queryset(self):
         user = self.request.user
-        
-        return Category.objects.filter(owner=user)\
-            .annotate(files_count=Count('files'))\
-            .filter(files_count__gt=0)\
-            .order_by('-files_count') 
-            # .filter(files_count__gt=0) ensures categories with 0 files are not returned
\ No newline at end of file
+
+        # files_count and total_bytes are kept up to date by signals; categories
+        # with 0 files are not returned.
+        return Category.objects.filter(owner=user, files_count__gt=0).order_by('-files_count', 'id')
+
+    @cache_response('category-summary')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+class ChangeFeedViewSet(viewsets.ViewSet):
+    """
+    Incremental sync. `GET /api/changes/?since=<cursor>` returns the user's
+    file and category changes after the cursor, oldest first: the current data
+    of created or updated objects and tombstones for deleted ones. Call again
+    with the returned `cursor` while `has_more` is true; start from 0.
+    """
+    permission_classes = [IsAuthenticated, IsUserNotLocked, IsSubscriptionActive]
+    authentication_classes = [ClaimsJWTAuthentication]
+
+    def list(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', settings.CHANGE_FEED_PAGE_SIZE))
+        except ValueError:
+            return Response({"error": "`since` and `limit` must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        if since < 0 or limit < 1:
+            return Response({"error": "`since` must be 0 or more and `limit` at least 1."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, settings.CHANGE_FEED_MAX_PAGE_SIZE)
+
+        entries, has_more = changes_since(request.user, since, limit)
+        upserted = {
+            kind: [e.object_id for e in entries if e.kind == kind and e.action == ChangeLogEntry.Action.UPSERT]
+            for kind in ChangeLogEntry.Kind.values
+        }
+        files = {
+            str(f.pk): f for f in
+            FileMetadata.objects.filter(owner=request.user, pk__in=upserted[ChangeLogEntry.Kind.FILE]).select_related('category')
+        }
+        categories = {
+            str(c.pk): c for c in
+            Category.objects.filter(owner=request.user, pk__in=upserted[ChangeLogEntry.Kind.CATEGORY])
+        }
+
+        changes = []
+        for entry in entries:
+            change = {'seq': entry.seq, 'kind': entry.kind, 'id': entry.object_id, 'action': entry.action}
+            if entry.action == ChangeLogEntry.Action.UPSERT:
+                if entry.kind == ChangeLogEntry.Kind.FILE:
+                    instance = files.get(entry.object_id)
+                    serializer_class = FileMetadataSerializer
+                else:
+                    instance = categories.get(entry.object_id)
+                    serializer_class = CategorySerializer
+                if instance is None:
+                    # Deleted after this entry was read; its tombstone comes later.
+                    continue
+                with measure_serialization():
+                    change['data'] = serializer_class(instance, context={'request': request}).data
+            changes.append(change)
+
+        return Response({
+            'changes': changes,
+            'cursor': entries[-1].seq if entries else since,
+            'has_more': has_more,
+        })